@@ -1,14 +1,27 @@
+import logging
+import os
+import sqlite3
 import streamlit as st
-import pandas as pd
-import requests
-from PIL import Image
-from io import BytesIO
-from streamlit.dataframe_util import OptionSequence
-from heat_loss_calculator import calculate_heat_loss
-from product_packs import get_product_packs
-from quotation_generator import generate_quotation
-from pdf_export import get_pdf_download_link
-import base64
+from app_resources import get_quotation_store
+from calculation_cache import QuotationCache
+from climate import INDOOR_TEMP, simulate_heat_demand
+from feature_index import get_feature_index
+import metrics
+import profiling
+from property_categories import (
+    BEDROOM_OPTIONS,
+    CONSTRUCTION_YEAR,
+    INSULATION_LEVEL,
+    LOCATION,
+    NUMERIC_RANGES,
+    PROPERTY_TYPE,
+    WINDOWS_QUALITY
+)
+from product_packs import catalogue_version, get_product_packs
+from pdf_export import get_quotation_pdf
+from quotation_views import build_quotation_views, format_payback, quotation_fingerprint
+from uncertainty import AREA_TOLERANCE, heat_loss_uncertainty
+from upgrade_sweep import upgrade_sweep
 
 # Set page configuration with custom energy icon
 # This icon was created as a proxy for https://mobile.x.com/SpireRenewables
@@ -21,6 +34,13 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Opt-in profiling of this rerun: sampled at SPIRE_PROFILE_RATE, or forced
+# with ?profile=1 when SPIRE_PROFILE_ALLOW_QUERY is set
+profiling.start_rerun_capture(
+    st.session_state,
+    force=profiling.QUERY_PARAM_ALLOWED and st.query_params.get("profile") == "1"
+)
+
 # App header and introduction
 st.title("Spire Renewables ASHP Calculator")
 st.markdown("""
@@ -55,6 +75,26 @@ with st.sidebar:
     - Expert advice and guidance
     """)
 
+@st.cache_resource
+def get_quotation_cache():
+    """
+    Return the calculation cache shared by every session of this server.
+    
+    Size and expiry come from SPIRE_CACHE_SIZE and SPIRE_CACHE_TTL (seconds).
+    """
+    ttl = os.environ.get("SPIRE_CACHE_TTL")
+    return QuotationCache(
+        maxsize=int(os.environ.get("SPIRE_CACHE_SIZE", "1024")),
+        ttl=float(ttl) if ttl else None
+    )
+
+@st.cache_resource
+def start_metrics_exporters():
+    """Start the metrics endpoint/file writer once per server (SPIRE_METRICS_* settings)."""
+    metrics.start_exporters()
+
+start_metrics_exporters()
+
 # Initialize session state variables if they don't exist
 if 'calculation_complete' not in st.session_state:
     st.session_state.calculation_complete = False
@@ -74,28 +114,28 @@ with st.form("heat_loss_form"):
     with col1:
         property_type = st.selectbox(
             "Property Type",
-            options=["Detached House", "Semi-Detached House", "Terraced House", "Apartment/Flat", "Bungalow"],
+            options=PROPERTY_TYPE.options,
             help="Select the type of property you have"
         )
         
         construction_year = st.selectbox(
             "Construction Year",
-            options=["Pre-1919", "1919-1944", "1945-1964", "1965-1980", "1981-2000", "Post-2000"],
+            options=CONSTRUCTION_YEAR.options,
             help="Select the approximate period when your property was built"
         )
         
         floor_area = st.number_input(
             "Total Floor Area (m²)",
-            min_value=10,
-            max_value=1000,
+            min_value=NUMERIC_RANGES["floor_area"].minimum,
+            max_value=NUMERIC_RANGES["floor_area"].maximum,
             value=100,
             help="Enter the total floor area of your property in square meters"
         )
         
         ceiling_height = st.number_input(
             "Average Ceiling Height (m)",
-            min_value=2.0,
-            max_value=5.0,
+            min_value=NUMERIC_RANGES["ceiling_height"].minimum,
+            max_value=NUMERIC_RANGES["ceiling_height"].maximum,
             value=2.4,
             step=0.1,
             help="Enter the average ceiling height in meters"
@@ -104,27 +144,27 @@ with st.form("heat_loss_form"):
     with col2:
         insulation_level = st.select_slider(
             "Insulation Level",
-            options=["Poor", "Below Average", "Average", "Good", "Excellent"],
+            options=INSULATION_LEVEL.options,
             value="Average",
             help="Select the level of insulation in your property"
         )
         
         windows_quality = st.selectbox(
             "Windows Quality",
-            options=["Single Glazed", "Double Glazed (Old)", "Double Glazed (New)", "Triple Glazed"],
+            options=WINDOWS_QUALITY.options,
             help="Select the type of windows in your property"
         )
         
         num_bedrooms = st.select_slider(
             "Number of Bedrooms",
-            options=[1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
+            options=BEDROOM_OPTIONS,
             value=3,
             help="Enter the number of bedrooms in your property"
         )
         
         location = st.selectbox(
             "Property Location Region",
-            options=["North", "Midlands", "South", "Scotland", "Wales", "Northern Ireland"],
+            options=LOCATION.options,
             help="Select the region where your property is located"
         )
     
@@ -143,28 +183,111 @@ with st.form("heat_loss_form"):
             "location": location
         }
         
+        # Repeat configurations are served from the shared cache
+        quotation_cache = get_quotation_cache()
+        
         # Calculate the heat loss
-        heat_loss = calculate_heat_loss(property_data)
+        heat_loss = quotation_cache.calculate_heat_loss(property_data)
         
         # Get available product packs
         product_packs = get_product_packs()
         
         # Generate quotation based on heat loss and product packs
-        quotation = generate_quotation(heat_loss, product_packs, property_data)
+        quotation = quotation_cache.generate_quotation(heat_loss, product_packs, property_data)
+        
+        # Keep the quotation for sales; an identical quote only bumps its hit count
+        with metrics.stage("store_quotation"):
+            try:
+                get_quotation_store().save(property_data, heat_loss, quotation, catalogue_version(product_packs))
+            except sqlite3.Error:
+                logging.getLogger("spire.store").exception("Could not save the quotation")
         
         # Store results in session state
         st.session_state.heat_loss = heat_loss
         st.session_state.quotation = quotation
+        st.session_state.quotation_fingerprint = quotation_fingerprint(heat_loss, quotation)
         st.session_state.calculation_complete = True
         st.session_state.property_data = property_data
 
-# Display results if calculation is complete
-if st.session_state.calculation_complete:
-    st.header("Heat Loss Assessment Results")
+@st.cache_data(max_entries=256, show_spinner=False)
+def get_quotation_views(fingerprint, _heat_loss, _quotation, _feature_index):
+    """
+    Return the tables and charts for a quotation, built once per fingerprint.
     
-    heat_loss = st.session_state.heat_loss
-    quotation = st.session_state.quotation
-    property_data = st.session_state.property_data
+    The heat loss and quotation dictionaries are not hashed by Streamlit
+    (leading underscore); the fingerprint identifies them instead. The
+    feature index only speeds the comparison up, so it is not hashed either.
+    """
+    return build_quotation_views(_heat_loss, _quotation, _feature_index)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def get_heat_demand(property_data, _heat_loss):
+    """
+    Return the design-year simulation and daily demand table for a property.
+    
+    The heat loss follows from property_data, so it is not hashed.
+    """
+    import numpy as np
+    import pandas as pd
+    
+    demand = simulate_heat_demand(_heat_loss, property_data, hourly=True)
+    hourly = demand.pop("hourly_demand")
+    daily = hourly.reshape(-1, 24)
+    demand["daily"] = pd.DataFrame({
+        "day": pd.date_range("2001-01-01", periods=len(daily), freq="D"),
+        "kwh": daily.sum(axis=1),
+        "peak_kw": np.max(daily, axis=1)
+    })
+    return demand
+
+# Daily heating demand over the design year, as a plain Vega-Lite spec
+DAILY_DEMAND_SPEC = {
+    "mark": {"type": "area", "line": True, "opacity": 0.6},
+    "encoding": {
+        "x": {"field": "day", "type": "temporal", "title": None, "axis": {"format": "%b"}},
+        "y": {"field": "kwh", "type": "quantitative", "title": "Heating demand (kWh/day)"},
+        "tooltip": [
+            {"field": "day", "type": "temporal", "title": "Day", "format": "%d %b"},
+            {"field": "kwh", "type": "quantitative", "title": "kWh", "format": ",.1f"},
+            {"field": "peak_kw", "type": "quantitative", "title": "Peak (kW)", "format": ".2f"}
+        ]
+    }
+}
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def get_upgrade_sweep(property_data, version, _product_packs):
+    """
+    Return the insulation × glazing scenario grid for a property.
+    
+    Keyed by the property and the catalogue version; the catalogue itself
+    is not hashed (leading underscore).
+    """
+    sweep = upgrade_sweep(property_data, _product_packs)
+    # Vega-Lite cannot colour or print an infinite payback; NaN leaves the cell blank
+    return sweep.assign(payback_period=sweep["payback_period"].replace(float('inf'), float('nan')))
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def get_uncertainty(property_data, version, _product_packs):
+    """
+    Return the Monte Carlo percentiles for a property.
+    
+    Keyed by the property and the catalogue version; the catalogue itself
+    is not hashed (leading underscore).
+    """
+    return heat_loss_uncertainty(property_data, _product_packs)
+
+# Heat-map metric label -> (sweep column, number format)
+UPGRADE_METRICS = {
+    "Total Heat Loss (kW)": ("total_heat_loss", ".2f"),
+    "Payback Period (years)": ("payback_period", ".1f"),
+    "Total Cost (£)": ("total_cost", ",.0f")
+}
+
+# The results are split into fragments: interacting with one only reruns
+# that fragment, so the other sections are not rebuilt or resent
+@st.fragment
+def show_heat_loss_results(heat_loss, views, demand, uncertainty):
+    st.header("Heat Loss Assessment Results")
     
     # Heat loss summary
     col1, col2, col3 = st.columns(3)
@@ -199,20 +322,37 @@ if st.session_state.calculation_complete:
         st.markdown(f"**Ventilation Heat Loss:** {heat_loss['ventilation_loss']:.2f} kW")
         
         # Display heat loss chart
-        heat_loss_data = {
-            'Category': ['Walls', 'Roof', 'Windows', 'Floor', 'Ventilation'],
-            'Heat Loss (kW)': [
-                heat_loss['wall_loss'],
-                heat_loss['roof_loss'],
-                heat_loss['window_loss'],
-                heat_loss['floor_loss'],
-                heat_loss['ventilation_loss']
-            ]
-        }
-        heat_loss_df = pd.DataFrame(heat_loss_data)
-        st.bar_chart(heat_loss_df.set_index('Category'))
-        
-    # Quotation details
+        st.bar_chart(views["heat_loss"])
+    
+    # Hour-by-hour simulation over the region's design year
+    with st.expander("Annual Heating Demand"):
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Annual Heating Demand", f"{demand['annual_heating_kwh']:,.0f} kWh")
+        col2.metric("Peak Design Load", f"{demand['peak_design_load']:.2f} kW")
+        col3.metric("Design Temperature", f"{demand['design_temperature']:.1f} °C")
+        st.vega_lite_chart(demand["daily"], DAILY_DEMAND_SPEC, use_container_width=True)
+        st.caption(f"Simulated hour by hour over a synthetic design year for your region, "
+                   f"heating to {INDOOR_TEMP:.0f} °C.")
+    
+    # Spread of the results when the answers are only estimates
+    with st.expander("Uncertainty Range"):
+        total = uncertainty["total_heat_loss"]
+        rating = uncertainty["efficiency_rating"]
+        payback = uncertainty["payback_period"]
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Total Heat Loss (median)", f"{total[50]:.2f} kW")
+        col1.caption(f"80% range: {total[10]:.2f} – {total[90]:.2f} kW")
+        col2.metric("Efficiency Rating (median)", rating[50])
+        col2.caption(f"80% range: {rating[10]} – {rating[90]}")
+        col3.metric("Payback Period (median)", format_payback(payback[50]))
+        col3.caption(f"80% range: {format_payback(payback[10])} – {format_payback(payback[90])}")
+        col4.metric("Chance Pack Is Undersized", f"{uncertainty['undersized_probability']:.0%}")
+        st.caption(f"From {uncertainty['samples']:,} samples with the floor area uncertain by about "
+                   f"{AREA_TOLERANCE:.0%} and each insulation, glazing and age answer covering the range "
+                   f"between its neighbouring options.")
+
+@st.fragment
+def show_quotation(quotation, views, feature_index, heat_loss):
     st.header("Air Source Heat Pump Quotation")
     
     # Recommended solution
@@ -235,84 +375,20 @@ if st.session_state.calculation_complete:
     st.subheader("Package Comparison")
     
     # Create tabs for different comparison views
-    tab1, tab2 = st.tabs(["Features Comparison", "Price Comparison"])
+    tab1, tab2, tab3 = st.tabs(["Features Comparison", "Price Comparison", "Find a Package"])
     
     with tab1:
-        # Prepare data for the comparison table
-        comparison_data = {
-            "Feature": ["Price", "Installation Cost", "Total Cost"] + 
-                      ["Feature: " + feature for feature in quotation['recommended_pack']['features']]
-        }
-        
-        # Add recommended pack to comparison
-        recommended = quotation['recommended_pack']
-        comparison_data[recommended['name']] = [
-            f"£{recommended['price']:.2f}",
-            f"£{quotation['installation_cost']:.2f}",
-            f"£{quotation['total_cost']:.2f}"
-        ]
-        
-        # Add checkmarks for features
-        for feature in comparison_data["Feature"][3:]:
-            feature_name = feature.replace("Feature: ", "")
-            if feature_name in recommended['features']:
-                comparison_data[recommended['name']].append("✅")
-            else:
-                comparison_data[recommended['name']].append("❌")
-        
-        # Add alternative packs to comparison
-        for pack in quotation['alternative_packs']:
-            # Basic information
-            comparison_data[pack['name']] = [
-                f"£{pack['price']:.2f}",
-                f"£{quotation['installation_cost']:.2f}",
-                f"£{pack['price'] + quotation['installation_cost']:.2f}"
-            ]
-            
-            # Add checkmarks for features
-            for feature in comparison_data["Feature"][3:]:
-                feature_name = feature.replace("Feature: ", "")
-                if feature_name in pack['features']:
-                    comparison_data[pack['name']].append("✅")
-                else:
-                    comparison_data[pack['name']].append("❌")
-        
-        # Create DataFrame for display
-        comparison_df = pd.DataFrame(comparison_data)
-        st.dataframe(comparison_df.set_index("Feature"), use_container_width=True)
+        st.dataframe(views["comparison"], use_container_width=True)
     
     with tab2:
-        # Prepare data for price comparison chart
-        price_data = {
-            'Package': [recommended['name']] + [pack['name'] for pack in quotation['alternative_packs']],
-            'Product Price (£)': [recommended['price']] + [pack['price'] for pack in quotation['alternative_packs']],
-            'Installation Cost (£)': [quotation['installation_cost']] * (1 + len(quotation['alternative_packs']))
-        }
-        
-        # Create a DataFrame for the chart
-        price_df = pd.DataFrame(price_data)
+        # Stacked bar chart of product and installation cost
+        st.bar_chart(views["price"], use_container_width=True)
         
-        # Create a stacked bar chart
-        st.bar_chart(price_df.set_index('Package'), use_container_width=True)
-        
-        # Create a table with payback period calculation for each package
-        payback_data = {
-            'Package': [recommended['name']] + [pack['name'] for pack in quotation['alternative_packs']],
-            'Total Cost (£)': [
-                quotation['total_cost']] + 
-                [pack['price'] + quotation['installation_cost'] for pack in quotation['alternative_packs']
-            ],
-            'Estimated Annual Savings (£)': [quotation['estimated_annual_savings']] * (1 + len(quotation['alternative_packs'])),
-            'Payback Period (years)': [
-                quotation['payback_period']] + 
-                [(pack['price'] + quotation['installation_cost']) / quotation['estimated_annual_savings'] 
-                 for pack in quotation['alternative_packs']
-            ]
-        }
-        
-        # Create DataFrame for the payback period table
-        payback_df = pd.DataFrame(payback_data)
-        st.dataframe(payback_df.set_index('Package'), use_container_width=True)
+        # Payback period for each package
+        st.dataframe(views["payback"], use_container_width=True)
+    
+    with tab3:
+        show_pack_finder(feature_index, heat_loss)
     
     # Alternative packages
     st.subheader("Alternative ASHP Options")
@@ -333,24 +409,231 @@ if st.session_state.calculation_complete:
     
     col1, col2 = st.columns(2)
     with col1:
+        st.markdown(f"**Annual Gas Heating Cost:** £{quotation['annual_gas_cost']:.2f}")
+        st.markdown(f"**Annual Heat Pump Running Cost:** £{quotation['annual_running_cost']:.2f}")
         st.markdown(f"**Estimated Annual Savings:** £{quotation['estimated_annual_savings']:.2f}")
-        st.markdown(f"**Payback Period:** {quotation['payback_period']:.1f} years")
+        st.markdown(f"**Payback Period:** {format_payback(quotation['payback_period'])}")
     
     with col2:
         st.markdown("**Additional Recommendations:**")
         for recommendation in quotation['additional_recommendations']:
             st.markdown(f"- {recommendation}")
+
+def show_pack_finder(feature_index, heat_loss):
+    """Filter the whole catalogue by features, suitability, price and fit."""
+    col1, col2 = st.columns(2)
+    features = col1.multiselect("Must include", options=feature_index.features, key="finder_features")
+    ideal_for = col2.multiselect("Ideal for any of", options=feature_index.tags, key="finder_ideal_for")
+    col1, col2 = st.columns(2)
+    max_price = col1.number_input("Maximum pack price (£)", min_value=0, value=None, step=500,
+                                  placeholder="Any price", key="finder_max_price")
+    fits = col2.checkbox(f"Covers my heat loss ({heat_loss['total_heat_loss']:.2f} kW)", value=True,
+                         key="finder_fits")
+    
+    packs = feature_index.find(features, ideal_for, max_price, heat_loss['total_heat_loss'] if fits else None)
+    if not packs:
+        st.info("No package matches these filters.")
+        return
+    st.dataframe(
+        [{
+            "Package": pack["name"],
+            "Price (£)": pack["price"],
+            "Heat Loss Range (kW)": f"{pack['min_heat_loss']:g}–{pack['max_heat_loss']:g}",
+            "Ideal For": ", ".join(pack["ideal_for"])
+        } for pack in sorted(packs, key=lambda pack: pack["price"])],
+        hide_index=True,
+        use_container_width=True
+    )
+
+def upgrade_heat_map_spec(column, label, number_format):
+    """
+    Return the Vega-Lite spec of the upgrade heat-map for one sweep column.
     
+    Written as a plain spec rather than with Altair: validating an Altair
+    chart costs more than running the whole sweep.
+    """
+    axes = {
+        "x": {"field": "windows_quality", "type": "nominal", "title": "Windows Quality",
+              "sort": list(WINDOWS_QUALITY.options)},
+        "y": {"field": "insulation_level", "type": "nominal", "title": "Insulation Level",
+              "sort": list(reversed(INSULATION_LEVEL.options))}
+    }
+    return {
+        "encoding": axes,
+        "layer": [
+            {
+                "mark": {"type": "rect"},
+                "encoding": {
+                    "color": {"field": column, "type": "quantitative", "title": label,
+                              "scale": {"scheme": "redyellowgreen", "reverse": True}},
+                    # Outline the property's current combination
+                    "stroke": {"condition": {"test": "datum.is_current", "value": "black"}, "value": None},
+                    "strokeWidth": {"condition": {"test": "datum.is_current", "value": 3}, "value": 0},
+                    "tooltip": [
+                        {"field": "insulation_level", "type": "nominal", "title": "Insulation"},
+                        {"field": "windows_quality", "type": "nominal", "title": "Windows"},
+                        {"field": "total_heat_loss", "type": "quantitative", "title": "Heat loss (kW)", "format": ".2f"},
+                        {"field": "efficiency_rating", "type": "nominal", "title": "Rating"},
+                        {"field": "recommended_pack", "type": "nominal", "title": "Recommended pack"},
+                        {"field": "total_cost", "type": "quantitative", "title": "Total cost (£)", "format": ",.0f"},
+                        {"field": "payback_period", "type": "quantitative", "title": "Payback (years)", "format": ".1f"}
+                    ]
+                }
+            },
+            {
+                "mark": {"type": "text", "fontSize": 12},
+                "encoding": {"text": {"field": column, "type": "quantitative", "format": number_format}}
+            }
+        ]
+    }
+
+@st.fragment
+def show_upgrade_sweep(sweep):
+    st.subheader("What-If Upgrades")
+    st.markdown("How each combination of insulation and windows would change the heat loss and quotation. "
+                "Your current combination is outlined.")
+    
+    label = st.selectbox("Show", options=list(UPGRADE_METRICS))
+    column, number_format = UPGRADE_METRICS[label]
+    st.vega_lite_chart(sweep, upgrade_heat_map_spec(column, label, number_format), use_container_width=True)
+
+def prepare_pdf(fingerprint):
+    """Mark the quotation with this fingerprint as ready to download."""
+    st.session_state.pdf_fingerprint = fingerprint
+
+@st.fragment
+def show_export(heat_loss, quotation, property_data):
     # Download Quotation
     st.subheader("Export Quotation")
     st.markdown("Download a detailed quotation to your phone or computer for easy reference or sharing.")
     
-    pdf_download = get_pdf_download_link(heat_loss, quotation, property_data)
-    st.markdown(pdf_download, unsafe_allow_html=True)
+    # The pinned Streamlit (1.45) needs the download bytes up front, not a
+    # callable, so the PDF is only rendered once the user asks for it.
+    # Identical quotes are then served from the rendered-document cache.
+    fingerprint = st.session_state.quotation_fingerprint
+    if st.session_state.get("pdf_fingerprint") == fingerprint:
+        st.download_button(
+            "📥 Download Quotation",
+            data=get_quotation_pdf(heat_loss, quotation, property_data),
+            file_name="ashp_quotation.pdf",
+            mime="application/pdf",
+            on_click="ignore",
+            type="primary"
+        )
+    else:
+        st.button("📄 Prepare PDF", on_click=prepare_pdf, args=(fingerprint,), type="primary")
     
     # Reset button
     if st.button("Reset Calculator"):
         st.session_state.calculation_complete = False
         st.session_state.heat_loss = None
         st.session_state.quotation = None
+        st.session_state.quotation_fingerprint = None
+        # Hiding the results needs a full rerun, not just this fragment
         st.rerun()
+
+# Quotations shown per page of the history view
+HISTORY_PAGE_SIZE = 25
+
+def _any(value):
+    return "All" if value is None else value
+
+@st.fragment
+def show_history():
+    # Only queried and rendered while switched on, so other reruns pay nothing for it
+    if not st.toggle("Show Quotation History", key="history_shown"):
+        return
+    store = get_quotation_store()
+    with st.container(border=True):
+        col1, col2, col3 = st.columns(3)
+        location = col1.selectbox("Region", options=[None] + list(LOCATION.options), format_func=_any,
+                                  key="history_location")
+        property_type = col2.selectbox("Property Type", options=[None] + list(PROPERTY_TYPE.options),
+                                       format_func=_any, key="history_property_type")
+        pack_id = col3.selectbox("Recommended Pack", options=[None] + [pack["id"] for pack in get_product_packs()],
+                                 format_func=_any, key="history_pack")
+        
+        # Cursors of the pages seen so far, restarted when the filters change
+        filters = {"location": location, "property_type": property_type, "recommended_pack_id": pack_id}
+        if st.session_state.get("history_filters") != filters:
+            st.session_state.history_filters = filters
+            st.session_state.history_cursors = [None]
+        cursors = st.session_state.history_cursors
+        
+        rows, next_cursor = store.history(limit=HISTORY_PAGE_SIZE, before=cursors[-1], **filters)
+        if not rows:
+            st.markdown("No saved quotations match.")
+            return
+        
+        st.dataframe(
+            [
+                {
+                    "ID": row["id"],
+                    "Quoted": row["created_at"][:16].replace("T", " "),
+                    "Times Quoted": row["hits"],
+                    "Region": row["location"],
+                    "Property Type": row["property_type"],
+                    "Floor Area (m²)": row["floor_area"],
+                    "Heat Loss (kW)": round(row["total_heat_loss"], 2),
+                    "Rating": row["efficiency_rating"],
+                    "Pack": row["recommended_pack_id"],
+                    "Total Cost (£)": round(row["total_cost"], 2),
+                    "Payback": format_payback(row["payback_period"])
+                }
+                for row in rows
+            ],
+            hide_index=True,
+            use_container_width=True
+        )
+        
+        col1, col2, col3, col4 = st.columns([1, 1, 2, 1])
+        col1.button("Newer", disabled=len(cursors) == 1, on_click=cursors.pop)
+        col2.button("Older", disabled=next_cursor is None, on_click=cursors.append, args=(next_cursor,))
+        
+        # Reopen a saved quotation as if it had just been calculated
+        selected = col3.selectbox("Quotation", options=[row["id"] for row in rows], label_visibility="collapsed")
+        if col4.button("Open"):
+            record = store.get(selected)
+            heat_loss, quotation = record["heat_loss"], record["quotation"]
+            if "recommended_pack" not in quotation:
+                # Batch jobs store the headline figures only; requote in full
+                quotation = get_quotation_cache().generate_quotation(heat_loss, get_product_packs(),
+                                                                     record["property_data"])
+            st.session_state.heat_loss = heat_loss
+            st.session_state.quotation = quotation
+            st.session_state.quotation_fingerprint = quotation_fingerprint(heat_loss, quotation)
+            st.session_state.property_data = record["property_data"]
+            st.session_state.calculation_complete = True
+            st.rerun()
+
+# Display results if calculation is complete
+if st.session_state.calculation_complete:
+    heat_loss = st.session_state.heat_loss
+    quotation = st.session_state.quotation
+    property_data = st.session_state.property_data
+    
+    # Tables and charts are built once per distinct quotation
+    with metrics.stage("quotation_views"):
+        product_packs = get_product_packs()
+        feature_index = get_feature_index(product_packs)
+        views = get_quotation_views(st.session_state.quotation_fingerprint, heat_loss, quotation, feature_index)
+    
+    with metrics.stage("heat_demand"):
+        demand = get_heat_demand(property_data, heat_loss)
+    
+    # Every insulation × glazing combination, quoted in one batch
+    with metrics.stage("upgrade_sweep"):
+        sweep = get_upgrade_sweep(property_data, catalogue_version(product_packs), product_packs)
+    
+    with metrics.stage("uncertainty"):
+        uncertainty = get_uncertainty(property_data, catalogue_version(product_packs), product_packs)
+    
+    with metrics.stage("render_results"):
+        show_heat_loss_results(heat_loss, views, demand, uncertainty)
+        show_quotation(quotation, views, feature_index, heat_loss)
+        show_upgrade_sweep(sweep)
+        show_export(heat_loss, quotation, property_data)
+
+show_history()
+
+profiling.finish_rerun_capture(st.session_state)
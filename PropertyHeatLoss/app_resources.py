@@ -0,0 +1,14 @@
+"""
+Server-wide resources shared by the Streamlit app and its pages.
+
+st.cache_resource keys a resource by the function that creates it, so a
+copy of the accessor in each page would open a resource of its own. Every
+page imports the accessor from here instead.
+"""
+import streamlit as st
+from quotation_store import QuotationStore
+
+@st.cache_resource
+def get_quotation_store():
+    """Return the quotation store shared by every session of this server (SPIRE_STORE_PATH)."""
+    return QuotationStore()
@@ -0,0 +1,178 @@
+"""
+Quote a whole file of properties from the command line.
+
+Reads a CSV or Parquet file with the questionnaire fields (see
+heat_loss_calculator.PROPERTY_FIELDS), splits it into chunks and runs the
+calculate_heat_loss -> get_product_packs -> generate_quotation pipeline on
+each chunk in a pool of worker processes. Writes one row per property with
+the heat loss, recommended pack, costs, savings and payback period.
+
+The file is streamed through quotation_pipeline, so memory use does not
+grow with the size of the input. Rows that fail validation (unknown
+categories, missing or out-of-range values, see validation.py) are skipped;
+--rejects writes them to a CSV file with the reasons.
+
+With --simulate each row also gets the hourly design-year simulation for
+its region (peak design load and annual heating kWh, see climate.py).
+
+With --uncertainty each row also gets the P10/P50/P90 of its heat loss,
+rating and payback and the chance its pack is undersized (see uncertainty.py).
+
+With --store the quotes are also saved to the quotation store (see
+quotation_store.py), where repeats of stored quotes only bump their hit counts.
+
+With --stock the packs are allocated to the whole file at once within the
+stock limits in a JSON file of pack id to count (see pack_allocation.py),
+instead of each property getting its recommended pack. The allocation is
+global, so the file is read into memory and quoted in one process.
+
+Usage:
+    python batch_quote.py leads.csv quotes.csv --workers 32 --chunk-size 50000
+    python batch_quote.py leads.csv quotes.csv --rejects rejected.csv
+    python batch_quote.py contract.csv allocation.csv --stock stock.json --objective mismatch
+"""
+import argparse
+import contextlib
+import logging
+import os
+import sys
+
+import metrics
+from pack_allocation import OBJECTIVES, allocate_quotations, load_stock
+from product_packs import get_product_packs, load_catalogue
+from quotation_pipeline import CsvSink, ParquetSink, StoreSink, TeeSink, read_chunks, run_pipeline
+from quotation_store import DEFAULT_STORE_PATH
+from validation import validate_properties
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+def quote_file(input_path, output_path, workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+               product_packs=None, progress=None, simulate=False, store_path=None, rejects_path=None,
+               uncertainty=False):
+    """
+    Quote every property in a file using a pool of worker processes.
+
+    Args:
+        input_path: CSV or Parquet file of properties
+        output_path: CSV or Parquet file to write
+        workers: Number of worker processes (defaults to every CPU); 1 runs inline
+        chunk_size: Rows sent to a worker at a time
+        product_packs: Catalogue to quote against (defaults to the current one)
+        progress: Optional callback(rows_done, elapsed_seconds)
+        simulate: Also write the design-year peak load and annual kWh columns
+        store_path: Also save the quotes to the quotation store in this file
+        rejects_path: CSV file for the rows that fail validation
+        uncertainty: Also write the Monte Carlo percentile columns
+
+    Returns:
+        A dictionary with the quoted and rejected row counts, elapsed
+        seconds and rows per second
+    """
+    workers = workers or os.cpu_count() or 1
+    sink_class = ParquetSink if output_path.endswith((".parquet", ".pq")) else CsvSink
+    sink = sink_class(output_path)
+    if store_path:
+        sink = TeeSink(sink, StoreSink(store_path, product_packs))
+    with sink, (CsvSink(rejects_path) if rejects_path else contextlib.nullcontext()) as rejects:
+        return run_pipeline(input_path, sink, chunk_size=chunk_size, product_packs=product_packs,
+                            workers=workers, progress=progress, simulate=simulate, rejects=rejects,
+                            uncertainty=uncertainty)
+
+def allocate_file(input_path, output_path, stock, objective="cost", product_packs=None, rejects_path=None):
+    """
+    Quote every property in a file with packs allocated within stock limits.
+
+    Args:
+        input_path: CSV or Parquet file of properties
+        output_path: CSV or Parquet file to write
+        stock: Dictionary of pack id to the number available
+        objective: "cost" or "mismatch" (see pack_allocation.allocate_packs)
+        product_packs: Catalogue to quote against (defaults to the current one)
+        rejects_path: CSV file for the rows that fail validation
+
+    Returns:
+        A dictionary with the quoted and rejected row counts, the rows left
+        without a pack and the count allocated of each pack
+    """
+    import pandas as pd
+
+    product_packs = product_packs if product_packs is not None else get_product_packs()
+    properties, invalid = validate_properties(pd.concat(read_chunks(input_path), ignore_index=True))
+    if rejects_path:
+        invalid.to_csv(rejects_path, index=False)
+    quotes = allocate_quotations(properties, product_packs, stock, objective)
+    sink = ParquetSink(output_path) if output_path.endswith((".parquet", ".pq")) else CsvSink(output_path)
+    with sink:
+        prepare = getattr(sink, "prepare", None)
+        sink.write(prepare(quotes) if prepare else quotes)
+
+    allocated = quotes["recommended_pack_id"].value_counts()
+    return {
+        "rows": len(quotes),
+        "rejected": len(invalid),
+        "unallocated": int(quotes["recommended_pack_id"].isna().sum()),
+        "packs": {pack["id"]: int(allocated.get(pack["id"], 0)) for pack in product_packs}
+    }
+
+def _report_progress(done, elapsed):
+    rate = done / elapsed if elapsed > 0 else 0
+    print(f"{done:,} rows ({rate:,.0f} rows/s)", file=sys.stderr)
+
+def _report_rejected(rejected, rejects_path):
+    if rejected:
+        where = f", written to {rejects_path}" if rejects_path else " (see --rejects)"
+        print(f"Skipped {rejected:,} properties that failed validation{where}", file=sys.stderr)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Quote a CSV/Parquet file of properties.")
+    parser.add_argument("input", help="CSV or Parquet file of properties")
+    parser.add_argument("output", help="CSV or Parquet file to write quotes to")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: all CPUs; 1 runs in-process)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"rows per work item (default: {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument("--catalogue", default=None,
+                        help="product catalogue file or directory (default: the app catalogue)")
+    parser.add_argument("--simulate", action="store_true",
+                        help="add the hourly design-year simulation (peak design load, annual kWh)")
+    parser.add_argument("--uncertainty", action="store_true",
+                        help="add Monte Carlo P10/P50/P90 bands and the chance the pack is undersized")
+    parser.add_argument("--store", nargs="?", const=DEFAULT_STORE_PATH, default=None,
+                        help=f"also save the quotes to the quotation store (default file: {DEFAULT_STORE_PATH})")
+    parser.add_argument("--stock", default=None,
+                        help="JSON file of pack id to units in stock: allocate packs to the whole file within it")
+    parser.add_argument("--objective", choices=OBJECTIVES, default="cost",
+                        help="with --stock, minimise the total pack cost or the sizing mismatch (default: cost)")
+    parser.add_argument("--rejects", default=None,
+                        help="CSV file for the rows that fail validation, with the reasons")
+    args = parser.parse_args(argv)
+    if args.stock and (args.simulate or args.store or args.uncertainty):
+        parser.error("--stock cannot be combined with --simulate, --uncertainty or --store")
+
+    if metrics.ENABLED:
+        # Stage summaries and per-observation lines go to stderr as JSON
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+    metrics.start_exporters()
+    product_packs = load_catalogue(args.catalogue) if args.catalogue else None
+    if args.stock:
+        try:
+            stock = load_stock(args.stock)
+            summary = allocate_file(args.input, args.output, stock, args.objective, product_packs, args.rejects)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        print(f"Allocated packs to {summary['rows'] - summary['unallocated']:,} of {summary['rows']:,} "
+              f"properties: {summary['packs']}", file=sys.stderr)
+        _report_rejected(summary["rejected"], args.rejects)
+        return
+    summary = quote_file(args.input, args.output, workers=args.workers, chunk_size=args.chunk_size,
+                         product_packs=product_packs, progress=_report_progress, simulate=args.simulate,
+                         store_path=args.store, rejects_path=args.rejects,
+                         uncertainty=args.uncertainty)
+    print(f"Quoted {summary['rows']:,} properties in {summary['seconds']:.2f}s "
+          f"({summary['rows_per_second']:,.0f} rows/s)", file=sys.stderr)
+    _report_rejected(summary["rejected"], args.rejects)
+    if metrics.ENABLED:
+        metrics.log_summary()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Check the cold import time of the app and calculator modules against a budget.
+
+Each module is imported in a fresh interpreter with ``python -X importtime``
+several times and the median cumulative time is compared with the budget in
+pyproject.toml ([tool.spire.import-budget]). A module that pulls in one of
+the heavy packages listed there (NumPy, pandas, Streamlit, fpdf) at import
+time also fails the check, since those are meant to load lazily. Exits with
+status 1 when any module is over budget.
+
+Usage:
+    python benchmarks/import_budget.py
+    python benchmarks/import_budget.py --runs 9 --json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tomllib
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load_budget(path=os.path.join(APP_DIR, "pyproject.toml")):
+    """
+    Read the import budget from pyproject.toml.
+
+    Args:
+        path: pyproject.toml to read
+
+    Returns:
+        The [tool.spire.import-budget] table as a dictionary
+    """
+    with open(path, "rb") as handle:
+        return tomllib.load(handle)["tool"]["spire"]["import-budget"]
+
+def measure_import(module):
+    """
+    Import a module once in a fresh interpreter with -X importtime.
+
+    Args:
+        module: Name of the module to import
+
+    Returns:
+        A tuple of the module's cumulative import time in milliseconds and
+        the set of every module imported along the way
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=APP_DIR, capture_output=True, text=True, check=True
+    )
+
+    # Lines look like "import time:  self [us] | cumulative | imported package"
+    cumulative = None
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, total, name = line.split("|")
+        name = name.strip()
+        if name == "imported package":
+            continue
+        imported.add(name)
+        if name == module:
+            cumulative = int(total) / 1000
+
+    if cumulative is None:
+        raise RuntimeError(f"{module} was not imported (already loaded at start-up?)")
+
+    return cumulative, imported
+
+def check_budget(budget, runs=None):
+    """
+    Measure every budgeted module and compare it with its limit.
+
+    Args:
+        budget: Import budget table (see load_budget)
+        runs: Imports per module; the median is used (default from the budget)
+
+    Returns:
+        A list of result dictionaries, one per module
+    """
+    runs = runs or budget.get("runs", 5)
+    heavy = set(budget.get("heavy", []))
+    results = []
+    for module, limit_ms in budget["modules"].items():
+        timings = []
+        imported = set()
+        for _ in range(runs):
+            milliseconds, imported = measure_import(module)
+            timings.append(milliseconds)
+
+        median_ms = statistics.median(timings)
+        # Top-level package of each imported module, e.g. pandas.core -> pandas
+        heavy_loaded = sorted(heavy & {name.split(".")[0] for name in imported})
+        results.append({
+            "module": module,
+            "median_ms": round(median_ms, 2),
+            "budget_ms": limit_ms,
+            "heavy_imports": heavy_loaded,
+            "ok": median_ms <= limit_ms and not heavy_loaded
+        })
+
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check module import times against the budget.")
+    parser.add_argument("--runs", type=int, default=None, help="imports per module (median is used)")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    results = check_budget(load_budget(), args.runs)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            status = "ok" if result["ok"] else "OVER BUDGET"
+            heavy = f"  (imports {', '.join(result['heavy_imports'])})" if result["heavy_imports"] else ""
+            print(f"{result['module']:<24} {result['median_ms']:>8.1f} ms / {result['budget_ms']:>5} ms  "
+                  f"{status}{heavy}")
+
+    return 0 if all(result["ok"] for result in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
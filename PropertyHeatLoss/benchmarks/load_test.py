@@ -0,0 +1,185 @@
+"""
+Load test for the quoting service (quote_service.py) on localhost.
+
+Opens --concurrency keep-alive connections and sends synthetic properties
+(see synthetic.py) to one endpoint as fast as the service answers, for
+--duration seconds after a short warm-up. Reports throughput and the p50,
+p90, p99 and maximum latency, as text and optionally as JSON.
+
+Without --url a service is started in a subprocess on a free port and
+stopped afterwards; pass service options after "--".
+
+Usage:
+    python benchmarks/load_test.py --endpoint quote --concurrency 64 --duration 10
+    python benchmarks/load_test.py --url http://127.0.0.1:8080 --endpoint export
+    python benchmarks/load_test.py -- --max-batch-size 64 --batch-wait-ms 1
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+# synthetic puts the app directory on sys.path
+from synthetic import synthetic_properties
+
+SERVICE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "quote_service.py")
+DEFAULT_WARMUP = 1.0
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _request_bodies(count, batch):
+    """JSON bodies of synthetic properties, batch properties per body (1 sends plain objects)."""
+    records = synthetic_properties(count * batch).astype(object).to_dict("records")
+    for record in records:
+        record["floor_area"] = int(record["floor_area"])
+        record["num_bedrooms"] = int(record["num_bedrooms"])
+    if batch == 1:
+        return [json.dumps(record).encode() for record in records]
+    return [json.dumps(records[start:start + batch]).encode() for start in range(0, len(records), batch)]
+
+async def _read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = 0
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+async def _client(host, port, path, bodies, offset, stop_at, record_from, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        position = offset
+        while time.perf_counter() < stop_at:
+            body = bodies[position % len(bodies)]
+            position += 1
+            request = (
+                f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n"
+            ).encode() + body
+            started = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status = await _read_response(reader)
+            finished = time.perf_counter()
+            if started >= record_from:
+                latencies.append(finished - started)
+                statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+def _percentile(ordered, q):
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+async def run_load(url, endpoint="quote", concurrency=32, duration=10.0, warmup=DEFAULT_WARMUP, batch=1):
+    """
+    Drive a running service and measure it.
+
+    Args:
+        url: Base URL of the service, e.g. http://127.0.0.1:8080
+        endpoint: calculate, quote or export
+        concurrency: Connections sending requests at once
+        duration: Seconds measured, after the warm-up
+        warmup: Seconds of load before measuring starts
+        batch: Properties per request (export always sends one)
+
+    Returns:
+        A dictionary with the request and property counts, throughput,
+        latency percentiles (ms) and the count of each status code
+    """
+    parts = urlsplit(url)
+    bodies = _request_bodies(max(concurrency * 8, 256), 1 if endpoint == "export" else batch)
+    latencies = []
+    statuses = {}
+    record_from = time.perf_counter() + warmup
+    stop_at = record_from + duration
+    await asyncio.gather(*(
+        _client(parts.hostname, parts.port, f"/{endpoint}", bodies, client * 8, stop_at, record_from,
+                latencies, statuses)
+        for client in range(concurrency)
+    ))
+
+    ordered = sorted(latencies)
+    requests = len(ordered)
+    properties_per_request = 1 if endpoint == "export" else batch
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "properties_per_request": properties_per_request,
+        "requests": requests,
+        "requests_per_second": requests / duration,
+        "properties_per_second": requests * properties_per_request / duration,
+        "p50_ms": _percentile(ordered, 0.50) * 1000 if ordered else None,
+        "p90_ms": _percentile(ordered, 0.90) * 1000 if ordered else None,
+        "p99_ms": _percentile(ordered, 0.99) * 1000 if ordered else None,
+        "max_ms": ordered[-1] * 1000 if ordered else None,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())}
+    }
+
+def _wait_until_listening(port, process, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("The quoting service exited during start-up")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"The quoting service did not start listening on port {port}")
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    service_args = []
+    if "--" in argv:
+        position = argv.index("--")
+        argv, service_args = argv[:position], argv[position + 1:]
+
+    parser = argparse.ArgumentParser(description="Load test the quoting service on localhost.")
+    parser.add_argument("--url", default=None, help="running service to test (default: start one)")
+    parser.add_argument("--endpoint", choices=["calculate", "quote", "export"], default="quote")
+    parser.add_argument("--concurrency", type=int, default=32, help="connections sending at once")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds measured")
+    parser.add_argument("--warmup", type=float, default=DEFAULT_WARMUP, help="seconds before measuring")
+    parser.add_argument("--batch", type=int, default=1, help="properties per calculate/quote request")
+    parser.add_argument("--output", default=None, help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    process = None
+    url = args.url
+    if url is None:
+        port = _free_port()
+        process = subprocess.Popen([sys.executable, SERVICE_PATH, "--port", str(port)] + service_args)
+        _wait_until_listening(port, process)
+        url = f"http://127.0.0.1:{port}"
+
+    try:
+        results = asyncio.run(run_load(url, args.endpoint, args.concurrency, args.duration, args.warmup, args.batch))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print(f"{results['endpoint']}: {results['requests']:,} requests in {args.duration:g}s "
+          f"({results['requests_per_second']:,.0f} req/s, {results['properties_per_second']:,.0f} properties/s) "
+          f"with {results['concurrency']} connections")
+    if results["requests"]:
+        print(f"latency ms: p50 {results['p50_ms']:.2f}  p90 {results['p90_ms']:.2f}  "
+              f"p99 {results['p99_ms']:.2f}  max {results['max_ms']:.2f}")
+    print(f"status codes: {results['statuses']}")
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(results, handle, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Peak memory of the streaming quotation pipeline versus loading a whole file.
+
+For each input size a synthetic CSV is written, then quoted in a fresh
+process twice: once through quotation_pipeline.run_pipeline (streaming) and
+once by reading the whole file, quoting it and writing it in one go. The
+peak resident set size of each process is reported.
+
+Usage:
+    python benchmarks/pipeline_memory.py --rows 100000 1000000 3000000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from synthetic import write_synthetic_csv
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_STREAMING = """
+import resource, sys
+from quotation_pipeline import CsvSink, run_pipeline
+with CsvSink(sys.argv[2]) as sink:
+    run_pipeline(sys.argv[1], sink, chunk_size=int(sys.argv[3]))
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+_WHOLE_FILE = """
+import resource, sys
+import pandas as pd
+from product_packs import get_product_packs
+from quotation_pipeline import quote_frame
+quote_frame(pd.read_csv(sys.argv[1]), get_product_packs()).to_csv(sys.argv[2], index=False)
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+def _peak_rss_mb(script, input_path, output_path, chunk_size):
+    """Run a measurement script in a fresh interpreter and return its peak RSS in MB."""
+    result = subprocess.run(
+        [sys.executable, "-c", script, input_path, output_path, str(chunk_size)],
+        cwd=APP_DIR, env=dict(os.environ, PYTHONPATH=APP_DIR),
+        check=True, capture_output=True, text=True
+    )
+    # ru_maxrss is reported in kilobytes on Linux
+    return int(result.stdout.strip().splitlines()[-1]) / 1024
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--chunk-size", type=int, default=20_000)
+    parser.add_argument("--skip-whole-file", action="store_true",
+                        help="only measure the streaming pipeline")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        input_path = os.path.join(workdir, "properties.csv")
+        output_path = os.path.join(workdir, "quotes.csv")
+        for rows in args.rows:
+            write_synthetic_csv(input_path, rows)
+            result = {
+                "rows": rows,
+                "streaming_peak_mb": round(_peak_rss_mb(_STREAMING, input_path, output_path, args.chunk_size), 1)
+            }
+            if not args.skip_whole_file:
+                result["whole_file_peak_mb"] = round(_peak_rss_mb(_WHOLE_FILE, input_path, output_path, 0), 1)
+            results.append(result)
+            print(json.dumps(result), flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+Benchmark suite for the calculator, quotation and export hot paths.
+
+Times calculate_heat_loss, generate_quotation and create_pdf_content (one
+call per property), their batch equivalents and the app.py submit path
+against synthetic populations and catalogues (see synthetic.py). Results are
+written as JSON; --compare checks them against a stored baseline and exits
+with status 1 when a case is slower by more than --threshold.
+
+Usage:
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --rows 1 1000 --packs 5 100 --compare baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+# synthetic puts the app directory on sys.path, so it is imported first
+from synthetic import synthetic_catalogue, synthetic_properties
+
+from calculation_cache import QuotationCache
+from heat_loss_calculator import calculate_heat_loss, calculate_heat_loss_batch
+from pack_index import get_pack_index
+from pdf_export import create_pdf_content
+from quotation_generator import compare_packs_batch, generate_quotation, generate_quotation_batch
+from quotation_views import build_quotation_views, quotation_fingerprint
+
+DEFAULT_ROWS = [1, 1_000, 100_000, 1_000_000]
+DEFAULT_PACKS = [5, 100, 1_000, 10_000]
+# Population used when sweeping catalogue sizes with the per-property functions
+CATALOGUE_SWEEP_ROWS = 1_000
+# Per-property (scalar) cases above this many rows are skipped
+DEFAULT_MAX_SCALAR_ROWS = 100_000
+# Cases quicker than this are looped within each timing
+MIN_TIMING_SECONDS = 0.05
+# Largest properties x packs grid priced by the every-pack benchmark
+MAX_COMPARE_CELLS = 10_000_000
+# Slowdown (as a fraction) reported as a regression by --compare
+DEFAULT_THRESHOLD = 0.15
+
+def _heat_loss_scalar(data):
+    for property_data in data["records"]:
+        calculate_heat_loss(property_data)
+
+def _heat_loss_batch(data):
+    calculate_heat_loss_batch(data["frame"])
+
+def _quotation_scalar(data):
+    packs = data["packs"]
+    for property_data, heat_loss in zip(data["records"], data["heat_loss_records"]):
+        generate_quotation(heat_loss, packs, property_data)
+
+def _quotation_batch(data):
+    generate_quotation_batch(data["heat_loss_frame"], data["packs"], data["frame"])
+
+def _compare_packs_batch(data):
+    compare_packs_batch(data["heat_loss_frame"], data["packs"], data["frame"])
+
+def _pdf_content(data):
+    for property_data, heat_loss, quotation in zip(data["records"], data["heat_loss_records"], data["quotations"]):
+        create_pdf_content(heat_loss, quotation, property_data)
+
+def _app_submit(data):
+    """The work app.py does for each form submission, starting from an empty cache."""
+    cache = QuotationCache(maxsize=max(len(data["records"]), 1))
+    packs = data["packs"]
+    for property_data in data["records"]:
+        heat_loss = cache.calculate_heat_loss(property_data)
+        quotation = cache.generate_quotation(heat_loss, packs, property_data)
+        build_quotation_views(heat_loss, quotation)
+        quotation_fingerprint(heat_loss, quotation)
+
+# Benchmark name -> (function, per property, needs quotations, largest population).
+# app_submit replays one form submission per row, so it is capped at a
+# realistic number of submissions rather than a portfolio.
+BENCHMARKS = {
+    "calculate_heat_loss": (_heat_loss_scalar, True, False, None),
+    "calculate_heat_loss_batch": (_heat_loss_batch, False, False, None),
+    "generate_quotation": (_quotation_scalar, True, False, None),
+    "generate_quotation_batch": (_quotation_batch, False, False, None),
+    "compare_packs_batch": (_compare_packs_batch, False, False, None),
+    "create_pdf_content": (_pdf_content, True, True, None),
+    "app_submit": (_app_submit, True, False, 1_000)
+}
+
+class _Inputs:
+    """Builds and memoizes the populations, catalogues and precomputed inputs."""
+
+    def __init__(self, seed, max_scalar_rows):
+        self.seed = seed
+        self.max_scalar_rows = max_scalar_rows
+        self._frames = {}
+        self._records = {}
+        self._catalogues = {}
+        self._heat_loss = {}
+        self._quotations = {}
+
+    def frame(self, rows):
+        if rows not in self._frames:
+            self._frames[rows] = synthetic_properties(rows, seed=self.seed)
+        return self._frames[rows]
+
+    def records(self, rows):
+        if rows not in self._records:
+            self._records[rows] = self.frame(rows).to_dict("records")
+        return self._records[rows]
+
+    def catalogue(self, packs):
+        if packs not in self._catalogues:
+            catalogue = synthetic_catalogue(packs, seed=self.seed)
+            get_pack_index(catalogue)
+            self._catalogues[packs] = catalogue
+        return self._catalogues[packs]
+
+    def heat_loss(self, rows):
+        if rows not in self._heat_loss:
+            frame = calculate_heat_loss_batch(self.frame(rows))
+            self._heat_loss[rows] = (frame, [calculate_heat_loss(record) for record in self.records(rows)]
+                                     if rows <= self.max_scalar_rows else None)
+        return self._heat_loss[rows]
+
+    def quotations(self, rows, packs):
+        key = (rows, packs)
+        if key not in self._quotations:
+            catalogue = self.catalogue(packs)
+            _, heat_loss_records = self.heat_loss(rows)
+            self._quotations[key] = [
+                generate_quotation(heat_loss, catalogue, record)
+                for record, heat_loss in zip(self.records(rows), heat_loss_records)
+            ]
+        return self._quotations[key]
+
+    def data(self, rows, packs, per_property, needs_quotation):
+        data = {"frame": self.frame(rows), "packs": self.catalogue(packs)}
+        data["heat_loss_frame"], data["heat_loss_records"] = self.heat_loss(rows)
+        if per_property:
+            data["records"] = self.records(rows)
+        if needs_quotation:
+            data["quotations"] = self.quotations(rows, packs)
+        return data
+
+def plan_cases(rows_list, packs_list, max_scalar_rows=DEFAULT_MAX_SCALAR_ROWS):
+    """
+    List the (benchmark, rows, packs) cases to run.
+
+    Every benchmark runs on each population with the smallest catalogue.
+    The quotation and submit benchmarks also run on every catalogue size,
+    the per-property ones with CATALOGUE_SWEEP_ROWS rows and the batch ones
+    with each population (compare_packs_batch up to MAX_COMPARE_CELLS
+    properties x packs).
+
+    Args:
+        rows_list: Population sizes
+        packs_list: Catalogue sizes
+        max_scalar_rows: Largest population for the per-property benchmarks
+
+    Returns:
+        A list of (benchmark name, rows, packs) tuples
+    """
+    base_packs = min(packs_list)
+    cases = []
+    for name, (_, per_property, _, max_rows) in BENCHMARKS.items():
+        for rows in rows_list:
+            for packs in packs_list:
+                if packs != base_packs:
+                    if name in ("calculate_heat_loss", "calculate_heat_loss_batch", "create_pdf_content"):
+                        continue
+                    if per_property and rows != min(CATALOGUE_SWEEP_ROWS, max(rows_list)):
+                        continue
+                if per_property and rows > max_scalar_rows or max_rows and rows > max_rows:
+                    continue
+                if name == "compare_packs_batch" and rows * packs > MAX_COMPARE_CELLS:
+                    continue
+                cases.append((name, rows, packs))
+
+    return cases
+
+def time_case(function, data, repeat):
+    """
+    Run a benchmark repeat times and return the timings in seconds per run.
+
+    Cases faster than MIN_TIMING_SECONDS are looped enough times per timing
+    to get above it, so microsecond cases are not dominated by timer noise.
+    """
+    started = time.perf_counter()
+    function(data)
+    loops = max(1, min(10_000, int(MIN_TIMING_SECONDS / max(time.perf_counter() - started, 1e-9))))
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(loops):
+            function(data)
+        timings.append((time.perf_counter() - started) / loops)
+    return timings
+
+def run_suite(rows_list=DEFAULT_ROWS, packs_list=DEFAULT_PACKS, repeat=5,
+              max_scalar_rows=DEFAULT_MAX_SCALAR_ROWS, seed=0, progress=None):
+    """
+    Run every planned benchmark case.
+
+    Args:
+        rows_list: Population sizes
+        packs_list: Catalogue sizes
+        repeat: Timed runs per case; the fastest is used for comparisons
+        max_scalar_rows: Largest population for the per-property benchmarks
+        seed: Random seed for the synthetic inputs
+        progress: Optional callback(result) called after each case
+
+    Returns:
+        A dictionary with the run metadata and a list of case results
+    """
+    inputs = _Inputs(seed, max_scalar_rows)
+    results = []
+    for name, rows, packs in plan_cases(rows_list, packs_list, max_scalar_rows):
+        function, per_property, needs_quotation, _ = BENCHMARKS[name]
+        data = inputs.data(rows, packs, per_property, needs_quotation)
+        timings = time_case(function, data, repeat)
+        best = min(timings)
+        result = {
+            "benchmark": name,
+            "rows": rows,
+            "packs": packs,
+            "best_seconds": best,
+            "median_seconds": statistics.median(timings),
+            "rows_per_second": rows / best if best > 0 else None
+        }
+        results.append(result)
+        if progress:
+            progress(result)
+
+    return {
+        "metadata": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeat": repeat,
+            "seed": seed
+        },
+        "results": results
+    }
+
+def _case_key(result):
+    return (result["benchmark"], result["rows"], result["packs"])
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare a run with a baseline run, case by case.
+
+    Args:
+        current: Output of run_suite
+        baseline: A stored output of run_suite
+        threshold: Fractional slowdown of the best time counted as a regression
+
+    Returns:
+        A list of comparison dictionaries for the cases present in both runs
+    """
+    baseline_results = {_case_key(result): result for result in baseline["results"]}
+    comparisons = []
+    for result in current["results"]:
+        before = baseline_results.get(_case_key(result))
+        if before is None or not before["best_seconds"]:
+            continue
+        ratio = result["best_seconds"] / before["best_seconds"]
+        comparisons.append({
+            "benchmark": result["benchmark"],
+            "rows": result["rows"],
+            "packs": result["packs"],
+            "baseline_seconds": before["best_seconds"],
+            "best_seconds": result["best_seconds"],
+            "ratio": ratio,
+            "regression": ratio > 1 + threshold
+        })
+
+    return comparisons
+
+def _print_result(result):
+    rate = f"{result['rows_per_second']:,.0f} rows/s" if result["rows_per_second"] else "-"
+    print(f"{result['benchmark']:<26} rows={result['rows']:<9,} packs={result['packs']:<7,} "
+          f"best={result['best_seconds'] * 1000:>10.2f} ms  {rate}", file=sys.stderr, flush=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the calculator, quotation and export hot paths.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="population sizes")
+    parser.add_argument("--packs", type=int, nargs="+", default=DEFAULT_PACKS, help="catalogue sizes")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case")
+    parser.add_argument("--max-scalar-rows", type=int, default=DEFAULT_MAX_SCALAR_ROWS,
+                        help="largest population for the per-property benchmarks")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results JSON here (default: stdout)")
+    parser.add_argument("--compare", metavar="BASELINE", help="baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="slowdown counted as a regression (default: 0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.rows, args.packs, args.repeat, args.max_scalar_rows, args.seed, _print_result)
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = json.load(handle)
+        report["comparison"] = compare(report, baseline, args.threshold)
+        regressions = [item for item in report["comparison"] if item["regression"]]
+        for item in regressions:
+            print(f"REGRESSION {item['benchmark']} rows={item['rows']} packs={item['packs']}: "
+                  f"{item['ratio']:.2f}x the baseline", file=sys.stderr)
+        if regressions:
+            exit_code = 1
+
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Synthetic property populations and product catalogues for benchmarks.
+
+Rows are drawn uniformly from the questionnaire option lists in
+property_categories and from the numeric ranges of the app.py widgets.
+Catalogues reuse the features and target properties of the bundled packs.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from product_packs import DEFAULT_CATALOGUE_PATH, Catalogue, FrozenPack, load_catalogue  # noqa: E402
+from property_categories import (  # noqa: E402
+    BEDROOM_OPTIONS,
+    CONSTRUCTION_YEAR,
+    INSULATION_LEVEL,
+    LOCATION,
+    PROPERTY_TYPE,
+    WINDOWS_QUALITY
+)
+
+def synthetic_properties(rows, seed=0):
+    """
+    Return a DataFrame of random properties with the questionnaire fields.
+
+    Args:
+        rows: Number of properties
+        seed: Random seed, so populations are reproducible
+
+    Returns:
+        A DataFrame with one property per row
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "property_type": rng.choice(PROPERTY_TYPE.options, rows),
+        "construction_year": rng.choice(CONSTRUCTION_YEAR.options, rows),
+        "floor_area": rng.integers(10, 1001, rows),
+        "ceiling_height": np.round(rng.uniform(2.0, 5.0, rows), 1),
+        "insulation_level": rng.choice(INSULATION_LEVEL.options, rows),
+        "windows_quality": rng.choice(WINDOWS_QUALITY.options, rows),
+        "num_bedrooms": rng.choice(BEDROOM_OPTIONS, rows),
+        "location": rng.choice(LOCATION.options, rows)
+    })
+
+def write_synthetic_csv(path, rows, chunk_size=100_000, seed=0):
+    """Write a synthetic population to CSV in chunks, without holding it all in memory."""
+    for position, start in enumerate(range(0, rows, chunk_size)):
+        chunk = synthetic_properties(min(chunk_size, rows - start), seed=seed + position)
+        chunk.to_csv(path, mode="w" if position == 0 else "a", header=position == 0, index=False)
+
+def synthetic_catalogue(packs, seed=0):
+    """
+    Return a catalogue of random product packs.
+
+    Heat loss ranges are spread over 0-170 kW, which covers the synthetic
+    populations, and each pack gets a random subset of the features and
+    ideal_for tags of the bundled catalogue.
+
+    Args:
+        packs: Number of product packs
+        seed: Random seed, so catalogues are reproducible
+
+    Returns:
+        A Catalogue with a version derived from the size and seed
+    """
+    bundled = load_catalogue(DEFAULT_CATALOGUE_PATH)
+    features = sorted({feature for pack in bundled for feature in pack["features"]})
+    ideal_for = sorted({tag for pack in bundled for tag in pack["ideal_for"]})
+
+    rng = np.random.default_rng(seed)
+    lows = np.round(rng.uniform(0, 150, packs), 1)
+    widths = np.round(rng.uniform(2, 20, packs), 1)
+    prices = np.round(rng.uniform(5000, 20000, packs), 2)
+    records = []
+    for position in range(packs):
+        records.append(FrozenPack({
+            "id": f"pack_{position}",
+            "name": f"Synthetic Pack {position}",
+            "description": "A synthetic product pack for benchmarking.",
+            "min_heat_loss": float(lows[position]),
+            "max_heat_loss": float(lows[position] + widths[position]),
+            "price": float(prices[position]),
+            "features": tuple(rng.choice(features, rng.integers(3, 9), replace=False).tolist()),
+            "ideal_for": tuple(rng.choice(ideal_for, rng.integers(1, 4), replace=False).tolist())
+        }))
+
+    return Catalogue(records, f"synthetic-{packs}-{seed}")
@@ -0,0 +1,188 @@
+import threading
+import time
+from collections import OrderedDict
+
+from heat_loss_calculator import calculate_heat_loss
+from product_packs import catalogue_version
+from property_categories import CONSTRUCTION_YEAR, INSULATION_LEVEL, LOCATION, PROPERTY_TYPE, WINDOWS_QUALITY
+from quotation_generator import generate_quotation
+
+# Sentinel distinguishing a cache miss from a cached None
+_MISSING = object()
+
+def property_key(property_data):
+    """
+    Build a normalized, hashable key for a property.
+
+    Categories are reduced to their registry codes and the measurements to
+    floats, so 100 and 100.0 share an entry. The number of bedrooms does not
+    affect the calculation and is left out of the key.
+
+    Args:
+        property_data: A dictionary containing property information
+
+    Returns:
+        A tuple identifying the calculation inputs
+    """
+    return (
+        PROPERTY_TYPE.codes[property_data["property_type"]],
+        CONSTRUCTION_YEAR.codes[property_data["construction_year"]],
+        float(property_data["floor_area"]),
+        float(property_data["ceiling_height"]),
+        INSULATION_LEVEL.codes[property_data["insulation_level"]],
+        WINDOWS_QUALITY.codes[property_data["windows_quality"]],
+        LOCATION.codes[property_data["location"]]
+    )
+
+class LRUCache:
+    """
+    A thread-safe least-recently-used cache with an optional time to live.
+
+    Args:
+        maxsize: Maximum number of entries kept before the oldest is evicted
+        ttl: Seconds an entry stays valid, or None to keep entries until evicted
+        timer: Clock used for expiry, injectable for testing
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, timer=time.monotonic):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > self._timer():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+
+                del self._entries[key]
+                self.expirations += 1
+
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entry when full."""
+        expires_at = None if self.ttl is None else self._timer() + self.ttl
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached value for key, calling compute() to fill a miss.
+
+        compute runs outside the lock, so two threads missing on the same key
+        may both compute it; the results are identical and the last one wins.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+
+        return value
+
+    def clear(self):
+        """Drop every entry, keeping the counters."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Return the cache counters as a dictionary."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "size": len(self._entries),
+            "maxsize": self.maxsize
+        }
+
+class QuotationCache:
+    """
+    Memoizes calculate_heat_loss and generate_quotation by property key.
+
+    Quotations are also keyed by the product catalogue version, and the
+    quotation entries are dropped as soon as a different catalogue is seen.
+    Cached dictionaries are shared between callers and must not be mutated.
+
+    Args:
+        maxsize: Maximum number of entries in each of the two caches
+        ttl: Seconds an entry stays valid, or None for no expiry
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.heat_loss_cache = LRUCache(maxsize, ttl)
+        self.quotation_cache = LRUCache(maxsize, ttl)
+        self.catalogue_version = None
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def calculate_heat_loss(self, property_data):
+        """Cached equivalent of heat_loss_calculator.calculate_heat_loss."""
+        return self.heat_loss_cache.get_or_compute(
+            property_key(property_data),
+            lambda: calculate_heat_loss(property_data)
+        )
+
+    def generate_quotation(self, heat_loss, product_packs, property_data):
+        """Cached equivalent of quotation_generator.generate_quotation."""
+        version = catalogue_version(product_packs)
+        self._check_catalogue(version)
+
+        key = (
+            property_key(property_data),
+            heat_loss["total_heat_loss"],
+            heat_loss["efficiency_rating"],
+            version
+        )
+        return self.quotation_cache.get_or_compute(
+            key,
+            lambda: generate_quotation(heat_loss, product_packs, property_data)
+        )
+
+    def _check_catalogue(self, version):
+        """Invalidate cached quotations when the catalogue version changes."""
+        if version == self.catalogue_version:
+            return
+
+        with self._lock:
+            if version != self.catalogue_version:
+                if self.catalogue_version is not None:
+                    self.quotation_cache.clear()
+                    self.invalidations += 1
+                self.catalogue_version = version
+
+    def clear(self):
+        """Drop all cached calculations and quotations."""
+        self.heat_loss_cache.clear()
+        self.quotation_cache.clear()
+
+    def stats(self):
+        """Return counters for both caches and the catalogue invalidations."""
+        return {
+            "heat_loss": self.heat_loss_cache.stats(),
+            "quotation": self.quotation_cache.stats(),
+            "catalogue_version": self.catalogue_version,
+            "invalidations": self.invalidations
+        }
@@ -0,0 +1,299 @@
+"""
+Hourly heat demand simulation over a design year for each region.
+
+calculate_heat_loss sizes a property at a fixed 20 °C temperature
+difference. This module spreads the same fabric and ventilation losses over
+a year of hourly outdoor temperatures for the property's region, giving:
+
+- heat_transfer_coefficient  the property's UA value (kW/K)
+- design_temperature         the region's coldest hour (°C)
+- peak_design_load           UA × (INDOOR_TEMP - design temperature), in kW
+- annual_heating_kwh         UA × the region's heating degree-hours
+
+Heating is needed whenever the outdoor temperature is below BALANCE_TEMP;
+the gap to INDOOR_TEMP is covered by internal and solar gains, as in the
+usual degree-day method.
+
+The temperatures come from climate_design_year.npy, one row of 8760 hours
+per LOCATION option. The file is synthetic, not measured weather: each
+region is a seasonal and daily cycle around a typical annual mean, with
+seeded random weather whose coldest hour is a typical design temperature
+(REGION_CLIMATES). Rebuild it with:
+
+    python climate.py build
+
+The file is memory-mapped read-only, so every process on the machine
+shares the same pages.
+"""
+import os
+from functools import lru_cache
+
+from heat_loss_calculator import BASE_TEMP_DIFF, category_codes, factor_array
+from property_categories import LOCATION
+
+CLIMATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "climate_design_year.npy")
+HOURS_PER_YEAR = 8760
+# Temperature the heating holds indoors (°C), used for the design load
+INDOOR_TEMP = 21.0
+# Outdoor temperature above which gains alone keep the house warm (°C)
+BALANCE_TEMP = 15.5
+
+# Parameters of the synthetic design year for each region: annual mean,
+# seasonal half-range, daily half-range and design (coldest hour) temperature
+# in °C, close to typical values for a representative town in each region
+REGION_CLIMATES = {
+    "North": (9.8, 6.4, 3.4, -3.0),
+    "Midlands": (9.9, 6.9, 3.9, -3.4),
+    "South": (11.2, 7.0, 4.0, -1.8),
+    "Scotland": (8.6, 5.9, 3.1, -4.4),
+    "Wales": (10.4, 6.2, 3.4, -2.0),
+    "Northern Ireland": (9.4, 5.6, 3.0, -1.2)
+}
+
+def build_design_year(region, seed=0):
+    """
+    Generate the synthetic hourly design year for one region.
+
+    Args:
+        region: A LOCATION option
+        seed: Random seed for the weather noise
+
+    Returns:
+        A float32 NumPy array of HOURS_PER_YEAR outdoor temperatures (°C)
+    """
+    import numpy as np
+
+    mean, seasonal, daily, design = REGION_CLIMATES[region]
+    hours = np.arange(HOURS_PER_YEAR, dtype=float)
+    days = hours / 24
+
+    # Coldest around 20 January, warmest in the afternoon
+    temperature = mean - seasonal * np.cos(2 * np.pi * (days - 20) / 365)
+    temperature -= daily * np.cos(2 * np.pi * (hours % 24 - 3) / 24)
+
+    # Weather: slowly varying noise (AR(1), about 2.5 °C standard deviation)
+    generator = np.random.default_rng([seed, LOCATION.code(region)])
+    steps = generator.normal(0.0, 2.5 * np.sqrt(1 - 0.98 ** 2), HOURS_PER_YEAR)
+    weather = np.empty(HOURS_PER_YEAR)
+    weather[0] = generator.normal(0.0, 2.5)
+    for hour in range(1, HOURS_PER_YEAR):
+        weather[hour] = 0.98 * weather[hour - 1] + steps[hour]
+    temperature += weather
+
+    # Stretch (or compress) the hours colder than the typical winter mean so
+    # the coldest hour of the year lands exactly on the design temperature
+    winter = mean - seasonal
+    coldest = temperature.min()
+    cold = temperature < winter
+    temperature[cold] = winter + (temperature[cold] - winter) * (winter - design) / (winter - coldest)
+
+    return temperature.astype(np.float32)
+
+def write_climate_file(path=CLIMATE_PATH, seed=0):
+    """
+    Build every region's design year and save them as one .npy file.
+
+    Args:
+        path: Output file
+        seed: Random seed for the weather noise
+    """
+    import numpy as np
+
+    years = np.stack([build_design_year(region, seed) for region in LOCATION.options])
+    np.save(path, years)
+
+@lru_cache(maxsize=None)
+def design_years(path=CLIMATE_PATH):
+    """
+    Return the hourly temperatures of every region, memory-mapped read-only.
+
+    Args:
+        path: Climate file (default: the bundled design year)
+
+    Returns:
+        A float32 array of shape (len(LOCATION.options), HOURS_PER_YEAR),
+        one row per LOCATION option in code order
+    """
+    import numpy as np
+
+    years = np.load(path, mmap_mode="r")
+    if years.shape != (len(LOCATION.options), HOURS_PER_YEAR):
+        raise ValueError(f"{path} holds {years.shape}, expected {(len(LOCATION.options), HOURS_PER_YEAR)}")
+    return years
+
+def design_year(region):
+    """Return one region's hourly outdoor temperatures (°C)."""
+    return design_years()[LOCATION.code(region)]
+
+def design_temperature(region):
+    """Return one region's design (coldest hour) outdoor temperature (°C)."""
+    return float(region_tables()["design_temperature"][LOCATION.code(region)])
+
+def heating_deficit(temperatures):
+    """
+    Return the Kelvin below the balance point, hour by hour; demand is UA times this.
+
+    Args:
+        temperatures: Hourly outdoor temperatures (°C), e.g. rows of design_years()
+
+    Returns:
+        A float64 array shaped like temperatures
+    """
+    import numpy as np
+
+    return np.maximum(BALANCE_TEMP - np.asarray(temperatures, dtype=float), 0.0)
+
+@lru_cache(maxsize=None)
+def region_tables():
+    """
+    Per-region design temperatures and degree-hours, one value per LOCATION code.
+
+    Only these sums are kept: the hourly temperatures stay in the shared
+    memory-mapped file, and the hourly deficit is derived from them by
+    heating_deficit where a caller needs it.
+    """
+    import numpy as np
+
+    years = design_years()
+    design_temperature = np.empty(len(years))
+    degree_hours = np.empty(len(years))
+    # One region at a time, so only one row is ever converted to float64
+    for code, temperatures in enumerate(years):
+        design_temperature[code] = temperatures.min()
+        degree_hours[code] = heating_deficit(temperatures).sum()
+    return {
+        "design_temperature": design_temperature,
+        "degree_hours": degree_hours
+    }
+
+def heat_transfer_coefficient(total_heat_loss, location_factor):
+    """Return the UA value (kW/K) behind a calculate_heat_loss total and its region's factor."""
+    # calculate_heat_loss scales the fabric losses by the regional factor;
+    # the climate data replaces that factor here
+    return total_heat_loss / (BASE_TEMP_DIFF * location_factor)
+
+def batch_coefficients(heat_loss, properties):
+    """Return the location codes and UA values (kW/K) of a batch of properties."""
+    codes = category_codes(properties["location"], LOCATION)
+    ua = heat_transfer_coefficient(heat_loss["total_heat_loss"].to_numpy(), factor_array(LOCATION.field)[codes])
+    return codes, ua
+
+def simulate_heat_demand(heat_loss, property_data, hourly=False):
+    """
+    Simulate one property's heat demand over its region's design year.
+
+    Args:
+        heat_loss: The dictionary returned by calculate_heat_loss
+        property_data: A dictionary containing property information
+        hourly: Also return the hourly demand (kW) as an array
+
+    Returns:
+        A dictionary with the heat transfer coefficient (kW/K), design
+        temperature (°C), peak design load (kW) and annual heating demand
+        (kWh), plus "hourly_demand" when requested
+    """
+    code = LOCATION.code(property_data["location"])
+    tables = region_tables()
+    ua = heat_transfer_coefficient(heat_loss["total_heat_loss"], LOCATION.factors[code])
+    design_temperature = float(tables["design_temperature"][code])
+
+    result = {
+        "heat_transfer_coefficient": ua,
+        "design_temperature": design_temperature,
+        "peak_design_load": ua * (INDOOR_TEMP - design_temperature),
+        "annual_heating_kwh": ua * float(tables["degree_hours"][code])
+    }
+    if hourly:
+        result["hourly_demand"] = ua * heating_deficit(design_years()[code])
+
+    return result
+
+def simulate_heat_demand_batch(heat_loss, properties):
+    """
+    Simulate the heat demand of many properties at once.
+
+    Demand is linear in UA, so a property's annual total is its UA times
+    its region's degree-hours; the N × 8760 demand matrix is only built by
+    hourly_demand_batch.
+
+    Args:
+        heat_loss: DataFrame returned by calculate_heat_loss_batch
+        properties: The DataFrame (or mapping of columns) the heat loss was
+            calculated from; locations may be labels or registry codes
+
+    Returns:
+        A DataFrame indexed like heat_loss with the same columns as the
+        dictionary returned by simulate_heat_demand
+    """
+    import pandas as pd
+
+    codes, ua = batch_coefficients(heat_loss, properties)
+    tables = region_tables()
+    design_temperature = tables["design_temperature"][codes]
+
+    return pd.DataFrame(
+        {
+            "heat_transfer_coefficient": ua,
+            "design_temperature": design_temperature,
+            "peak_design_load": ua * (INDOOR_TEMP - design_temperature),
+            "annual_heating_kwh": ua * tables["degree_hours"][codes]
+        },
+        index=heat_loss.index
+    )
+
+def hourly_demand_batch(heat_loss, properties, dtype="float32"):
+    """
+    Return the hourly demand of every property as one N × 8760 matrix.
+
+    Computed as a single broadcast of each property's UA over its region's
+    hourly heating deficit. At float32 each property takes 35 kB, so pass
+    large portfolios in chunks or use portfolio_hourly_demand.
+
+    Args:
+        heat_loss: DataFrame returned by calculate_heat_loss_batch
+        properties: The properties the heat loss was calculated from
+        dtype: NumPy dtype of the result
+
+    Returns:
+        An array of shape (N, HOURS_PER_YEAR) of demand in kW
+    """
+    codes, ua = batch_coefficients(heat_loss, properties)
+    # Gather each property's regional row, then scale the rows in place
+    demand = heating_deficit(design_years()).astype(dtype, copy=False)[codes]
+    demand *= ua.astype(dtype)[:, None]
+    return demand
+
+def portfolio_hourly_demand(heat_loss, properties):
+    """
+    Return the combined hourly demand of a portfolio of properties.
+
+    The UA values are summed per region first, so the result is one small
+    (regions × 8760) matrix product whatever the portfolio size.
+
+    Args:
+        heat_loss: DataFrame returned by calculate_heat_loss_batch
+        properties: The properties the heat loss was calculated from
+
+    Returns:
+        A float64 array of HOURS_PER_YEAR total demands in kW
+    """
+    import numpy as np
+
+    codes, ua = batch_coefficients(heat_loss, properties)
+    regional_ua = np.bincount(codes, weights=ua, minlength=len(LOCATION.options))
+    return regional_ua @ heating_deficit(design_years())
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the bundled design-year climate file.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="regenerate the synthetic design year")
+    build.add_argument("--output", default=CLIMATE_PATH, help="file to write")
+    build.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    write_climate_file(args.output, args.seed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+from bisect import bisect_right
+
+from pack_index import heat_loss_regions, region_of
+from product_packs import CatalogueCache
+
+# Number of catalogue versions whose index is kept in memory
+_MAX_INDEXES = 8
+
+def _intern(packs, field):
+    """
+    Give every distinct string of a list field an integer id.
+
+    Returns:
+        The strings in id order (first appearance in the catalogue), each
+        pack's ids in its own listing order, each pack's bitset of ids and
+        each id's bitset of pack positions
+    """
+    ids = {}
+    orders = []
+    pack_bits = []
+    packs_with = []
+    for position, pack in enumerate(packs):
+        order = []
+        bits = 0
+        for value in pack[field]:
+            value_id = ids.get(value)
+            if value_id is None:
+                value_id = ids[value] = len(ids)
+                packs_with.append(0)
+            if not bits >> value_id & 1:
+                order.append(value_id)
+                bits |= 1 << value_id
+                packs_with[value_id] |= 1 << position
+        orders.append(tuple(order))
+        pack_bits.append(bits)
+    return tuple(ids), orders, pack_bits, packs_with
+
+class FeatureIndex:
+    """
+    Interned features and ideal_for tags of a catalogue, as bitsets.
+
+    Every distinct feature and ideal_for string gets an integer id once,
+    when the index is built. Each pack then holds a bitset of its ids and
+    each id a bitset of the pack positions that list it, so a filter is a
+    handful of integer ANDs and a comparison cell is one bit test: no
+    string is compared after construction. Price and heat loss filters are
+    bitsets too, looked up by binary search: the packs up to each price in
+    price order, and the packs covering each elementary heat loss region
+    (the same regions as PackIndex).
+
+        index = get_feature_index(product_packs)
+        packs = index.find(features=["Smart thermostat with app control",
+                                     "Basic underfloor heating compatibility"],
+                           max_price=10000, heat_loss=12)
+
+    Args:
+        product_packs: List of product pack dictionaries
+    """
+
+    def __init__(self, product_packs):
+        self.packs = list(product_packs)
+        self._positions = {}
+        for position, pack in enumerate(self.packs):
+            self._positions.setdefault(pack["id"], position)
+        self._all = (1 << len(self.packs)) - 1
+
+        self.features, self._feature_order, self._pack_features, self._packs_with_feature = \
+            _intern(self.packs, "features")
+        self.tags, self._tag_order, self._pack_tags, self._packs_with_tag = _intern(self.packs, "ideal_for")
+        self._feature_ids = {feature: feature_id for feature_id, feature in enumerate(self.features)}
+        self._tag_ids = {tag: tag_id for tag_id, tag in enumerate(self.tags)}
+
+        # Packs among the k cheapest, for every k
+        by_price = sorted(range(len(self.packs)), key=lambda i: self.packs[i]["price"])
+        self._prices = [self.packs[i]["price"] for i in by_price]
+        self._cheapest = [0]
+        for position in by_price:
+            self._cheapest.append(self._cheapest[-1] | 1 << position)
+
+        self._bounds, covering = heat_loss_regions(self.packs)
+        self._covering = [sum(1 << position for position in positions) for positions in covering]
+
+    def feature_mask(self, features):
+        """Return the bitset of the packs listing every one of the features."""
+        mask = self._all
+        for feature in features:
+            feature_id = self._feature_ids.get(feature)
+            if feature_id is None:
+                return 0
+            mask &= self._packs_with_feature[feature_id]
+        return mask
+
+    def tag_mask(self, tags):
+        """Return the bitset of the packs ideal for any of the tags."""
+        mask = 0
+        for tag in tags:
+            tag_id = self._tag_ids.get(tag)
+            if tag_id is not None:
+                mask |= self._packs_with_tag[tag_id]
+        return mask
+
+    def price_mask(self, max_price):
+        """Return the bitset of the packs priced at most max_price."""
+        return self._cheapest[bisect_right(self._prices, max_price)]
+
+    def heat_loss_mask(self, total_heat_loss):
+        """Return the bitset of the packs whose range covers the heat loss."""
+        return self._covering[region_of(self._bounds, total_heat_loss)]
+
+    def packs_in(self, mask):
+        """Return the packs of a bitset, in catalogue order."""
+        packs = []
+        while mask:
+            lowest = mask & -mask
+            packs.append(self.packs[lowest.bit_length() - 1])
+            mask ^= lowest
+        return packs
+
+    def find(self, features=(), ideal_for=(), max_price=None, heat_loss=None):
+        """
+        Return the packs matching every given filter.
+
+        Args:
+            features: Features a pack must all list
+            ideal_for: Tags of which a pack must list at least one
+            max_price: Highest pack price
+            heat_loss: Total heat loss (kW) the pack's range must cover
+
+        Returns:
+            A list of the matching packs, in catalogue order
+        """
+        mask = self.feature_mask(features)
+        if ideal_for:
+            mask &= self.tag_mask(ideal_for)
+        if max_price is not None:
+            mask &= self.price_mask(max_price)
+        if heat_loss is not None:
+            mask &= self.heat_loss_mask(heat_loss)
+        return self.packs_in(mask)
+
+    def position(self, pack):
+        """
+        Return a pack's catalogue position, or None if this catalogue does not hold it.
+
+        Packs are matched by identity, not by comparing their contents: pass
+        the pack dictionaries of the catalogue the index was built from.
+        """
+        position = self._positions.get(pack["id"])
+        if position is None or self.packs[position] is not pack:
+            return None
+        return position
+
+    def covers(self, packs):
+        """Return True if every pack is one of this catalogue's own pack dictionaries."""
+        return all(self.position(pack) is not None for pack in packs)
+
+    def comparison(self, packs, leading=None):
+        """
+        Build the feature and ideal_for matrix of some packs of the catalogue.
+
+        Rows are every feature (then every tag) listed by the leading packs:
+        the first pack's in its own order, then the others' in turn.
+
+        Args:
+            packs: Packs held by this index (see covers)
+            leading: How many of the first packs give the rows (default: all)
+
+        Returns:
+            A tuple of two lists, for the features and the tags, of
+            (name, [whether each pack lists it])
+        """
+        positions = [self.position(pack) for pack in packs]
+        leading = positions[:leading]
+        return (
+            self._matrix(positions, leading, self._feature_order, self._pack_features, self.features),
+            self._matrix(positions, leading, self._tag_order, self._pack_tags, self.tags)
+        )
+
+    @staticmethod
+    def _matrix(positions, leading, orders, pack_bits, names):
+        bits = [pack_bits[position] for position in positions]
+        seen = 0
+        rows = []
+        for position in leading:
+            for value_id in orders[position]:
+                if not seen >> value_id & 1:
+                    seen |= 1 << value_id
+                    rows.append((names[value_id], [bool(pack >> value_id & 1) for pack in bits]))
+        return rows
+
+_indexes = CatalogueCache(FeatureIndex, maxsize=_MAX_INDEXES)
+
+def get_feature_index(product_packs):
+    """
+    Return the FeatureIndex for a catalogue, building it once per catalogue version.
+
+    Args:
+        product_packs: List of product pack dictionaries
+
+    Returns:
+        A FeatureIndex over the catalogue
+    """
+    return _indexes.get(product_packs)
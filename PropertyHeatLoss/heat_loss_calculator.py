@@ -1,5 +1,24 @@
-import pandas as pd
+from functools import lru_cache
 
+# NumPy and pandas are only needed by the batch engine and are imported
+# where they are used, so the scalar calculator loads without them
+from metrics import timed
+from property_categories import (
+    CATEGORIES,
+    CONSTRUCTION_YEAR,
+    EFFICIENCY_RATINGS,
+    EFFICIENCY_THRESHOLDS,
+    INSULATION_LEVEL,
+    LOCATION,
+    PROPERTY_TYPE,
+    WINDOWS_QUALITY,
+    efficiency_rating_for
+)
+
+# Temperature difference between inside and outside the fabric losses are sized at (°C)
+BASE_TEMP_DIFF = 20
+
+@timed("calculate_heat_loss")
 def calculate_heat_loss(property_data):
     """
     Calculate the heat loss of a property based on its characteristics.
@@ -20,52 +39,16 @@ def calculate_heat_loss(property_data):
     num_bedrooms = property_data["num_bedrooms"]
     location = property_data["location"]
     
+    # Look up the category factors from the shared registry tables
+    insulation_factor = INSULATION_LEVEL.factor(insulation_level)
+    window_factor = WINDOWS_QUALITY.factor(windows_quality)
+    construction_factor = CONSTRUCTION_YEAR.factor(construction_year)
+    property_type_factor = PROPERTY_TYPE.factor(property_type)
+    location_factor = LOCATION.factor(location)
+    
     # Calculate volume
     volume = floor_area * ceiling_height
     
-    # Base heat loss factors (W/m²K)
-    # These are approximate U-values used for estimation
-    insulation_factors = {
-        "Poor": 1.5,
-        "Below Average": 1.2,
-        "Average": 1.0,
-        "Good": 0.8,
-        "Excellent": 0.6
-    }
-    
-    window_factors = {
-        "Single Glazed": 5.0,
-        "Double Glazed (Old)": 3.0,
-        "Double Glazed (New)": 1.8,
-        "Triple Glazed": 1.0
-    }
-    
-    construction_factors = {
-        "Pre-1919": 1.4,
-        "1919-1944": 1.3,
-        "1945-1964": 1.2,
-        "1965-1980": 1.1,
-        "1981-2000": 0.9,
-        "Post-2000": 0.7
-    }
-    
-    property_type_factors = {
-        "Detached House": 1.3,
-        "Semi-Detached House": 1.1,
-        "Terraced House": 1.0,
-        "Apartment/Flat": 0.9,
-        "Bungalow": 1.2
-    }
-    
-    location_factors = {
-        "North": 1.15,
-        "Midlands": 1.05,
-        "South": 1.0,
-        "Scotland": 1.2,
-        "Wales": 1.1,
-        "Northern Ireland": 1.1
-    }
-    
     # Apply factors to calculate component heat losses
     
     # Determine wall area (approximate)
@@ -73,24 +56,24 @@ def calculate_heat_loss(property_data):
     wall_area = perimeter * ceiling_height
     
     # Calculate individual component heat losses
-    base_temp_diff = 20  # Base temperature difference between inside and outside (°C)
+    base_temp_diff = BASE_TEMP_DIFF  # Base temperature difference between inside and outside (°C)
     
     # Wall heat loss
-    wall_u_value = 1.0 * insulation_factors[insulation_level] * construction_factors[construction_year]
+    wall_u_value = 1.0 * insulation_factor * construction_factor
     wall_loss = wall_area * wall_u_value * base_temp_diff / 1000  # Convert W to kW
     
     # Roof heat loss (estimated as 25% of floor area)
     roof_area = floor_area
-    roof_u_value = 0.8 * insulation_factors[insulation_level] * construction_factors[construction_year]
+    roof_u_value = 0.8 * insulation_factor * construction_factor
     roof_loss = roof_area * roof_u_value * base_temp_diff / 1000
     
     # Window heat loss (estimated as 15% of wall area)
     window_area = wall_area * 0.15
-    window_u_value = window_factors[windows_quality]
+    window_u_value = window_factor
     window_loss = window_area * window_u_value * base_temp_diff / 1000
     
     # Floor heat loss
-    floor_u_value = 0.7 * insulation_factors[insulation_level] * construction_factors[construction_year]
+    floor_u_value = 0.7 * insulation_factor * construction_factor
     floor_loss = floor_area * floor_u_value * base_temp_diff / 1000
     
     # Ventilation heat loss
@@ -100,23 +83,13 @@ def calculate_heat_loss(property_data):
     
     # Calculate total heat loss
     total_heat_loss = (wall_loss + roof_loss + window_loss + floor_loss + ventilation_loss) * \
-                      property_type_factors[property_type] * location_factors[location]
+                      property_type_factor * location_factor
     
     # Heat loss per m²
     heat_loss_per_sqm = (total_heat_loss * 1000) / floor_area  # W/m²
     
     # Determine efficiency rating based on heat loss per m²
-    efficiency_rating = "F"
-    if heat_loss_per_sqm < 40:
-        efficiency_rating = "A"
-    elif heat_loss_per_sqm < 60:
-        efficiency_rating = "B"
-    elif heat_loss_per_sqm < 90:
-        efficiency_rating = "C"
-    elif heat_loss_per_sqm < 120:
-        efficiency_rating = "D"
-    elif heat_loss_per_sqm < 150:
-        efficiency_rating = "E"
+    efficiency_rating = efficiency_rating_for(heat_loss_per_sqm)
     
     # Create result dictionary
     result = {
@@ -131,3 +104,209 @@ def calculate_heat_loss(property_data):
     }
     
     return result
+
+
+# Fields every property record must provide, in the order used by the questionnaire
+PROPERTY_FIELDS = [
+    "property_type",
+    "construction_year",
+    "floor_area",
+    "ceiling_height",
+    "insulation_level",
+    "windows_quality",
+    "num_bedrooms",
+    "location"
+]
+
+@lru_cache(maxsize=None)
+def factor_array(field):
+    """
+    Return a category's factors as an array, built once for the batch engine.
+    
+    The array is shared by every caller, so it is read-only.
+    
+    Args:
+        field: A property_categories.CATEGORIES field name
+        
+    Returns:
+        A float NumPy array of factors indexed by option code
+    """
+    import numpy as np
+    
+    factors = np.array(CATEGORIES[field].factors, dtype=float)
+    factors.flags.writeable = False
+    return factors
+
+def category_codes(values, category):
+    """
+    Encode a column of category labels as registry integer codes.
+    
+    Integer columns are taken to be codes already and are only range-checked.
+    Categorical columns whose categories are the registry options in order
+    (as validation.validate_properties returns them) already hold the codes.
+    
+    Args:
+        values: A pandas Series (or array) of labels or integer codes
+        category: The property_categories.Category describing the column
+        
+    Returns:
+        An integer NumPy array of codes, one per row
+    """
+    import pandas as pd
+    
+    values = pd.Series(values, copy=False)
+    if pd.api.types.is_integer_dtype(values.dtype):
+        codes = values.to_numpy()
+        if len(codes) and (codes.min() < 0 or codes.max() >= len(category.options)):
+            raise KeyError(f"{category.field} code out of range")
+        return codes
+    if isinstance(values.dtype, pd.CategoricalDtype) and tuple(values.cat.categories) == category.options:
+        codes = values.cat.codes.to_numpy()
+        if len(codes) and codes.min() < 0:
+            raise KeyError(f"Missing {category.field} value(s)")
+        return codes
+    
+    # One hash lookup per row against the options; unknown labels and
+    # missing values both come back as -1, so no separate NA scan is needed
+    codes = pd.Index(category.options).get_indexer(values)
+    if len(codes) and codes.min() < 0:
+        unknown = pd.unique(values[codes < 0])
+        raise KeyError(f"Unknown {category.field} value(s): {', '.join(map(str, unknown))}")
+    
+    return codes
+
+def lookup_factors(values, category):
+    """
+    Map a column of labels or codes onto the category's factors.
+    
+    Args:
+        values: A pandas Series (or array) of labels or integer codes
+        category: The property_categories.Category describing the column
+        
+    Returns:
+        A float NumPy array of factors, one per row
+    """
+    return factor_array(category.field)[category_codes(values, category)]
+
+def _square_root(values):
+    """
+    Take the square root exactly as Python's ``x ** 0.5`` does.
+    
+    NumPy's sqrt and SIMD power can differ from the C library pow used by
+    Python in the last bit, so the root is taken with Python's own operator,
+    once per distinct value (floor areas repeat heavily across a portfolio).
+    
+    Args:
+        values: A float64 NumPy array
+        
+    Returns:
+        A float64 NumPy array of square roots
+    """
+    import numpy as np
+    import pandas as pd
+    
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    roots = np.fromiter((value ** 0.5 for value in uniques.tolist()), dtype=float, count=len(uniques))
+    return roots[codes]
+
+def component_losses(floor_area, floor_area_root, ceiling_height, insulation, windows, construction):
+    """
+    Component heat losses (kW) from NumPy arrays of inputs and factors.
+    
+    Evaluated in the same order as calculate_heat_loss, so equal inputs give
+    equal results. The arrays only need to broadcast against each other,
+    which lets uncertainty.py evaluate many samples per property at once.
+    
+    Args:
+        floor_area: Floor areas (m²)
+        floor_area_root: Their square roots, taken by the caller
+        ceiling_height: Ceiling heights (m)
+        insulation: Insulation factors
+        windows: Window factors (U-values)
+        construction: Construction year factors
+        
+    Returns:
+        A tuple of the wall, roof, window, floor and ventilation losses
+    """
+    volume = floor_area * ceiling_height
+    perimeter = (4 * floor_area_root)
+    wall_area = perimeter * ceiling_height
+    base_temp_diff = BASE_TEMP_DIFF
+    
+    wall_loss = wall_area * (1.0 * insulation * construction) * base_temp_diff / 1000
+    roof_loss = floor_area * (0.8 * insulation * construction) * base_temp_diff / 1000
+    window_loss = (wall_area * 0.15) * windows * base_temp_diff / 1000
+    floor_loss = floor_area * (0.7 * insulation * construction) * base_temp_diff / 1000
+    ventilation_loss = volume * 0.5 * 0.33 * base_temp_diff / 1000
+    return wall_loss, roof_loss, window_loss, floor_loss, ventilation_loss
+
+@timed("calculate_heat_loss_batch")
+def calculate_heat_loss_batch(properties):
+    """
+    Calculate the heat loss for many properties at once.
+    
+    The maths mirrors calculate_heat_loss operation for operation, so every
+    row matches the scalar result exactly.
+    
+    Category columns of string labels cost one hash lookup per row, which is
+    most of the run time. Columns that already hold property_categories
+    integer codes, or Categoricals whose categories are the options in order
+    (as validation.validate_properties returns them), skip the lookup and
+    take about two thirds of the time.
+    
+    Args:
+        properties: A pandas DataFrame, or a mapping of column name to array,
+            with the same fields as the property_data dictionary. Category
+            columns may hold labels, integer codes or such Categoricals.
+        
+    Returns:
+        A DataFrame indexed like the input with the same columns as the
+        dictionary returned by calculate_heat_loss
+    """
+    import numpy as np
+    import pandas as pd
+    
+    if not isinstance(properties, pd.DataFrame):
+        properties = pd.DataFrame(properties)
+    
+    for field in PROPERTY_FIELDS:
+        if field not in properties.columns:
+            raise KeyError(field)
+    
+    floor_area = properties["floor_area"].to_numpy(dtype=float)
+    ceiling_height = properties["ceiling_height"].to_numpy(dtype=float)
+    
+    insulation = lookup_factors(properties["insulation_level"], INSULATION_LEVEL)
+    windows = lookup_factors(properties["windows_quality"], WINDOWS_QUALITY)
+    construction = lookup_factors(properties["construction_year"], CONSTRUCTION_YEAR)
+    property_type = lookup_factors(properties["property_type"], PROPERTY_TYPE)
+    location = lookup_factors(properties["location"], LOCATION)
+    
+    wall_loss, roof_loss, window_loss, floor_loss, ventilation_loss = component_losses(
+        floor_area, _square_root(floor_area), ceiling_height, insulation, windows, construction
+    )
+    
+    total_heat_loss = (wall_loss + roof_loss + window_loss + floor_loss + ventilation_loss) * \
+                      property_type * location
+    
+    heat_loss_per_sqm = (total_heat_loss * 1000) / floor_area
+    
+    # side="right" reproduces the strict "<" comparisons of the scalar ladder
+    efficiency_rating = pd.Categorical.from_codes(
+        np.searchsorted(EFFICIENCY_THRESHOLDS, heat_loss_per_sqm, side="right"),
+        categories=list(EFFICIENCY_RATINGS)
+    )
+    
+    return pd.DataFrame(
+        {
+            "total_heat_loss": total_heat_loss,
+            "heat_loss_per_sqm": heat_loss_per_sqm,
+            "wall_loss": wall_loss,
+            "roof_loss": roof_loss,
+            "window_loss": window_loss,
+            "floor_loss": floor_loss,
+            "ventilation_loss": ventilation_loss,
+            "efficiency_rating": efficiency_rating
+        },
+        index=properties.index
+    )
@@ -0,0 +1,331 @@
+"""
+Per-stage latency metrics for the calculator, quotation and export paths.
+
+Set SPIRE_METRICS=1 to record a latency histogram and an error count for
+each instrumented stage. Library functions are wrapped with @timed and
+call sites with ``with stage(...)``. The metrics can be exported in three
+ways:
+
+- SPIRE_METRICS_PORT: serve Prometheus text format on http://host:port/metrics
+- SPIRE_METRICS_FILE: rewrite a Prometheus text file every
+  SPIRE_METRICS_INTERVAL seconds (default 15) and at exit. "{pid}" in the
+  path is replaced by the process id, so pipeline workers each get a file.
+- SPIRE_METRICS_LOG=1: log one JSON line per observation to "spire.metrics"
+
+The settings are read once at import. While metrics are disabled, @timed
+returns the function unchanged and stage() returns a shared no-op context
+manager, so the instrumentation costs nothing on the hot paths.
+"""
+import atexit
+import contextlib
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+
+def _log_event(event):
+    """Log a dictionary as one JSON line on the "spire.metrics" logger."""
+    # json and logging are imported on first use to keep this module cheap to import
+    import json
+    import logging
+
+    logging.getLogger("spire.metrics").info(json.dumps(event))
+
+def _log_warning(message, *args):
+    import logging
+
+    logging.getLogger("spire.metrics").warning(message, *args)
+
+def _flag(name):
+    return os.environ.get(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+ENABLED = _flag("SPIRE_METRICS")
+LOG_OBSERVATIONS = ENABLED and _flag("SPIRE_METRICS_LOG")
+
+# Histogram bucket upper bounds in seconds (100 µs to 10 s)
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+           0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """
+    Cumulative latency histogram for one stage, safe to update from many threads.
+
+    Args:
+        name: Stage name, used as the Prometheus "stage" label
+        buckets: Sorted bucket upper bounds in seconds
+    """
+
+    def __init__(self, name, buckets=BUCKETS):
+        self.name = name
+        self.buckets = tuple(buckets)
+        # One count per bucket plus the +Inf overflow bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, error=False):
+        """Record one duration in seconds."""
+        position = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[position] += 1
+            self.count += 1
+            self.sum += seconds
+            if error:
+                self.errors += 1
+
+    def quantile(self, q):
+        """Estimate a quantile (0-1) as the upper bound of the bucket it falls in."""
+        with self._lock:
+            counts, count = list(self.counts), self.count
+        if not count:
+            return None
+
+        target = q * count
+        seen = 0
+        for position, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= target:
+                return self.buckets[position] if position < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def snapshot(self):
+        """Return a consistent copy of the counters."""
+        with self._lock:
+            return {
+                "counts": list(self.counts),
+                "count": self.count,
+                "sum": self.sum,
+                "errors": self.errors
+            }
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+def histogram(name):
+    """Return the histogram for a stage, creating it on first use."""
+    found = _histograms.get(name)
+    if found is None:
+        with _histograms_lock:
+            found = _histograms.setdefault(name, Histogram(name))
+    return found
+
+def observe(name, seconds, error=False):
+    """
+    Record one timing for a stage.
+
+    Args:
+        name: Stage name
+        seconds: Duration in seconds
+        error: Whether the stage raised an exception
+    """
+    histogram(name).observe(seconds, error)
+    if LOG_OBSERVATIONS:
+        _log_event({"event": "stage", "stage": name, "seconds": round(seconds, 6), "error": error})
+
+class _StageTimer:
+    """Context manager recording the time spent in its block."""
+
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        observe(self.name, time.perf_counter() - self.started, exc_type is not None)
+        return False
+
+_NULL_STAGE = contextlib.nullcontext()
+
+def stage(name):
+    """
+    Time a block of code as a named stage.
+
+        with stage("build_views"):
+            ...
+
+    Args:
+        name: Stage name
+
+    Returns:
+        A context manager (a shared no-op one when metrics are disabled)
+    """
+    return _StageTimer(name) if ENABLED else _NULL_STAGE
+
+def timed(name):
+    """
+    Decorator timing every call of a function as a named stage.
+
+    When metrics are disabled the function is returned unchanged.
+
+    Args:
+        name: Stage name
+    """
+    def decorate(function):
+        if not ENABLED:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            error = True
+            try:
+                result = function(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                observe(name, time.perf_counter() - started, error)
+
+        return wrapper
+
+    return decorate
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+def render_prometheus():
+    """
+    Render every stage in the Prometheus text exposition format.
+
+    Returns:
+        The metrics as a string
+    """
+    with _histograms_lock:
+        histograms = sorted(_histograms.values(), key=lambda found: found.name)
+
+    lines = [
+        "# HELP spire_stage_duration_seconds Time spent in each calculation, quotation and export stage.",
+        "# TYPE spire_stage_duration_seconds histogram"
+    ]
+    errors = [
+        "# HELP spire_stage_errors_total Calls of each stage that raised an exception.",
+        "# TYPE spire_stage_errors_total counter"
+    ]
+    for found in histograms:
+        snapshot = found.snapshot()
+        label = found.name.replace("\\", "\\\\").replace('"', '\\"')
+        cumulative = 0
+        for bound, bucket_count in zip(found.buckets + (float("inf"),), snapshot["counts"]):
+            cumulative += bucket_count
+            lines.append(f'spire_stage_duration_seconds_bucket{{stage="{label}",le="{_format_bound(bound)}"}} '
+                         f'{cumulative}')
+        lines.append(f'spire_stage_duration_seconds_sum{{stage="{label}"}} {snapshot["sum"]!r}')
+        lines.append(f'spire_stage_duration_seconds_count{{stage="{label}"}} {snapshot["count"]}')
+        errors.append(f'spire_stage_errors_total{{stage="{label}"}} {snapshot["errors"]}')
+
+    return "\n".join(lines + errors) + "\n"
+
+def summary():
+    """
+    Return per-stage counts, totals and estimated quantiles.
+
+    Returns:
+        A dictionary keyed by stage name
+    """
+    with _histograms_lock:
+        histograms = list(_histograms.values())
+
+    stages = {}
+    for found in histograms:
+        snapshot = found.snapshot()
+        stages[found.name] = {
+            "count": snapshot["count"],
+            "errors": snapshot["errors"],
+            "total_seconds": snapshot["sum"],
+            "mean_seconds": snapshot["sum"] / snapshot["count"] if snapshot["count"] else None,
+            "p50_seconds": found.quantile(0.5),
+            "p99_seconds": found.quantile(0.99)
+        }
+    return stages
+
+def log_summary():
+    """Log one JSON line per stage with its current summary."""
+    for name, values in sorted(summary().items()):
+        _log_event(dict({"event": "stage_summary", "stage": name}, **values))
+
+def reset():
+    """Drop every recorded stage."""
+    with _histograms_lock:
+        _histograms.clear()
+
+def write_prometheus(path):
+    """
+    Write the metrics to a Prometheus text file, replacing it atomically.
+
+    Args:
+        path: Output file; "{pid}" is replaced by the process id
+    """
+    path = path.replace("{pid}", str(os.getpid()))
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as handle:
+        handle.write(render_prometheus())
+    os.replace(temporary, path)
+
+def _serve(port):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="spire-metrics-http", daemon=True).start()
+    return server
+
+def _write_periodically(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            write_prometheus(path)
+        except OSError as error:
+            _log_warning("Could not write metrics to %s: %s", path, error)
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+def start_exporters():
+    """
+    Start the exporters configured by the environment, once per process.
+
+    Does nothing when metrics are disabled. A port that is already in use
+    (for example by another worker) is logged and skipped.
+    """
+    global _exporters_started
+    if not ENABLED:
+        return
+
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+
+    port = os.environ.get("SPIRE_METRICS_PORT")
+    if port:
+        try:
+            _serve(int(port))
+        except OSError as error:
+            _log_warning("Metrics endpoint not started on port %s: %s", port, error)
+
+    path = os.environ.get("SPIRE_METRICS_FILE")
+    if path:
+        interval = float(os.environ.get("SPIRE_METRICS_INTERVAL", "15"))
+        threading.Thread(target=_write_periodically, args=(path, interval),
+                         name="spire-metrics-file", daemon=True).start()
+        atexit.register(write_prometheus, path)
@@ -0,0 +1,305 @@
+"""
+Allocate product packs to a batch of properties under limited stock.
+
+generate_quotation recommends each property's pack on its own. For a large
+retrofit contract the stock of each heat pump model is limited, so
+allocate_packs() assigns packs to the whole batch at once: as many
+properties as possible get a pack whose min_heat_loss/max_heat_loss range
+covers their heat loss, no pack is used more than its stock, and among
+those assignments the total pack cost (objective "cost") or the total
+sizing mismatch, the distance from the heat loss to the middle of the
+pack's range (objective "mismatch"), is minimised. The other measure
+breaks ties.
+
+Properties are bucketed into heat loss classes: the PackIndex regions, in
+which every property has the same suitable packs, split into CLASS_WIDTH kW
+bins. The classes, the packs and the stock form a small transportation
+problem that is solved exactly as a min-cost flow, whatever the number of
+properties; each class's allocation is then handed out in heat loss order,
+smaller packs to smaller losses. Mismatch is priced at each class's mean,
+so it is exact to within the bin width.
+
+    positions = allocate_packs(heat_loss["total_heat_loss"], product_packs, {"elite_ashp": 40})
+    quotes = allocate_quotations(properties, product_packs, {"elite_ashp": 40})
+"""
+import json
+
+from pack_index import get_pack_index
+
+OBJECTIVES = ("cost", "mismatch")
+# Width (kW) of the heat loss bins within each PackIndex region
+CLASS_WIDTH = 0.25
+# Position returned for a property that gets no pack
+UNALLOCATED = -1
+
+# Costs are integers so the solver is exact: pence and watts. The objective
+# is scaled above the tie-break so it always dominates.
+_MAX_MISMATCH_WATTS = 10**6 - 1
+_MAX_PRICE_PENCE = 10**8 - 1
+
+def _heat_loss_classes(totals, pack_index, class_width):
+    """Class of each finite heat loss (-1 otherwise), and each class's count."""
+    import numpy as np
+
+    classes = np.full(len(totals), -1, dtype=np.intp)
+    finite = np.isfinite(totals)
+    values = totals[finite]
+    regions = pack_index.regions(values)
+    bins = np.floor(values / class_width).astype(np.int64)
+    bins -= bins.min() if len(bins) else 0
+    keys = regions.astype(np.int64) * (int(bins.max(initial=0)) + 1) + bins
+    _, classes[finite], counts = np.unique(keys, return_inverse=True, return_counts=True)
+    return classes, counts
+
+def _cheapest_moves(flow, costs, pack, infinity):
+    """
+    Cheapest way to move a unit from one pack to each pack, and its class.
+
+    A unit can only move through a class that already sends units to the
+    pack, at that class's cost difference between the two packs.
+    """
+    import numpy as np
+
+    users = np.flatnonzero(flow[:, pack])
+    if not len(users):
+        return np.full(costs.shape[1], infinity), np.zeros(costs.shape[1], dtype=np.intp)
+    moves = costs[users] - costs[users, pack][:, None]
+    moves[costs[users] >= infinity] = infinity
+    best = moves.argmin(axis=0)
+    return moves[best, np.arange(costs.shape[1])], users[best]
+
+def _min_cost_flow(counts, costs, allowed, stock):
+    """
+    Send as many units as possible from classes to packs at minimum cost.
+
+    Successive shortest paths on the residual network source -> class ->
+    pack -> sink. Packs are few, so each shortest path is a Dijkstra over
+    the packs alone: a path enters a pack from a class with units left and
+    can move on to another pack by rerouting a unit some class already
+    sends to the first one. The pack potentials keep the reduced move costs
+    non-negative, and the search stops as soon as the sink is settled.
+
+    The cheapest entry into each pack and the pack -> pack move matrix are
+    kept between paths and only updated for the classes and packs a path
+    changes, so a path costs O(packs²) rather than O(classes × packs²).
+
+    Args:
+        counts: Units per class
+        costs: Non-negative integer cost per unit of each (class, pack)
+        allowed: Boolean (class, pack) array of the usable pairs
+        stock: Units each pack can take
+
+    Returns:
+        The (class, pack) flow array
+    """
+    import numpy as np
+
+    infinity = np.iinfo(np.int64).max // 4
+    classes, packs = costs.shape
+    every_pack = np.arange(packs)
+    flow = np.zeros((classes, packs), dtype=np.int64)
+    supply = np.asarray(counts, dtype=np.int64).copy()
+    stock = np.asarray(stock, dtype=np.int64).copy()
+    costs = np.where(allowed, costs, infinity)
+
+    # Cheapest class with units left for each pack
+    entry = np.where((supply > 0)[:, None], costs, infinity)
+    entry_via = entry.argmin(axis=0)
+    entry_cost = entry[entry_via, every_pack]
+    # Cheapest pack -> pack moves and the class each one goes through
+    move = np.full((packs, packs), infinity)
+    move_via = np.zeros((packs, packs), dtype=np.intp)
+    potential = np.zeros(packs, dtype=np.int64)
+    sink_potential = 0
+
+    while supply.any() and stock.any():
+        distance = np.where(entry_cost < infinity, entry_cost - potential, infinity)
+        via = entry_via.copy()
+        previous = np.full(packs, -1)
+
+        # Dijkstra on reduced costs, settling every pack at the nearest
+        # distance at once
+        pending = distance.copy()
+        sink_distance = infinity
+        last = -1
+        while True:
+            nearest = pending.min()
+            if nearest >= sink_distance:
+                break
+            settled = np.flatnonzero(pending == nearest)
+            pending[settled] = infinity
+            open_packs = settled[stock[settled] > 0]
+            if len(open_packs):
+                to_sink = nearest + potential[open_packs] - sink_potential
+                best = to_sink.argmin()
+                if to_sink[best] < sink_distance:
+                    sink_distance = to_sink[best]
+                    last = int(open_packs[best])
+            rows = move[settled]
+            candidates = np.where(rows < infinity, nearest + rows + (potential[settled, None] - potential),
+                                  infinity)
+            source = candidates.argmin(axis=0)
+            candidate = candidates[source, every_pack]
+            better = candidate < distance
+            distance[better] = candidate[better]
+            pending[better] = candidate[better]
+            via[better] = move_via[settled[source[better]], every_pack[better]]
+            previous[better] = settled[source[better]]
+        if last < 0:
+            break
+        potential += np.minimum(distance, sink_distance)
+        sink_potential += sink_distance
+
+        # Walk back to the class the path starts from
+        path = []
+        pack = last
+        while True:
+            path.append((int(via[pack]), pack, int(previous[pack])))
+            if previous[pack] < 0 or len(path) > packs:
+                break
+            pack = previous[pack]
+        first_class = path[-1][0]
+        amount = min(supply[first_class], stock[last],
+                     *(flow[cls, moved_from] for cls, _, moved_from in path if moved_from >= 0))
+
+        for cls, pack, moved_from in path:
+            flow[cls, pack] += amount
+            if moved_from >= 0:
+                flow[cls, moved_from] -= amount
+        supply[first_class] -= amount
+        stock[last] -= amount
+
+        if not supply[first_class]:
+            stale = np.flatnonzero(entry_via == first_class)
+            if len(stale):
+                entry = np.where((supply > 0)[:, None], costs[:, stale], infinity)
+                entry_via[stale] = entry.argmin(axis=0)
+                entry_cost[stale] = entry[entry_via[stale], np.arange(len(stale))]
+        for pack in {pack for _, pack, _ in path} | {moved_from for _, _, moved_from in path}:
+            if pack >= 0:
+                move[pack], move_via[pack] = _cheapest_moves(flow, costs, pack, infinity)
+
+    return flow
+
+def allocate_packs(totals, product_packs, stock, objective="cost", class_width=CLASS_WIDTH, pack_index=None):
+    """
+    Assign packs to a batch of properties within each pack's stock.
+
+    Args:
+        totals: Array-like of total heat losses (kW)
+        product_packs: List of available product packs
+        stock: Dictionary of pack id to the number available; packs left
+            out are unlimited and packs with no stock can be given 0
+        objective: "cost" to minimise the total pack price, or "mismatch"
+            to minimise the total distance from the middle of each range
+        class_width: Width (kW) of the heat loss bins
+        pack_index: Optional prebuilt PackIndex for product_packs
+
+    Returns:
+        An integer NumPy array with the catalogue position of each row's
+        pack, or UNALLOCATED where no suitable pack is left in stock (or the
+        heat loss is missing)
+
+    Raises:
+        ValueError: If the objective, class width or a stock entry is invalid
+    """
+    import numpy as np
+
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective {objective!r}; expected one of {', '.join(OBJECTIVES)}")
+    if not class_width > 0:
+        raise ValueError("class_width must be positive")
+    if pack_index is None:
+        pack_index = get_pack_index(product_packs)
+    packs = pack_index.packs
+    pack_ids = [pack["id"] for pack in packs]
+    unknown = set(stock) - set(pack_ids)
+    if unknown:
+        raise ValueError(f"Unknown pack id(s) in stock: {', '.join(sorted(unknown))}")
+    if any(count < 0 for count in stock.values()):
+        raise ValueError("Stock cannot be negative")
+
+    totals = np.asarray(totals, dtype=float)
+    positions = np.full(len(totals), UNALLOCATED, dtype=np.intp)
+    classes, counts = _heat_loss_classes(totals, pack_index, class_width)
+    if not len(counts):
+        return positions
+
+    # A pack suits a whole class when it covers any heat loss in it, since
+    # every class lies within one PackIndex region
+    members = classes >= 0
+    representative = np.empty(len(counts))
+    representative[classes[members]] = totals[members]
+    low = np.array([pack["min_heat_loss"] for pack in packs], dtype=float)
+    high = np.array([pack["max_heat_loss"] for pack in packs], dtype=float)
+    allowed = (low <= representative[:, None]) & (representative[:, None] <= high)
+
+    # Mean distance of each class from each pack's midpoint, in watts
+    midpoints = (low + high) / 2
+    mismatch = np.empty((len(counts), len(packs)))
+    for position, midpoint in enumerate(midpoints):
+        mismatch[:, position] = np.bincount(classes[members], np.abs(totals[members] - midpoint),
+                                            minlength=len(counts)) / counts
+    mismatch = np.minimum(np.rint(mismatch * 1000), _MAX_MISMATCH_WATTS).astype(np.int64)
+    prices = np.minimum(np.rint(np.array([pack["price"] for pack in packs], dtype=float) * 100),
+                        _MAX_PRICE_PENCE).astype(np.int64)
+    if objective == "cost":
+        costs = prices[None, :] * (_MAX_MISMATCH_WATTS + 1) + mismatch
+    else:
+        costs = mismatch * (_MAX_PRICE_PENCE + 1) + prices[None, :]
+
+    limits = np.array([stock.get(pack_id, len(totals)) for pack_id in pack_ids], dtype=np.int64)
+    flow = _min_cost_flow(counts, costs, allowed, limits)
+
+    # Hand out each class's packs in heat loss order, by pack midpoint, with
+    # the unallocated properties (if any) last
+    by_midpoint = np.argsort(midpoints, kind="stable")
+    handout = np.column_stack([flow[:, by_midpoint], counts - flow.sum(axis=1)])
+    labels = np.append(by_midpoint, UNALLOCATED)
+    rows = np.flatnonzero(members)
+    rows = rows[np.lexsort((totals[rows], classes[rows]))]
+    positions[rows] = np.repeat(np.tile(labels, len(counts)), handout.ravel())
+    return positions
+
+def allocate_quotations(properties, product_packs, stock, objective="cost", tariff=None):
+    """
+    Quote a batch of properties with the packs allocate_packs() assigns.
+
+    Args:
+        properties: DataFrame with the questionnaire fields
+        product_packs: List of available product packs
+        stock: Dictionary of pack id to the number available
+        objective: "cost" or "mismatch" (see allocate_packs)
+        tariff: Energy tariff name for the running costs
+
+    Returns:
+        The properties with heat loss and quotation columns appended, as
+        quotation_pipeline.quote_frame; the recommended_pack_id of a
+        property left without a pack is empty and its costs are NaN
+    """
+    import pandas as pd
+
+    from heat_loss_calculator import calculate_heat_loss_batch
+    from quotation_generator import generate_quotation_batch
+
+    pack_index = get_pack_index(product_packs)
+    heat_loss = calculate_heat_loss_batch(properties)
+    positions = allocate_packs(heat_loss["total_heat_loss"], product_packs, stock, objective,
+                               pack_index=pack_index)
+    allocated = positions != UNALLOCATED
+    quotation = generate_quotation_batch(heat_loss[allocated], product_packs, properties[allocated],
+                                         pack_index, tariff, positions[allocated])
+    return pd.concat([properties, heat_loss, quotation.reindex(heat_loss.index)], axis=1)
+
+def load_stock(path):
+    """
+    Read pack stock limits from a JSON file of pack id to count.
+
+    Raises:
+        ValueError: If a count is not a whole number
+    """
+    with open(path) as handle:
+        stock = json.load(handle)
+    if not isinstance(stock, dict) or not all(isinstance(count, int) for count in stock.values()):
+        raise ValueError(f"{path} must map pack ids to whole numbers of units")
+    return stock
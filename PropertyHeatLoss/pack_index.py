@@ -0,0 +1,233 @@
+from bisect import bisect_left
+
+from product_packs import CatalogueCache
+
+# Number of catalogue versions whose index is kept in memory
+_MAX_INDEXES = 8
+
+def heat_loss_regions(product_packs):
+    """
+    Split the heat loss axis into the elementary regions of a catalogue.
+
+    Region 2i is the open gap below bounds[i], region 2i + 1 is the point
+    bounds[i] itself and region 2 * len(bounds) is above the top. Every heat
+    loss in a region is covered by the same packs.
+
+    Args:
+        product_packs: List of product pack dictionaries
+
+    Returns:
+        A tuple (bounds, covering) of the sorted distinct range bounds and,
+        for each region, the catalogue positions of the packs covering it
+        in catalogue order
+    """
+    bounds = sorted({pack["min_heat_loss"] for pack in product_packs} |
+                    {pack["max_heat_loss"] for pack in product_packs})
+    covering = [[] for _ in range(2 * len(bounds) + 1)]
+    for position, pack in enumerate(product_packs):
+        low, high = pack["min_heat_loss"], pack["max_heat_loss"]
+        if not low <= high:
+            continue
+        for region in range(2 * bisect_left(bounds, low) + 1, 2 * bisect_left(bounds, high) + 2):
+            covering[region].append(position)
+    return bounds, covering
+
+def region_of(bounds, total_heat_loss):
+    """Return the index of the elementary region (see heat_loss_regions) containing a heat loss."""
+    position = bisect_left(bounds, total_heat_loss)
+    if position < len(bounds) and bounds[position] == total_heat_loss:
+        return 2 * position + 1
+    return 2 * position
+
+class PackIndex:
+    """
+    A prebuilt lookup structure for choosing product packs by heat loss.
+
+    The distinct min/max heat loss boundaries split the heat loss axis into
+    elementary regions (each boundary point and each open gap between two
+    boundaries). Every heat loss in a region is covered by the same set of
+    packs, so each region stores the midpoints of its packs in sorted order.
+    A recommendation is then two binary searches: one for the region and one
+    for the nearest midpoint, giving the same pack as the linear scan in
+    generate_quotation (ties go to the pack listed first in the catalogue).
+
+    Args:
+        product_packs: List of product pack dictionaries
+    """
+
+    def __init__(self, product_packs):
+        self.packs = list(product_packs)
+        if not self.packs:
+            raise ValueError("Cannot index an empty product catalogue")
+
+        self._bounds, covering = heat_loss_regions(self.packs)
+        midpoints = [(pack["min_heat_loss"] + pack["max_heat_loss"]) / 2 for pack in self.packs]
+
+        self._regions = []
+        for positions in covering:
+            # Keep the earliest pack for each distinct midpoint
+            candidates = {}
+            for order in positions:
+                candidates.setdefault(midpoints[order], order)
+            ordered = sorted(candidates)
+            self._regions.append((ordered, [candidates[midpoint] for midpoint in ordered]))
+
+        # Fallbacks used when no pack covers the heat loss
+        positions = range(len(self.packs))
+        self._lowest_min = min(pack["min_heat_loss"] for pack in self.packs)
+        self._lowest_position = min(positions, key=lambda i: self.packs[i]["min_heat_loss"])
+        self._highest_position = max(positions, key=lambda i: self.packs[i]["max_heat_loss"])
+
+        # Price-ordered view for alternatives (stable, so ties keep catalogue order)
+        self.by_price = sorted(self.packs, key=lambda x: x["price"])
+
+    def _region(self, total_heat_loss):
+        """Return the index of the elementary region containing a heat loss."""
+        return region_of(self._bounds, total_heat_loss)
+
+    def regions(self, totals):
+        """
+        Vectorized _region() for an array of heat losses.
+
+        Every heat loss in one elementary region is covered by the same
+        packs, so callers can group rows by region (see pack_allocation.py).
+
+        Args:
+            totals: Array-like of total heat losses (kW)
+
+        Returns:
+            An integer NumPy array of region indexes; NaN rows get -1
+        """
+        import numpy as np
+
+        totals = np.asarray(totals, dtype=float)
+        bounds = np.asarray(self._bounds, dtype=float)
+        position = np.searchsorted(bounds, totals, side="left")
+        on_bound = bounds[np.minimum(position, len(bounds) - 1)] == totals
+        regions = 2 * position + (on_bound & (position < len(bounds)))
+        regions[np.isnan(totals)] = -1
+        return regions
+
+    def recommend(self, total_heat_loss):
+        """
+        Return the recommended pack for a total heat loss (kW).
+
+        This is the suitable pack whose range midpoint is closest to the heat
+        loss or, when none is suitable, the pack with the lowest minimum (for
+        heat losses below every pack) or the highest maximum otherwise.
+        """
+        return self.packs[self._recommend_position(total_heat_loss)]
+
+    def _recommend_position(self, total_heat_loss):
+        """Return the catalogue position of the recommended pack."""
+        # NaN is never inside a range and is not below the lowest minimum
+        if total_heat_loss != total_heat_loss:
+            return self._highest_position
+
+        midpoints, orders = self._regions[self._region(total_heat_loss)]
+        if not midpoints:
+            if total_heat_loss < self._lowest_min:
+                return self._lowest_position
+            return self._highest_position
+
+        # The nearest midpoint is one of the two either side of the heat loss;
+        # equal distances are contiguous, so widen the window to catch ties
+        position = bisect_left(midpoints, total_heat_loss)
+        left = max(position - 1, 0)
+        right = min(position, len(midpoints) - 1)
+        best = min(abs(total_heat_loss - midpoints[left]), abs(total_heat_loss - midpoints[right]))
+        while left > 0 and abs(total_heat_loss - midpoints[left - 1]) == best:
+            left -= 1
+        while right < len(midpoints) - 1 and abs(total_heat_loss - midpoints[right + 1]) == best:
+            right += 1
+
+        return min(orders[k] for k in range(left, right + 1)
+                   if abs(total_heat_loss - midpoints[k]) == best)
+
+    def recommend_many(self, totals):
+        """
+        Vectorized recommend() for an array of total heat losses.
+
+        Rows are grouped by elementary region and each group is resolved with
+        one NumPy search over that region's midpoints. The rare rows whose
+        nearest-midpoint tie spans more than two midpoints use recommend().
+
+        Args:
+            totals: Array-like of total heat losses (kW)
+
+        Returns:
+            An integer NumPy array of positions in self.packs
+        """
+        import numpy as np
+
+        totals = np.asarray(totals, dtype=float)
+        positions = np.empty(len(totals), dtype=np.intp)
+        if not len(totals):
+            return positions
+        regions = self.regions(totals)
+        positions[regions < 0] = self._highest_position
+
+        order = np.argsort(regions, kind="stable")
+        sorted_regions = regions[order]
+        starts = np.flatnonzero(np.r_[True, sorted_regions[1:] != sorted_regions[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        for start, end in zip(starts, ends):
+            region = sorted_regions[start]
+            if region < 0:
+                continue
+
+            rows = order[start:end]
+            values = totals[rows]
+            midpoints, orders = self._regions[region]
+            if not midpoints:
+                positions[rows] = np.where(values < self._lowest_min, self._lowest_position, self._highest_position)
+                continue
+
+            midpoints = np.asarray(midpoints, dtype=float)
+            orders = np.asarray(orders, dtype=np.intp)
+            last = len(midpoints) - 1
+            nearest = np.searchsorted(midpoints, values, side="left")
+            left = np.maximum(nearest - 1, 0)
+            right = np.minimum(nearest, last)
+            left_distance = np.abs(values - midpoints[left])
+            right_distance = np.abs(values - midpoints[right])
+            pick = np.where(
+                left_distance < right_distance, left,
+                np.where(right_distance < left_distance, right,
+                         np.where(orders[left] <= orders[right], left, right))
+            )
+            positions[rows] = orders[pick]
+
+            # Ties wider than the two neighbours fall back to the scalar path
+            best = np.minimum(left_distance, right_distance)
+            wide = ((left > 0) & (np.abs(values - midpoints[np.maximum(left - 1, 0)]) == best)) | \
+                   ((right < last) & (np.abs(values - midpoints[np.minimum(right + 1, last)]) == best))
+            for row in rows[wide]:
+                positions[row] = self._recommend_position(float(totals[row]))
+
+        return positions
+
+    def alternatives(self, recommended_pack, limit=3):
+        """Return up to limit of the cheapest packs other than the recommended one."""
+        alternatives = []
+        for pack in self.by_price:
+            if pack["id"] != recommended_pack["id"]:
+                alternatives.append(pack)
+                if len(alternatives) == limit:
+                    break
+
+        return alternatives
+
+_indexes = CatalogueCache(PackIndex, maxsize=_MAX_INDEXES)
+
+def get_pack_index(product_packs):
+    """
+    Return the PackIndex for a catalogue, building it once per catalogue version.
+
+    Args:
+        product_packs: List of product pack dictionaries
+
+    Returns:
+        A PackIndex over the catalogue
+    """
+    return _indexes.get(product_packs)
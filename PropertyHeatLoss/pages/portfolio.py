@@ -0,0 +1,109 @@
+import streamlit as st
+from app_resources import get_quotation_store
+from product_packs import get_product_packs
+from property_categories import CONSTRUCTION_YEAR, EFFICIENCY_RATINGS, LOCATION, PROPERTY_TYPE
+
+st.set_page_config(
+    page_title="Quotation Portfolio",
+    page_icon="spire_logo.jpg",
+    layout="wide"
+)
+
+st.title("Quotation Portfolio")
+st.markdown("""
+Totals over every saved quotation, by region, property type or construction year. The figures
+come from rollups the store keeps up to date as quotations are saved, so the page stays fast
+however many quotations there are.
+""")
+
+# Dimensions the portfolio can be broken down by, in their questionnaire order
+GROUPINGS = {
+    "Region": LOCATION,
+    "Property Type": PROPERTY_TYPE,
+    "Construction Year": CONSTRUCTION_YEAR
+}
+
+def group_chart_spec(field, label, order, y, y_title, color=None, color_title=None, color_order=None):
+    """A bar chart of y by field, stacked by color when given, as a plain Vega-Lite spec."""
+    encoding = {
+        "x": {"field": field, "type": "nominal", "title": label, "sort": order, "axis": {"labelAngle": 0}},
+        "y": {"field": y, "type": "quantitative", "title": y_title},
+        "tooltip": [
+            {"field": field, "type": "nominal", "title": label},
+            {"field": y, "type": "quantitative", "title": y_title, "format": ",.0f"}
+        ]
+    }
+    if color:
+        encoding["color"] = {"field": color, "type": "nominal", "title": color_title, "sort": color_order}
+        encoding["order"] = {"field": "color_order", "type": "quantitative"}
+        encoding["tooltip"].insert(1, {"field": color, "type": "nominal", "title": color_title})
+    return {"mark": {"type": "bar"}, "encoding": encoding}
+
+store = get_quotation_store()
+totals = store.rollup()
+if not totals:
+    st.info("No quotations have been saved yet.")
+    st.stop()
+
+totals = totals[0]
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Quotations", f"{totals['quotations']:,}")
+col2.metric("Total Heat Loss", f"{totals['total_heat_loss']:,.0f} kW")
+col3.metric("Mean Heat Loss", f"{totals['total_heat_loss'] / totals['quotations']:.2f} kW")
+col4.metric("Heat Loss per m²", f"{1000 * totals['total_heat_loss'] / totals['floor_area']:.1f} W/m²")
+
+label = st.selectbox("Break Down By", options=list(GROUPINGS))
+category = GROUPINGS[label]
+field = category.field
+order = list(category.options)
+
+# One row per group for the table and the heat loss chart
+groups = store.rollup(by=(field,))
+groups.sort(key=lambda group: category.code(group[field]))
+st.dataframe(
+    [{
+        label: group[field],
+        "Quotations": group["quotations"],
+        "Total Heat Loss (kW)": group["total_heat_loss"],
+        "Mean Heat Loss (kW)": group["total_heat_loss"] / group["quotations"],
+        "Heat Loss per m² (W/m²)": 1000 * group["total_heat_loss"] / group["floor_area"],
+        "Mean Total Cost (£)": group["total_cost"] / group["quotations"],
+        "Annual Savings (£)": group["estimated_annual_savings"]
+    } for group in groups],
+    hide_index=True,
+    use_container_width=True,
+    column_config={
+        "Total Heat Loss (kW)": st.column_config.NumberColumn(format="%.0f"),
+        "Mean Heat Loss (kW)": st.column_config.NumberColumn(format="%.2f"),
+        "Heat Loss per m² (W/m²)": st.column_config.NumberColumn(format="%.1f"),
+        "Mean Total Cost (£)": st.column_config.NumberColumn(format="£%.0f"),
+        "Annual Savings (£)": st.column_config.NumberColumn(format="£%.0f")
+    }
+)
+
+st.subheader(f"Total Heat Loss by {label}")
+st.vega_lite_chart(groups, group_chart_spec(field, label, order, "total_heat_loss", "Total heat loss (kW)"),
+                   use_container_width=True)
+
+col1, col2 = st.columns(2)
+with col1:
+    st.subheader("Rating Distribution")
+    ratings = store.rollup(by=(field, "efficiency_rating"))
+    for row in ratings:
+        row["color_order"] = EFFICIENCY_RATINGS.index(row["efficiency_rating"])
+    st.vega_lite_chart(ratings, group_chart_spec(field, label, order, "quotations", "Quotations",
+                                                 "efficiency_rating", "Rating", list(EFFICIENCY_RATINGS)),
+                       use_container_width=True)
+with col2:
+    st.subheader("Recommended Pack Mix")
+    pack_ids = [pack["id"] for pack in get_product_packs()]
+    names = {pack["id"]: pack["name"] for pack in get_product_packs()}
+    packs = store.rollup(by=(field, "recommended_pack_id"))
+    for row in packs:
+        pack_id = row["recommended_pack_id"]
+        # Quotations against an older catalogue may name packs no longer sold
+        row["pack"] = names.get(pack_id, pack_id)
+        row["color_order"] = pack_ids.index(pack_id) if pack_id in pack_ids else len(pack_ids)
+    st.vega_lite_chart(packs, group_chart_spec(field, label, order, "quotations", "Quotations",
+                                               "pack", "Pack", [names[pack_id] for pack_id in pack_ids]),
+                       use_container_width=True)
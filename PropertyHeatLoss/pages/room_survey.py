@@ -0,0 +1,271 @@
+import json
+
+import streamlit as st
+from climate import design_temperature
+from property_categories import LOCATION
+from room_model import (
+    DEFAULT_AIR_CHANGES,
+    DEFAULT_ROOM_TEMPERATURES,
+    DEFAULT_U_VALUES,
+    ELEMENT_KINDS,
+    GROUND,
+    OPENING_KINDS,
+    OUTSIDE,
+    UNHEATED,
+    HouseModel
+)
+
+st.set_page_config(
+    page_title="Room-by-Room Survey",
+    page_icon="spire_logo.jpg",
+    layout="wide"
+)
+
+st.title("Room-by-Room Heat Loss Survey")
+st.markdown("""
+Enter the rooms measured on a survey and the walls, windows, doors, floors and roofs of
+each room. Only the rooms an edit affects are recalculated, so large houses stay responsive.
+""")
+
+# Labels for what can be on the other side of an element, besides another room
+ADJACENT_LABELS = {OUTSIDE: "Outside", GROUND: "Ground", UNHEATED: "Unheated space"}
+ELEMENT_COLUMNS = ["kind", "area", "u_value", "adjacent", "parent"]
+
+# The model lives in the session state; the editors below change it in place
+if 'room_model' not in st.session_state:
+    region = st.session_state.get("property_data", {}).get("location", LOCATION.options[0])
+    st.session_state.room_model = HouseModel(design_temperature(region))
+    st.session_state.room_region = region
+# Bumped whenever rooms or elements are added, removed or loaded, so the
+# element editors start again from the model
+if 'room_editor_version' not in st.session_state:
+    st.session_state.room_editor_version = 0
+# Bumped when a survey file is loaded, so the room fields start again too
+if 'room_survey_loads' not in st.session_state:
+    st.session_state.room_survey_loads = 0
+
+model = st.session_state.room_model
+
+def structure_changed():
+    st.session_state.room_editor_version += 1
+
+# House-wide design temperatures
+with st.sidebar:
+    st.header("Design Conditions")
+    region = st.selectbox("Region", options=LOCATION.options,
+                          index=LOCATION.code(st.session_state.room_region))
+    if region != st.session_state.room_region:
+        st.session_state.room_region = region
+        model.set_temperatures(outdoor_temperature=design_temperature(region))
+    st.metric("Outdoor Design Temperature", f"{model.outdoor_temperature:.1f} °C")
+    ground = st.number_input("Ground Temperature (°C)", value=float(model.ground_temperature), step=0.5)
+    unheated = st.number_input("Unheated Space Temperature (°C)", value=float(model.unheated_temperature), step=0.5)
+    if (ground, unheated) != (model.ground_temperature, model.unheated_temperature):
+        model.set_temperatures(ground_temperature=ground, unheated_temperature=unheated)
+
+    # Save and load surveys as JSON
+    st.header("Survey File")
+    st.download_button("Download Survey", data=json.dumps(model.to_dict(), indent=2),
+                       file_name="room_survey.json", mime="application/json")
+    uploaded = st.file_uploader("Load Survey", type="json")
+    if uploaded is not None and st.session_state.get("room_upload") != uploaded.file_id:
+        st.session_state.room_upload = uploaded.file_id
+        try:
+            st.session_state.room_model = model = HouseModel.from_dict(json.load(uploaded))
+            st.session_state.room_survey_loads += 1
+            structure_changed()
+        except (KeyError, ValueError) as e:
+            st.error(f"Could not load the survey: {e}")
+
+def room_label(model, room_id):
+    if room_id in ADJACENT_LABELS:
+        return ADJACENT_LABELS[room_id]
+    return f"{model.rooms[room_id].name} ({room_id})"
+
+def element_frame(model, room_id):
+    """The room's elements as editor rows, indexed by element id."""
+    import pandas as pd
+
+    rows = [model.elements[element_id].to_dict() for element_id in model.rooms[room_id].elements]
+    frame = pd.DataFrame(rows, columns=["id"] + ELEMENT_COLUMNS).set_index("id")
+    frame["adjacent"] = [room_label(model, adjacent) for adjacent in frame["adjacent"]]
+    frame["parent"] = frame["parent"].fillna("")
+    return frame
+
+def apply_element_edits(model, edited):
+    """Apply the edited rows to the model; unchanged rows are skipped by update_element."""
+    labels = {room_label(model, room_id): room_id for room_id in list(ADJACENT_LABELS) + list(model.rooms)}
+    for element_id, row in edited.iterrows():
+        if element_id not in model.elements:
+            continue
+        try:
+            model.update_element(
+                element_id,
+                kind=row["kind"],
+                area=float(row["area"]),
+                u_value=float(row["u_value"]),
+                adjacent=labels.get(row["adjacent"], row["adjacent"]),
+                parent=row["parent"] or None
+            )
+        except (KeyError, ValueError) as e:
+            st.error(f"{element_id}: {e}")
+
+def add_room_form(model):
+    with st.expander("Add a Room", expanded=not model.rooms):
+        with st.form("add_room", clear_on_submit=True):
+            col1, col2, col3 = st.columns(3)
+            name = col1.text_input("Name")
+            room_type = col1.selectbox("Room Type", options=list(DEFAULT_ROOM_TEMPERATURES))
+            floor_area = col2.number_input("Floor Area (m²)", min_value=0.5, value=12.0, step=0.5)
+            height = col2.number_input("Ceiling Height (m)", min_value=1.5, value=2.4, step=0.1)
+            temperature = col3.number_input("Design Temperature (°C, blank for the room type's)",
+                                            value=None, step=0.5)
+            air_changes = col3.number_input("Air Changes per Hour", min_value=0.0,
+                                            value=DEFAULT_AIR_CHANGES, step=0.5)
+            if st.form_submit_button("Add Room"):
+                if temperature is None:
+                    temperature = DEFAULT_ROOM_TEMPERATURES[room_type]
+                st.session_state.room_selected = model.add_room(name or room_type, floor_area, height,
+                                                                temperature, air_changes)
+                structure_changed()
+
+def edit_room(model, room_id):
+    room = model.rooms[room_id]
+    col1, col2, col3, col4 = st.columns(4)
+    # Keyed by room so each room keeps its own widgets, and by the survey
+    # file so loading one replaces them
+    suffix = f"{room_id}_{st.session_state.room_survey_loads}"
+    changes = {
+        "name": col1.text_input("Name", value=room.name, key=f"name_{suffix}"),
+        "floor_area": col2.number_input("Floor Area (m²)", min_value=0.5, value=float(room.floor_area),
+                                        step=0.5, key=f"floor_area_{suffix}"),
+        "height": col3.number_input("Ceiling Height (m)", min_value=1.5, value=float(room.height),
+                                    step=0.1, key=f"height_{suffix}"),
+        "design_temperature": col4.number_input("Design Temperature (°C)", value=float(room.design_temperature),
+                                                step=0.5, key=f"temperature_{suffix}"),
+        "air_changes": col1.number_input("Air Changes per Hour", min_value=0.0, value=float(room.air_changes),
+                                         step=0.5, key=f"air_changes_{suffix}")
+    }
+    model.update_room(room_id, **changes)
+
+    if col4.button("Remove Room", key=f"remove_{room_id}"):
+        try:
+            model.remove_room(room_id)
+            st.session_state.pop("room_selected", None)
+            structure_changed()
+            st.rerun(scope="fragment")
+        except ValueError as e:
+            st.error(str(e))
+
+def add_element_form(model, room_id):
+    others = [other for other in model.rooms if other != room_id]
+    walls = [element_id for element_id in model.rooms[room_id].elements
+             if model.elements[element_id].kind == "wall"]
+    with st.expander("Add or Remove Elements"):
+        with st.form(f"add_element_{room_id}", clear_on_submit=True):
+            col1, col2, col3 = st.columns(3)
+            kind = col1.selectbox("Kind", options=list(ELEMENT_KINDS))
+            area = col2.number_input("Area (m²)", min_value=0.1, value=10.0, step=0.5)
+            u_value = col3.number_input("U-value (W/m²K, blank for a typical value)", min_value=0.0,
+                                        value=None, step=0.1)
+            adjacent = col1.selectbox("Other Side", options=list(ADJACENT_LABELS) + others,
+                                      format_func=lambda other: room_label(model, other))
+            parent = col2.selectbox("In Wall (windows and doors)", options=[None] + walls,
+                                    format_func=lambda wall: "None" if wall is None else wall)
+            if st.form_submit_button("Add Element"):
+                try:
+                    model.add_element(room_id, kind, area,
+                                      DEFAULT_U_VALUES[kind] if u_value is None else u_value,
+                                      adjacent, parent if kind in OPENING_KINDS else None)
+                    structure_changed()
+                except (KeyError, ValueError) as e:
+                    st.error(str(e))
+
+        elements = model.rooms[room_id].elements
+        remove = st.selectbox("Remove Element", options=[None] + elements, key=f"remove_element_{room_id}",
+                              format_func=lambda element_id: "—" if element_id is None else element_id)
+        if remove is not None and st.button("Remove", key=f"remove_element_button_{room_id}"):
+            model.remove_element(remove)
+            structure_changed()
+            st.rerun(scope="fragment")
+
+def edit_elements(model, room_id):
+    # Each editor starts from the model as it was at the last structural
+    # change; the edits it returns are re-applied (as no-ops) on every rerun
+    key = f"elements_{room_id}_{st.session_state.room_editor_version}"
+    if st.session_state.get("room_editor_key") != key:
+        st.session_state.room_editor_key = key
+        st.session_state.room_editor_frame = element_frame(model, room_id)
+
+    adjacent_options = [room_label(model, other) for other in list(ADJACENT_LABELS) + list(model.rooms)
+                        if other != room_id]
+    walls = [""] + [element_id for element_id in model.rooms[room_id].elements
+                    if model.elements[element_id].kind == "wall"]
+    edited = st.data_editor(
+        st.session_state.room_editor_frame,
+        key=key,
+        use_container_width=True,
+        column_config={
+            "kind": st.column_config.SelectboxColumn("Kind", options=list(ELEMENT_KINDS), required=True),
+            "area": st.column_config.NumberColumn("Area (m²)", min_value=0.1, format="%.2f", required=True),
+            "u_value": st.column_config.NumberColumn("U-value (W/m²K)", min_value=0.0, format="%.2f",
+                                                     required=True),
+            "adjacent": st.column_config.SelectboxColumn("Other Side", options=adjacent_options, required=True),
+            "parent": st.column_config.SelectboxColumn("In Wall", options=walls)
+        }
+    )
+    apply_element_edits(model, edited)
+
+def room_summary(model):
+    """One row per room with its design temperature and losses (W)."""
+    import pandas as pd
+
+    rows = []
+    for room in model.rooms.values():
+        loss = room.heat_loss
+        rows.append({
+            "Room": room.name,
+            "Design Temperature (°C)": room.design_temperature,
+            "Fabric Loss (W)": loss["total_loss"] - loss["ventilation_loss"],
+            "Ventilation Loss (W)": loss["ventilation_loss"],
+            "Total Loss (W)": loss["total_loss"],
+            "Loss per m² (W/m²)": loss["total_loss"] / room.floor_area
+        })
+    return pd.DataFrame(rows)
+
+# Editing a room only reruns this fragment, and the model only recalculates
+# the rooms the edit affects
+@st.fragment
+def show_survey():
+    model = st.session_state.room_model
+    add_room_form(model)
+
+    if model.rooms:
+        st.header("Rooms")
+        room_ids = list(model.rooms)
+        selected = st.session_state.get("room_selected")
+        room_id = st.selectbox("Room", options=room_ids, format_func=lambda other: room_label(model, other),
+                               index=room_ids.index(selected) if selected in model.rooms else 0)
+        st.session_state.room_selected = room_id
+        edit_room(model, room_id)
+        if room_id in model.rooms:
+            add_element_form(model, room_id)
+            edit_elements(model, room_id)
+
+    heat_loss = model.heat_loss()
+    st.header("Heat Loss")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Total Heat Loss", f"{heat_loss['total_heat_loss']:.2f} kW")
+    col2.metric("Heat Loss per m²", f"{heat_loss['heat_loss_per_sqm']:.2f} W/m²")
+    col3.metric("Energy Efficiency Rating", heat_loss["efficiency_rating"])
+
+    # Compare with the questionnaire estimate from the main page, when there is one
+    estimate = st.session_state.get("heat_loss")
+    if estimate:
+        st.caption(f"Questionnaire estimate: {estimate['total_heat_loss']:.2f} kW")
+    st.caption(f"Recalculated {len(model.last_recalculated)} of {len(model.rooms)} rooms.")
+
+    if model.rooms:
+        st.dataframe(room_summary(model), hide_index=True, use_container_width=True)
+
+show_survey()
@@ -1,44 +1,31 @@
-import base64
-from fpdf import FPDF
+import hashlib
+import json
+import os
 from datetime import datetime
-import streamlit as st
 
-def get_pdf_download_link(heat_loss, quotation, property_data, filename="ashp_quotation.txt"):
-    """
-    Generate a download link for the quotation PDF
-    
-    Args:
-        heat_loss: Dictionary containing heat loss calculations
-        quotation: Dictionary containing quotation details
-        property_data: Dictionary containing property information
-        filename: Name of the file to download
-        
-    Returns:
-        HTML string with download link
-    """
-    pdf_content = create_pdf_content(heat_loss, quotation, property_data)
-    
-    # Encode the string as bytes and then base64
-    b64 = base64.b64encode(pdf_content.encode()).decode()
-    
-    # Create download link with styling
-    href = f'''
-    <a href="data:text/plain;base64,{b64}" 
-       download="{filename}" 
-       style="display: inline-block; 
-              background-color: #4CAF50; 
-              color: white; 
-              padding: 12px 20px; 
-              text-align: center; 
-              text-decoration: none; 
-              font-size: 16px; 
-              margin: 4px 2px; 
-              border-radius: 8px;">
-        📥 Download Quotation
-    </a>
-    '''
-    
-    return href
+from calculation_cache import LRUCache
+from metrics import timed
+from quotation_views import format_payback
+
+# fpdf is imported when the first document is rendered, so importing this
+# module (as the app does on start-up) stays cheap until an export is requested
+
+LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "spire_logo.jpg")
+
+# Brand colours (RGB)
+BRAND_GREEN = (76, 175, 80)
+LIGHT_GREY = (242, 242, 242)
+DARK_GREY = (64, 64, 64)
+
+DISCLAIMER = (
+    "This is an estimated quotation based on the information provided. A detailed site survey "
+    "would be required for a final quotation. Prices are inclusive of VAT. Running costs and "
+    "savings are simulated over a typical year for your region at illustrative energy prices and "
+    "may vary depending on your specific usage patterns, weather and tariff."
+)
+
+# Rendered PDFs kept in memory, keyed by the content they were rendered from
+PDF_CACHE_SIZE = 128
 
 def create_pdf_content(heat_loss, quotation, property_data):
     """
@@ -112,8 +99,10 @@ def create_pdf_content(heat_loss, quotation, property_data):
     # Savings
     content.append("POTENTIAL SAVINGS")
     content.append("-" * 50)
+    content.append(f"Annual Gas Heating Cost: £{quotation['annual_gas_cost']:.2f}")
+    content.append(f"Annual Heat Pump Running Cost: £{quotation['annual_running_cost']:.2f}")
     content.append(f"Estimated Annual Savings: £{quotation['estimated_annual_savings']:.2f}")
-    content.append(f"Payback Period: {quotation['payback_period']:.1f} years")
+    content.append(f"Payback Period: {format_payback(quotation['payback_period'])}")
     content.append("\n")
     
     # Recommendations
@@ -125,6 +114,301 @@ def create_pdf_content(heat_loss, quotation, property_data):
     # Disclaimer
     content.append("\nDISCLAIMER")
     content.append("-" * 50)
-    content.append("This is an estimated quotation based on the information provided. A detailed site survey would be required for a final quotation. Prices are inclusive of VAT. The estimated savings are based on average energy usage and may vary depending on your specific usage patterns and energy prices.")
+    content.append(DISCLAIMER)
+    
+    return "\n".join(content)
+
+def _latin1(text):
+    """Make text safe for the PDF core fonts, which only cover Latin-1."""
+    return str(text).encode("latin-1", "replace").decode("latin-1")
+
+class _QuotationTemplate:
+    """
+    Everything about a quotation PDF that does not depend on the quote.
+    
+    Built once per process and shared by every document: the logo is read
+    and parsed a single time, and the static text is pre-encoded. The core
+    PDF fonts used here need no embedding, and fpdf caches their metrics
+    at module level, so font set-up is also paid once per process.
+    """
+    
+    def __init__(self):
+        from fpdf import FPDF
+        
+        # The document class is assembled here so fpdf is only loaded on first use
+        self.document_class = type("_QuotationPDF", (_QuotationLayout, FPDF), {})
+        self.logo_info = None
+        if os.path.exists(LOGO_PATH) and hasattr(FPDF, "_parsejpg"):
+            self.logo_info = FPDF()._parsejpg(LOGO_PATH)
+        self.disclaimer = _latin1(DISCLAIMER)
+        self.title = "Air Source Heat Pump Quotation"
+        self.company = "Spire Renewables"
+
+_template = None
+
+def _get_template():
+    global _template
+    if _template is None:
+        _template = _QuotationTemplate()
+    return _template
+
+class _QuotationLayout:
+    """A4 quotation document with the branded header and footer (mixed into FPDF)."""
+    
+    def __init__(self, template, generated_on):
+        super().__init__("P", "mm", "A4")
+        self.template = template
+        self.generated_on = generated_on
+        self.set_margins(15, 15, 15)
+        self.set_auto_page_break(True, 20)
+        self.alias_nb_pages()
+        
+        # Reuse the parsed logo instead of letting fpdf re-read the file
+        if template.logo_info is not None and isinstance(getattr(self, "images", None), dict):
+            self.images[LOGO_PATH] = dict(template.logo_info, i=len(self.images) + 1)
+    
+    def header(self):
+        if os.path.exists(LOGO_PATH):
+            self.image(LOGO_PATH, 15, 10, 22, 22)
+        self.set_xy(42, 12)
+        self.set_font("Arial", "B", 18)
+        self.set_text_color(*BRAND_GREEN)
+        self.cell(0, 9, self.template.title, 0, 2)
+        self.set_font("Arial", "", 10)
+        self.set_text_color(*DARK_GREY)
+        self.cell(0, 6, f"{self.template.company}  |  Generated on {self.generated_on}", 0, 2)
+        self.set_draw_color(*BRAND_GREEN)
+        self.set_line_width(0.6)
+        self.line(15, 36, 195, 36)
+        self.set_y(42)
+    
+    def footer(self):
+        self.set_y(-15)
+        self.set_font("Arial", "I", 8)
+        self.set_text_color(128, 128, 128)
+        self.cell(0, 10, f"{self.template.company} - page {self.page_no()} of {{nb}}", 0, 0, "C")
+    
+    def keep_together(self, height):
+        """Start a new page unless the next height (mm) fits on this one."""
+        if self.get_y() + height > self.page_break_trigger:
+            self.add_page()
+    
+    def section(self, title):
+        self.keep_together(30)
+        self.ln(3)
+        self.set_font("Arial", "B", 12)
+        self.set_text_color(255, 255, 255)
+        self.set_fill_color(*BRAND_GREEN)
+        self.cell(0, 8, _latin1(title), 0, 1, "L", True)
+        self.set_text_color(0, 0, 0)
+        self.ln(1)
+    
+    def key_values(self, rows):
+        self.set_font("Arial", "", 10)
+        for label, value in rows:
+            self.set_font("Arial", "B", 10)
+            self.cell(60, 6, _latin1(label), 0, 0)
+            self.set_font("Arial", "", 10)
+            self.multi_cell(0, 6, _latin1(value))
+    
+    def table(self, headings, rows, widths, last_row_bold=False):
+        self.keep_together(7 * (len(rows) + 1))
+        self.set_font("Arial", "B", 10)
+        self.set_fill_color(*LIGHT_GREY)
+        for heading, width in zip(headings, widths):
+            self.cell(width, 7, _latin1(heading), 1, 0, "C", True)
+        self.ln()
+        for position, row in enumerate(rows):
+            bold = last_row_bold and position == len(rows) - 1
+            self.set_font("Arial", "B" if bold else "", 10)
+            for column, (value, width) in enumerate(zip(row, widths)):
+                self.cell(width, 7, _latin1(value), 1, 0, "L" if column == 0 else "R")
+            self.ln()
+    
+    def bullets(self, items):
+        self.set_font("Arial", "", 10)
+        for item in items:
+            self.cell(5, 6, "-", 0, 0)
+            self.multi_cell(0, 6, _latin1(item))
+
+@timed("render_quotation_pdf")
+def render_quotation_pdf(heat_loss, quotation, property_data, generated_on=None):
+    """
+    Render the quotation as a PDF document.
+    
+    Args:
+        heat_loss: Dictionary containing heat loss calculations
+        quotation: Dictionary containing quotation details
+        property_data: Dictionary containing property information
+        generated_on: Date string for the header (defaults to today)
+        
+    Returns:
+        The PDF file as bytes
+    """
+    template = _get_template()
+    generated_on = generated_on or datetime.now().strftime('%Y-%m-%d')
+    pdf = template.document_class(template, generated_on)
+    pdf.add_page()
+    
+    # Property Information
+    pdf.section("Property Information")
+    pdf.key_values([
+        ("Property Type", property_data['property_type']),
+        ("Construction Year", property_data['construction_year']),
+        ("Floor Area", f"{property_data['floor_area']} m²"),
+        ("Insulation Level", property_data['insulation_level']),
+        ("Windows Quality", property_data['windows_quality']),
+    ])
+    
+    # Heat Loss Results
+    pdf.section("Heat Loss Assessment")
+    pdf.key_values([
+        ("Total Heat Loss", f"{heat_loss['total_heat_loss']:.2f} kW"),
+        ("Heat Loss per m²", f"{heat_loss['heat_loss_per_sqm']:.2f} W/m²"),
+        ("Energy Efficiency Rating", heat_loss['efficiency_rating']),
+    ])
+    
+    # Heat Loss Breakdown
+    components = [
+        ("Walls", heat_loss['wall_loss']),
+        ("Roof", heat_loss['roof_loss']),
+        ("Windows", heat_loss['window_loss']),
+        ("Floor", heat_loss['floor_loss']),
+        ("Ventilation", heat_loss['ventilation_loss']),
+    ]
+    component_total = sum(value for _, value in components)
+    rows = [
+        (name, f"{value:.2f}", f"{value / component_total * 100:.1f}%" if component_total else "-")
+        for name, value in components
+    ]
+    rows.append(("Total (after property and regional factors)", f"{heat_loss['total_heat_loss']:.2f}", ""))
+    pdf.ln(2)
+    pdf.table(["Component", "Heat Loss (kW)", "Share"], rows, [100, 45, 35], last_row_bold=True)
+    
+    # Recommended Solution
+    recommended_pack = quotation['recommended_pack']
+    pdf.section("Recommended Air Source Heat Pump Solution")
+    pdf.key_values([
+        ("Package", recommended_pack['name']),
+        ("Description", recommended_pack['description']),
+    ])
+    pdf.set_font("Arial", "B", 10)
+    pdf.cell(0, 6, "Features:", 0, 1)
+    pdf.bullets(recommended_pack['features'])
+    
+    # Costs
+    pdf.section("Pricing Details")
+    pdf.table(
+        ["Item", "Cost"],
+        [
+            ("Product Price", f"£{recommended_pack['price']:.2f}"),
+            ("Installation Cost", f"£{quotation['installation_cost']:.2f}"),
+            ("Total Cost", f"£{quotation['total_cost']:.2f}"),
+        ],
+        [135, 45],
+        last_row_bold=True
+    )
+    
+    # Savings
+    pdf.section("Potential Savings")
+    pdf.key_values([
+        ("Annual Gas Heating Cost", f"£{quotation['annual_gas_cost']:.2f}"),
+        ("Annual Heat Pump Running Cost", f"£{quotation['annual_running_cost']:.2f}"),
+        ("Estimated Annual Savings", f"£{quotation['estimated_annual_savings']:.2f}"),
+        ("Payback Period", format_payback(quotation['payback_period'])),
+    ])
+    
+    # Recommendations
+    pdf.section("Additional Recommendations")
+    pdf.bullets(quotation['additional_recommendations'])
+    
+    # Disclaimer
+    pdf.ln(4)
+    pdf.set_font("Arial", "I", 8)
+    pdf.set_text_color(*DARK_GREY)
+    pdf.multi_cell(0, 4, template.disclaimer)
+    
+    output = pdf.output(dest="S")
+    return output.encode("latin-1") if isinstance(output, str) else bytes(output)
+
+def quotation_pdf_key(heat_loss, quotation, property_data):
+    """
+    Return the content address of a quotation PDF.
+    
+    The key hashes everything the document is rendered from except the
+    generation date, so an identical quote asked for again (by the same or
+    another session) maps to the same key.
+    
+    Args:
+        heat_loss: Dictionary containing heat loss calculations
+        quotation: Dictionary containing quotation details
+        property_data: Dictionary containing property information
+        
+    Returns:
+        A hexadecimal SHA-256 digest
+    """
+    canonical = json.dumps(
+        [heat_loss, quotation, property_data], sort_keys=True, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+_pdf_cache = LRUCache(maxsize=PDF_CACHE_SIZE)
+
+def get_quotation_pdf(heat_loss, quotation, property_data):
+    """
+    Return the quotation PDF, rendering it only the first time its content is seen.
+    
+    Documents are cached by quotation_pdf_key. A cached document keeps the
+    date it was first generated on.
+    
+    Args:
+        heat_loss: Dictionary containing heat loss calculations
+        quotation: Dictionary containing quotation details
+        property_data: Dictionary containing property information
+        
+    Returns:
+        The PDF file as bytes
+    """
+    return _pdf_cache.get_or_compute(
+        quotation_pdf_key(heat_loss, quotation, property_data),
+        lambda: render_quotation_pdf(heat_loss, quotation, property_data)
+    )
+
+def _render_to_file(job):
+    """Render one batch job to disk (runs in a worker process)."""
+    path, heat_loss, quotation, property_data, generated_on = job
+    with open(path, "wb") as handle:
+        handle.write(render_quotation_pdf(heat_loss, quotation, property_data, generated_on))
+    return path
+
+def render_quotation_pdfs(jobs, output_dir, workers=None, chunksize=16):
+    """
+    Render many quotation PDFs in a pool of worker processes.
+    
+    Each worker builds the shared template once and reuses it for every
+    document it renders.
+    
+    Args:
+        jobs: Iterable of (filename, heat_loss, quotation, property_data) tuples
+        output_dir: Directory the PDFs are written to (created if missing)
+        workers: Number of worker processes (defaults to every CPU); 1 renders inline
+        chunksize: Jobs sent to a worker at a time
+        
+    Returns:
+        List of the written file paths, in job order
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    generated_on = datetime.now().strftime('%Y-%m-%d')
+    tasks = (
+        (os.path.join(output_dir, filename), heat_loss, quotation, property_data, generated_on)
+        for filename, heat_loss, quotation, property_data in jobs
+    )
+    
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return [_render_to_file(task) for task in tasks]
+    
+    from concurrent.futures import ProcessPoolExecutor
     
-    return "\n".join(content)
\ No newline at end of file
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_render_to_file, tasks, chunksize=chunksize))
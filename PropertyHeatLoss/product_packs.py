@@ -1,105 +1,293 @@
+import csv
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# Default catalogue shipped with the app; SPIRE_CATALOGUE_PATH may point to
+# another JSON/CSV file or to a directory of them
+DEFAULT_CATALOGUE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "product_packs.json")
+
+# Minimum seconds between file modification checks
+RELOAD_CHECK_INTERVAL = 1.0
+
+_REQUIRED_FIELDS = ("id", "name", "description", "min_heat_loss", "max_heat_loss", "price", "features", "ideal_for")
+_NUMERIC_FIELDS = ("min_heat_loss", "max_heat_loss", "price")
+_LIST_FIELDS = ("features", "ideal_for")
+# Numeric fields a pack may leave out (see running_costs for their defaults)
+_OPTIONAL_NUMERIC_FIELDS = ("scop",)
+# Separator for list fields in CSV catalogues
+_CSV_LIST_SEPARATOR = "|"
+
+class FrozenPack(dict):
+    """
+    A read-only product pack dictionary.
+
+    Packs are shared by every quotation built from a catalogue, so any
+    attempt to modify one raises TypeError. List fields are stored as tuples.
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Product packs are read-only")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+    __ior__ = _readonly
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self),))
+
+class Catalogue(tuple):
+    """
+    An immutable, versioned sequence of product packs.
+
+    Args:
+        packs: Iterable of product pack dictionaries
+        version: Content hash of the files the catalogue was parsed from
+        source: Path the catalogue was loaded from
+    """
+
+    def __new__(cls, packs, version, source=None):
+        catalogue = super().__new__(cls, packs)
+        catalogue.version = version
+        catalogue.source = source
+        return catalogue
+
+    def __reduce__(self):
+        return (self.__class__, (tuple(self), self.version, self.source))
+
+def _freeze_pack(pack, origin):
+    """Validate a raw pack record and return it as a FrozenPack."""
+    missing = [field for field in _REQUIRED_FIELDS if field not in pack]
+    if missing:
+        raise ValueError(f"{origin}: pack {pack.get('id', '?')!r} is missing {', '.join(missing)}")
+
+    values = dict(pack)
+    for field in _OPTIONAL_NUMERIC_FIELDS:
+        # CSV catalogues give an empty cell for a missing value
+        if values.get(field) in ("", None):
+            values.pop(field, None)
+    for field in _NUMERIC_FIELDS + tuple(field for field in _OPTIONAL_NUMERIC_FIELDS if field in values):
+        try:
+            values[field] = float(values[field]) if isinstance(values[field], str) else values[field]
+        except ValueError:
+            raise ValueError(f"{origin}: pack {pack['id']!r} has a non-numeric {field}") from None
+    for field in _LIST_FIELDS:
+        value = values[field]
+        if isinstance(value, str):
+            value = [item.strip() for item in value.split(_CSV_LIST_SEPARATOR) if item.strip()]
+        values[field] = tuple(value)
+
+    return FrozenPack(values)
+
+def _parse_file(path, content):
+    """Parse the bytes of one JSON or CSV catalogue file into packs."""
+    if path.endswith(".csv"):
+        rows = csv.DictReader(content.decode("utf-8-sig").splitlines())
+        return [_freeze_pack(row, path) for row in rows]
+
+    records = json.loads(content)
+    if isinstance(records, dict):
+        records = records.get("packs", [])
+    return [_freeze_pack(record, path) for record in records]
+
+def _catalogue_files(path):
+    """Return the catalogue files at a path (a single file or a directory)."""
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.endswith((".json", ".csv"))
+        )
+    return [path]
+
+def _file_signature(files):
+    """Return a cheap change signature (mtime and size) for catalogue files."""
+    signature = []
+    for file in files:
+        stat = os.stat(file)
+        signature.append((file, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+def load_catalogue(path=None):
+    """
+    Load and parse a product catalogue from disk.
+
+    Args:
+        path: JSON/CSV file or directory of files; defaults to
+            SPIRE_CATALOGUE_PATH or the bundled product_packs.json
+
+    Returns:
+        A Catalogue whose version is a hash of the file contents
+    """
+    path = path or os.environ.get("SPIRE_CATALOGUE_PATH") or DEFAULT_CATALOGUE_PATH
+    files = _catalogue_files(path)
+    if not files:
+        raise ValueError(f"No catalogue files found in {path}")
+
+    digest = hashlib.sha256()
+    packs = []
+    for file in files:
+        with open(file, "rb") as handle:
+            content = handle.read()
+        digest.update(os.path.basename(file).encode() + b"\0" + content)
+        packs.extend(_parse_file(file, content))
+
+    if not packs:
+        raise ValueError(f"Catalogue at {path} contains no product packs")
+
+    return Catalogue(packs, digest.hexdigest()[:16], path)
+
+class _CatalogueStore:
+    """
+    Holds the process-wide catalogue and reloads it when its files change.
+
+    Readers never wait: they get the current catalogue object, and a reload
+    replaces it with a single reference swap once the new one is parsed.
+    Only one thread reloads at a time, and a catalogue that fails to parse
+    is logged and leaves the previous one in service.
+    """
+
+    def __init__(self):
+        self.catalogue = None
+        self._path = None
+        self._signature = None
+        self._checked_at = 0.0
+        self._reload_lock = threading.Lock()
+
+    def get(self):
+        catalogue = self.catalogue
+        path = os.environ.get("SPIRE_CATALOGUE_PATH") or DEFAULT_CATALOGUE_PATH
+        if catalogue is not None and path == self._path and \
+                time.monotonic() - self._checked_at < RELOAD_CHECK_INTERVAL:
+            return catalogue
+
+        if not self._reload_lock.acquire(blocking=catalogue is None):
+            # Another thread is already revalidating; keep serving this one
+            return catalogue
+
+        try:
+            self._revalidate(path)
+        finally:
+            self._reload_lock.release()
+
+        return self.catalogue
+
+    def _revalidate(self, path):
+        try:
+            signature = _file_signature(_catalogue_files(path))
+            if self.catalogue is None or path != self._path or signature != self._signature:
+                catalogue = load_catalogue(path)
+                if self.catalogue is None or catalogue.version != self.catalogue.version:
+                    logger.info("Loaded product catalogue %s (version %s, %d packs)",
+                                path, catalogue.version, len(catalogue))
+                    self.catalogue = catalogue
+                self._path = path
+                self._signature = signature
+        except (OSError, ValueError) as error:
+            if self.catalogue is None:
+                raise
+            logger.warning("Keeping catalogue version %s; reload failed: %s", self.catalogue.version, error)
+        finally:
+            self._checked_at = time.monotonic()
+
+_store = _CatalogueStore()
+
+def get_catalogue():
+    """
+    Return the current product catalogue, reloading it if its files changed.
+
+    The files are checked by modification time and size at most once per
+    RELOAD_CHECK_INTERVAL, and parsed only when that signature changes.
+
+    Returns:
+        The shared Catalogue of product packs
+    """
+    return _store.get()
+
+@timed("get_product_packs")
 def get_product_packs():
     """
     Return a list of available air source heat pump product packs with their details.
-    
+
     Returns:
-        A list of dictionaries containing product pack information
-    """
-    # Define air source heat pump product packs with their specifications and prices
-    product_packs = [
-        {
-            "id": "basic_ashp",
-            "name": "Bufferless ASHP Package",
-            "description": "An air source heat pump system for smaller properties with good insulation.",
-            "min_heat_loss": 0,
-            "max_heat_loss": 5,
-            "price": 6999.99,
-            "features": [
-                "5-7kW Air Source Heat Pump",
-                "Single zone heating control",
-                "Manufacturer controller as property thermostat",
-                "Hot water cylinder (150L)",
-                "Standard radiator compatibility check",
-                "7 year heat pump warranty"
-            ],
-            "ideal_for": ["Apartments", "Small houses", "Well-insulated properties"]
-        },
-        {
-            "id": "standard_ashp",
-            "name": "Multizone ASHP Package",
-            "description": "Our most popular air source heat pump package, suitable for most average-sized properties.",
-            "min_heat_loss": 5,
-            "max_heat_loss": 10,
-            "price": 8499.99,
-            "features": [
-                "8-10kW Air Source Heat Pump",
-                "Dual zone heating control",
-                "Smart thermostat with app control",
-                "Hot water cylinder (200L)",
-                "Radiator upgrade assessment",
-                "Basic underfloor heating compatibility",
-                "10 year heat pump warranty"
-            ],
-            "ideal_for": ["Semi-detached houses", "Terraced houses", "Medium-sized properties"]
-        },
-        {
-            "id": "premium_ashp",
-            "name": "Buffer Driven ASHP Package",
-            "description": "A comprehensive air source heat pump solution for larger properties with higher heating demands.",
-            "min_heat_loss": 10,
-            "max_heat_loss": 15,
-            "price": 10999.99,
-            "features": [
-                "11-14kW Air Source Heat Pump",
-                "Multi-zone heating control",
-                "Advanced smart control system",
-                "Hot water cylinder (250L)",
-                "Full radiator upgrade package",
-                "Underfloor heating integration",
-                "Smartphone app with energy monitoring",
-                "12 year heat pump warranty"
-            ],
-            "ideal_for": ["Detached houses", "Larger properties", "Period properties"]
-        },
-        {
-            "id": "elite_ashp",
-            "name": "Elite ASHP Package",
-            "description": "Our highest specification air source heat pump system for large properties with significant heating requirements.",
-            "min_heat_loss": 15,
-            "max_heat_loss": 100,
-            "price": 14999.99,
-            "features": [
-                "16-18kW Air Source Heat Pump",
-                "Comprehensive multi-zone heating control",
-                "Premium smart control system",
-                "Hot water cylinder (300L+)",
-                "Complete radiator replacement package",
-                "Full underfloor heating system",
-                "Home energy management system",
-                "Full system integration with home automation",
-                "15 year heat pump warranty"
-            ],
-            "ideal_for": ["Large detached properties", "Properties with high heat demand", "Luxury homes"]
-        },
-        {
-            "id": "hybrid_ashp",
-            "name": "Hybrid ASHP Package",
-            "description": "A flexible heating solution combining an air source heat pump with a backup boiler system for extreme conditions.",
-            "min_heat_loss": 10,
-            "max_heat_loss": 25,
-            "price": 12499.99,
-            "features": [
-                "8-12kW Air Source Heat Pump",
-                "Condensing backup boiler system",
-                "Intelligent hybrid controller",
-                "Smart energy switching based on efficiency",
-                "Hot water cylinder (250L)",
-                "Multi-zone temperature control",
-                "Smartphone app with energy usage analytics",
-                "10 year heat pump warranty"
-            ],
-            "ideal_for": ["Period properties", "Properties with varied heating needs", "Phased renewable transition"]
-        }
-    ]
-    
-    return product_packs
+        A Catalogue (an immutable sequence) of read-only product pack dictionaries
+    """
+    return get_catalogue()
+
+def catalogue_version(product_packs):
+    """
+    Return a short version id identifying a product pack catalogue.
+
+    Catalogues loaded from disk carry the hash of their files; any other
+    list of packs is hashed by content. Either way any change to a pack
+    (price, range, features...) produces a new version, which downstream
+    caches use to drop stale quotations.
+
+    Args:
+        product_packs: A Catalogue or list of product pack dictionaries
+
+    Returns:
+        A hexadecimal version string
+    """
+    version = getattr(product_packs, "version", None)
+    if version is not None:
+        return version
+
+    canonical = json.dumps(product_packs, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+class CatalogueCache:
+    """
+    Objects derived from a catalogue, built once per catalogue version.
+
+    Keeps the most recently used maxsize entries. Building happens outside
+    the lock, so two threads may occasionally build the same entry; the
+    last one stored wins, which is harmless for immutable lookup tables.
+
+        _indexes = CatalogueCache(PackIndex)
+        index = _indexes.get(product_packs)
+
+    Args:
+        build: Callable(product_packs, *args) building the object
+        maxsize: Number of entries kept in memory
+    """
+
+    def __init__(self, build, maxsize=8):
+        self._build = build
+        self._maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, product_packs, *args):
+        """
+        Return the object for a catalogue, building it on first use.
+
+        Args:
+            product_packs: List of product pack dictionaries
+            *args: Further (hashable) build arguments, part of the cache key
+
+        Returns:
+            The object build(product_packs, *args) returned for this
+            catalogue version
+        """
+        key = (catalogue_version(product_packs),) + args
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        entry = self._build(product_packs, *args)
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+        return entry
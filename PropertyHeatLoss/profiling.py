@@ -0,0 +1,286 @@
+"""
+Opt-in profiling of individual app reruns and batch chunks.
+
+A capture wraps a block of code in cProfile and tracemalloc and writes three
+files to SPIRE_PROFILE_DIR (default ./profiles), named
+<timestamp>-<label>-<pid>:
+
+- .prof       cProfile statistics (readable with pstats or snakeviz)
+- .tracemalloc  tracemalloc snapshot of memory still allocated at the end
+- .json       label, duration and peak traced memory
+
+Captures are taken for a random SPIRE_PROFILE_RATE fraction of blocks
+(default 0, never), so a low rate can stay on in production. The app also
+profiles a rerun when the page is opened with ?profile=1 if
+SPIRE_PROFILE_ALLOW_QUERY=1 is set. Only one capture runs at a time per
+process, and tracemalloc sees allocations from every thread while it runs.
+
+Summarize captured files with:
+
+    python profiling.py summarize profiles/ --top 15
+"""
+import os
+import random
+import threading
+import time
+from datetime import datetime
+
+DEFAULT_PROFILE_DIR = "profiles"
+
+def _rate():
+    try:
+        return float(os.environ.get("SPIRE_PROFILE_RATE", "0"))
+    except ValueError:
+        return 0.0
+
+# Fraction of blocks captured; read once at import like the metrics settings
+SAMPLE_RATE = _rate()
+QUERY_PARAM_ALLOWED = os.environ.get("SPIRE_PROFILE_ALLOW_QUERY", "").strip().lower() in ("1", "true", "yes", "on")
+# Stack depth recorded per allocation (1 groups allocations by line)
+TRACEMALLOC_FRAMES = 1
+# A capture left running longer than this (e.g. by a rerun that was cut
+# short and never resumed) is stopped when the next capture starts
+MAX_CAPTURE_SECONDS = 60
+
+_capture_lock = threading.Lock()
+_active_capture = None
+
+class Capture:
+    """
+    One profiling capture; use start() and stop(), or as a context manager.
+
+    Args:
+        label: Short name included in the output file names
+        output_dir: Directory for the output files (default SPIRE_PROFILE_DIR)
+    """
+
+    def __init__(self, label, output_dir=None):
+        self.label = label
+        self.output_dir = output_dir or os.environ.get("SPIRE_PROFILE_DIR", DEFAULT_PROFILE_DIR)
+        self.paths = None
+        self._profiler = None
+        self._started_tracemalloc = False
+        self._started_at = None
+
+    def start(self):
+        """Start profiling; returns False if another capture is already running."""
+        global _active_capture
+        if not _capture_lock.acquire(blocking=False):
+            stale = _active_capture
+            if stale is None or time.perf_counter() - stale._started_at < MAX_CAPTURE_SECONDS:
+                return False
+            stale.stop()
+            if not _capture_lock.acquire(blocking=False):
+                return False
+
+        import cProfile
+        import tracemalloc
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._started_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._profiler = cProfile.Profile()
+        self._started_at = time.perf_counter()
+        _active_capture = self
+        self._profiler.enable()
+        return True
+
+    @property
+    def running(self):
+        return self._profiler is not None
+
+    def stop(self):
+        """
+        Stop profiling and write the capture files.
+
+        Returns:
+            A dictionary of the written file paths, or None if not running
+        """
+        global _active_capture
+        if self._profiler is None:
+            return None
+
+        import json
+        import tracemalloc
+
+        try:
+            self._profiler.disable()
+            seconds = time.perf_counter() - self._started_at
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            ))
+            current, peak = tracemalloc.get_traced_memory()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+
+            os.makedirs(self.output_dir, exist_ok=True)
+            stem = os.path.join(
+                self.output_dir,
+                f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{self.label}-{os.getpid()}"
+            )
+            self.paths = {
+                "profile": stem + ".prof",
+                "allocations": stem + ".tracemalloc",
+                "summary": stem + ".json"
+            }
+            self._profiler.dump_stats(self.paths["profile"])
+            snapshot.dump(self.paths["allocations"])
+            with open(self.paths["summary"], "w") as handle:
+                json.dump({
+                    "label": self.label,
+                    "pid": os.getpid(),
+                    "seconds": seconds,
+                    "traced_current_bytes": current,
+                    "traced_peak_bytes": peak
+                }, handle, indent=2)
+        finally:
+            self._profiler = None
+            _active_capture = None
+            _capture_lock.release()
+
+        return self.paths
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+def should_sample(force=False):
+    """Return True when the next block should be captured."""
+    return force or (SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE)
+
+class _NullCapture:
+    """Stands in for a capture that was not sampled."""
+
+    paths = None
+    running = False
+
+    def start(self):
+        return False
+
+    def stop(self):
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_CAPTURE = _NullCapture()
+
+def capture(label, force=False):
+    """
+    Return a capture for a block if it is sampled, otherwise a no-op.
+
+        with capture("chunk"):
+            quote_frame(...)
+
+    Args:
+        label: Short name included in the output file names
+        force: Capture regardless of the sample rate
+
+    Returns:
+        A Capture (not yet started) or a shared no-op stand-in
+    """
+    return Capture(label) if should_sample(force) else _NULL_CAPTURE
+
+# Key under which a rerun's capture is kept in the session state
+_STATE_KEY = "_profiling_capture"
+
+def start_rerun_capture(state, force=False):
+    """
+    Start a capture for a Streamlit rerun, to be ended by finish_rerun_capture().
+
+    The capture is kept in the session state, so concurrent sessions never
+    stop each other's captures. A rerun cut short by st.rerun() never
+    reaches finish_rerun_capture(), so a capture the previous rerun of the
+    session left running is finished first.
+
+    Args:
+        state: The session state (any mutable mapping)
+        force: Capture regardless of the sample rate (the ?profile=1 switch)
+    """
+    finish_rerun_capture(state)
+    if should_sample(force):
+        candidate = Capture("rerun")
+        if candidate.start():
+            state[_STATE_KEY] = candidate
+
+def finish_rerun_capture(state):
+    """
+    Stop the session's rerun capture, if any, and write its files.
+
+    Args:
+        state: The session state passed to start_rerun_capture()
+
+    Returns:
+        A dictionary of the written file paths, or None
+    """
+    current = state.get(_STATE_KEY)
+    if current is None:
+        return None
+    state[_STATE_KEY] = None
+    return current.stop()
+
+def _capture_files(paths):
+    """Expand files and directories into sorted capture file paths."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in os.listdir(path))
+        else:
+            files.append(path)
+    return sorted(name for name in files if name.endswith((".prof", ".tracemalloc", ".json")))
+
+def summarize(paths, top=15, sort="cumulative", out=None):
+    """
+    Print the top functions and allocation sites from capture files.
+
+    Args:
+        paths: Capture files or directories of them
+        top: Entries to show per file
+        sort: pstats sort key for profiles (cumulative, tottime, ncalls...)
+        out: Stream to write to (default stdout)
+    """
+    import json
+    import pstats
+    import sys
+    import tracemalloc
+
+    out = out or sys.stdout
+    for path in _capture_files(paths):
+        print(f"== {path}", file=out)
+        if path.endswith(".json"):
+            with open(path) as handle:
+                info = json.load(handle)
+            print(f"{info['label']}: {info['seconds'] * 1000:.1f} ms, "
+                  f"peak traced memory {info['traced_peak_bytes'] / 1024:.0f} KiB", file=out)
+        elif path.endswith(".prof"):
+            pstats.Stats(path, stream=out).strip_dirs().sort_stats(sort).print_stats(top)
+        else:
+            statistics = tracemalloc.Snapshot.load(path).statistics("lineno")
+            for statistic in statistics[:top]:
+                print(f"  {statistic}", file=out)
+        print(file=out)
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect profiling captures.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    show = commands.add_parser("summarize", help="top functions and allocation sites of captures")
+    show.add_argument("paths", nargs="+", help="capture files or directories")
+    show.add_argument("--top", type=int, default=15, help="entries per file")
+    show.add_argument("--sort", default="cumulative", help="pstats sort key for profiles")
+    args = parser.parse_args(argv)
+
+    summarize(args.paths, args.top, args.sort)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+from bisect import bisect_right
+from collections import namedtuple
+from types import MappingProxyType
+
+class Category(namedtuple("Category", ["field", "options", "factors", "codes"])):
+    """
+    An immutable, ordered set of questionnaire options for one property field.
+
+    Each option has an integer code (its position in ``options``) and a heat
+    loss factor stored at the same position in ``factors``, so looking up a
+    factor is a tuple index rather than a dictionary built per call.
+    """
+
+    __slots__ = ()
+
+    def code(self, label):
+        """
+        Return the integer code for an option label.
+
+        Raises:
+            KeyError: If the label is not one of the category's options
+        """
+        return self.codes[label]
+
+    def factor(self, label):
+        """Return the heat loss factor for an option label."""
+        return self.factors[self.codes[label]]
+
+    def table(self, values, default):
+        """
+        Build a code-indexed tuple from a partial label -> value mapping.
+
+        Args:
+            values: A dictionary of option labels to values
+            default: The value used for options missing from ``values``
+
+        Returns:
+            A tuple with one value per option, in code order
+        """
+        unknown = set(values) - set(self.options)
+        if unknown:
+            raise KeyError(f"Unknown {self.field} value(s): {', '.join(sorted(unknown))}")
+
+        return tuple(values.get(option, default) for option in self.options)
+
+    def flags(self, *labels):
+        """Build a code-indexed tuple of booleans, True for the given labels."""
+        return self.table(dict.fromkeys(labels, True), False)
+
+def _category(field, factors):
+    """Build a Category from an ordered label -> factor dictionary."""
+    options = tuple(factors)
+    codes = MappingProxyType({option: code for code, option in enumerate(options)})
+    return Category(field, options, tuple(float(value) for value in factors.values()), codes)
+
+# Base heat loss factors (W/m²K)
+# These are approximate U-values used for estimation
+INSULATION_LEVEL = _category("insulation_level", {
+    "Poor": 1.5,
+    "Below Average": 1.2,
+    "Average": 1.0,
+    "Good": 0.8,
+    "Excellent": 0.6
+})
+
+WINDOWS_QUALITY = _category("windows_quality", {
+    "Single Glazed": 5.0,
+    "Double Glazed (Old)": 3.0,
+    "Double Glazed (New)": 1.8,
+    "Triple Glazed": 1.0
+})
+
+CONSTRUCTION_YEAR = _category("construction_year", {
+    "Pre-1919": 1.4,
+    "1919-1944": 1.3,
+    "1945-1964": 1.2,
+    "1965-1980": 1.1,
+    "1981-2000": 0.9,
+    "Post-2000": 0.7
+})
+
+PROPERTY_TYPE = _category("property_type", {
+    "Detached House": 1.3,
+    "Semi-Detached House": 1.1,
+    "Terraced House": 1.0,
+    "Apartment/Flat": 0.9,
+    "Bungalow": 1.2
+})
+
+LOCATION = _category("location", {
+    "North": 1.15,
+    "Midlands": 1.05,
+    "South": 1.0,
+    "Scotland": 1.2,
+    "Wales": 1.1,
+    "Northern Ireland": 1.1
+})
+
+# Categories keyed by the property_data field they describe
+CATEGORIES = MappingProxyType({
+    category.field: category
+    for category in (PROPERTY_TYPE, CONSTRUCTION_YEAR, INSULATION_LEVEL, WINDOWS_QUALITY, LOCATION)
+})
+
+# Bedrooms do not affect heat loss but share the questionnaire option list
+BEDROOM_OPTIONS = tuple(range(1, 11))
+
+# Inclusive limits of the numeric questionnaire fields, shared by the app's
+# widgets and the bulk validation (whole: only whole numbers are accepted)
+NumericRange = namedtuple("NumericRange", ["field", "minimum", "maximum", "whole"])
+
+NUMERIC_RANGES = MappingProxyType({
+    numeric.field: numeric
+    for numeric in (
+        NumericRange("floor_area", 10, 1000, False),
+        NumericRange("ceiling_height", 2.0, 5.0, False),
+        NumericRange("num_bedrooms", BEDROOM_OPTIONS[0], BEDROOM_OPTIONS[-1], True)
+    )
+})
+
+# Upper bounds (W/m²) for each efficiency band; anything above the last is "F"
+EFFICIENCY_THRESHOLDS = (40, 60, 90, 120, 150)
+EFFICIENCY_RATINGS = ("A", "B", "C", "D", "E", "F")
+
+def efficiency_rating_for(heat_loss_per_sqm):
+    """
+    Return the efficiency rating letter for a heat loss per m² (W/m²).
+
+    bisect_right reproduces the strict "<" comparisons of each band.
+    """
+    return EFFICIENCY_RATINGS[bisect_right(EFFICIENCY_THRESHOLDS, heat_loss_per_sqm)]
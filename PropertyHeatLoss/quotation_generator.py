@@ -1,6 +1,30 @@
 import random
+from functools import lru_cache
 
-def generate_quotation(heat_loss, product_packs, property_data):
+# NumPy and pandas are imported by the batch path only (see heat_loss_calculator)
+from heat_loss_calculator import category_codes
+from metrics import timed
+from pack_index import get_pack_index
+from property_categories import (
+    CONSTRUCTION_YEAR,
+    INSULATION_LEVEL,
+    PROPERTY_TYPE,
+    WINDOWS_QUALITY
+)
+from running_costs import running_costs, running_costs_batch
+
+# Code-indexed lookup tables, built once from the shared category registry
+# Detached houses and bungalows are more complex installs
+_TYPE_COMPLEXITY = PROPERTY_TYPE.table({"Detached House": 1.2, "Bungalow": 1.2}, 1.0)
+# Older properties often need more work for ASHP
+_ERA_COMPLEXITY = CONSTRUCTION_YEAR.table({"Pre-1919": 1.4, "1919-1944": 1.4}, 1.0)
+_POOR_INSULATION = INSULATION_LEVEL.flags("Poor", "Below Average")
+_SINGLE_GLAZED = WINDOWS_QUALITY.flags("Single Glazed")
+_UPGRADEABLE_WINDOWS = WINDOWS_QUALITY.flags("Single Glazed", "Double Glazed (Old)")
+_RADIATOR_UPGRADE_ERAS = CONSTRUCTION_YEAR.flags("Pre-1919", "1919-1944", "1945-1964")
+
+@timed("generate_quotation")
+def generate_quotation(heat_loss, product_packs, property_data, pack_index=None, tariff=None):
     """
     Generate an air source heat pump quotation based on heat loss calculation and available product packs.
     
@@ -8,6 +32,8 @@ def generate_quotation(heat_loss, product_packs, property_data):
         heat_loss: Dictionary containing heat loss calculations
         product_packs: List of available air source heat pump product packs
         property_data: Dictionary containing property information
+        pack_index: Optional prebuilt PackIndex for product_packs
+        tariff: Energy tariff name for the running costs (default: running_costs.DEFAULT_TARIFF)
         
     Returns:
         A dictionary with quotation details
@@ -15,47 +41,32 @@ def generate_quotation(heat_loss, product_packs, property_data):
     # Extract total heat loss
     total_heat_loss = heat_loss["total_heat_loss"]
     
-    # Find suitable product packs based on total heat loss
-    suitable_packs = []
-    for pack in product_packs:
-        if pack["min_heat_loss"] <= total_heat_loss <= pack["max_heat_loss"]:
-            suitable_packs.append(pack)
-    
-    # If no suitable packs, select the one with closest max_heat_loss
-    if not suitable_packs:
-        if total_heat_loss < min(pack["min_heat_loss"] for pack in product_packs):
-            suitable_packs = [min(product_packs, key=lambda x: x["min_heat_loss"])]
-        else:
-            suitable_packs = [max(product_packs, key=lambda x: x["max_heat_loss"])]
+    # Select the most appropriate pack (closest to the middle of its range)
+    # and up to 3 alternatives by price, using the catalogue's prebuilt index
+    if pack_index is None:
+        pack_index = get_pack_index(product_packs)
     
-    # Select the most appropriate pack (middle of the range)
-    recommended_pack = sorted(suitable_packs, key=lambda x: abs(total_heat_loss - (x["min_heat_loss"] + x["max_heat_loss"]) / 2))[0]
+    recommended_pack = pack_index.recommend(total_heat_loss)
+    alternative_packs = pack_index.alternatives(recommended_pack)
     
-    # Find alternative packs (up to 3)
-    alternative_packs = []
-    for pack in product_packs:
-        if pack["id"] != recommended_pack["id"]:
-            alternative_packs.append(pack)
-    
-    # Sort alternatives by price and select up to 3
-    alternative_packs = sorted(alternative_packs, key=lambda x: x["price"])[:3]
+    # Encode the property categories once
+    type_code = PROPERTY_TYPE.code(property_data["property_type"])
+    era_code = CONSTRUCTION_YEAR.code(property_data["construction_year"])
+    insulation_code = INSULATION_LEVEL.code(property_data["insulation_level"])
+    windows_code = WINDOWS_QUALITY.code(property_data["windows_quality"])
+    poor_insulation = _POOR_INSULATION[insulation_code]
     
     # Calculate installation costs (based on property size, heat loss, and additional ASHP factors)
     base_installation_cost = 3500  # Higher base cost for ASHP installation
     size_factor = property_data["floor_area"] / 100  # Normalize to 100m²
-    complexity_factor = 1.0
     
     # Adjust complexity factor based on property type and construction year
-    if property_data["property_type"] in ["Detached House", "Bungalow"]:
-        complexity_factor *= 1.2
-    
-    if property_data["construction_year"] in ["Pre-1919", "1919-1944"]:
-        complexity_factor *= 1.4  # Older properties often need more work for ASHP
+    complexity_factor = 1.0 * _TYPE_COMPLEXITY[type_code] * _ERA_COMPLEXITY[era_code]
     
     # ASHP-specific factors
     # Check if radiator upgrades likely needed (based on insulation level and windows)
     radiator_upgrade_factor = 1.0
-    if property_data["insulation_level"] in ["Poor", "Below Average"] or property_data["windows_quality"] == "Single Glazed":
+    if poor_insulation or _SINGLE_GLAZED[windows_code]:
         radiator_upgrade_factor = 1.3  # Likely needs radiator upgrades for ASHP
     
     installation_cost = base_installation_cost * size_factor * complexity_factor * radiator_upgrade_factor
@@ -63,29 +74,12 @@ def generate_quotation(heat_loss, product_packs, property_data):
     # Calculate total cost
     total_cost = recommended_pack["price"] + installation_cost
     
-    # Calculate estimated annual savings compared to traditional heating
-    # This is a simplified calculation for demonstration purposes
-    average_gas_heating_cost = 1200  # Assumed average annual gas heating cost
-    average_electricity_cost_for_ashp = 800  # Assumed average electricity cost to run ASHP
-    
-    # Calculate estimated savings based on efficiency ratings
-    base_savings = average_gas_heating_cost - average_electricity_cost_for_ashp
-    
-    efficiency_multiplier = 1.0
-    if heat_loss["efficiency_rating"] == "A":
-        efficiency_multiplier = 1.3  # Better efficiency = better savings
-    elif heat_loss["efficiency_rating"] == "B":
-        efficiency_multiplier = 1.2
-    elif heat_loss["efficiency_rating"] == "C":
-        efficiency_multiplier = 1.1
-    elif heat_loss["efficiency_rating"] == "D":
-        efficiency_multiplier = 1.0
-    elif heat_loss["efficiency_rating"] == "E":
-        efficiency_multiplier = 0.9
-    else:
-        efficiency_multiplier = 0.8  # Poor efficiency = lower savings
+    # Annual running costs of each compared pack against the gas boiler it
+    # replaces, simulated hour by hour over the region's design year
+    costs = running_costs(heat_loss, property_data, product_packs, [recommended_pack] + alternative_packs, tariff)
+    recommended_costs = costs["packs"][recommended_pack["id"]]
     
-    estimated_annual_savings = base_savings * efficiency_multiplier
+    estimated_annual_savings = recommended_costs["savings"]
     
     # Calculate payback period
     payback_period = total_cost / estimated_annual_savings if estimated_annual_savings > 0 else float('inf')
@@ -93,14 +87,14 @@ def generate_quotation(heat_loss, product_packs, property_data):
     # Generate additional recommendations based on property data with ASHP focus
     additional_recommendations = []
     
-    if property_data["insulation_level"] in ["Poor", "Below Average"]:
+    if poor_insulation:
         additional_recommendations.append("Improve wall and loft insulation to maximize heat pump efficiency")
     
-    if property_data["windows_quality"] in ["Single Glazed", "Double Glazed (Old)"]:
+    if _UPGRADEABLE_WINDOWS[windows_code]:
         additional_recommendations.append("Upgrade windows to improve insulation for optimal heat pump performance")
     
     # ASHP-specific recommendations
-    if property_data["construction_year"] in ["Pre-1919", "1919-1944", "1945-1964"]:
+    if _RADIATOR_UPGRADE_ERAS[era_code]:
         additional_recommendations.append("Consider upgrading to larger radiators or underfloor heating for optimal heat pump operation")
     
     # Add ASHP-specific general recommendations
@@ -116,9 +110,149 @@ def generate_quotation(heat_loss, product_packs, property_data):
         "alternative_packs": alternative_packs,
         "installation_cost": installation_cost,
         "total_cost": total_cost,
+        "annual_gas_cost": costs["gas_cost"],
+        "annual_running_cost": recommended_costs["running_cost"],
+        "annual_electricity_kwh": recommended_costs["electricity_kwh"],
         "estimated_annual_savings": estimated_annual_savings,
         "payback_period": payback_period,
+        # Savings of every compared pack, keyed by pack id
+        "pack_savings": {pack_id: values["savings"] for pack_id, values in costs["packs"].items()},
         "additional_recommendations": additional_recommendations
     }
     
     return quotation
+
+@lru_cache(maxsize=None)
+def _batch_tables():
+    """Return array copies of the lookup tables for the batch path, built on first use."""
+    import numpy as np
+    
+    return {
+        "type_complexity": np.array(_TYPE_COMPLEXITY),
+        "era_complexity": np.array(_ERA_COMPLEXITY),
+        "poor_insulation": np.array(_POOR_INSULATION),
+        "single_glazed": np.array(_SINGLE_GLAZED)
+    }
+
+def _installation_cost_batch(properties):
+    """Installation costs, with the same factors and evaluation order as generate_quotation."""
+    import numpy as np
+    
+    tables = _batch_tables()
+    type_codes = category_codes(properties["property_type"], PROPERTY_TYPE)
+    era_codes = category_codes(properties["construction_year"], CONSTRUCTION_YEAR)
+    insulation_codes = category_codes(properties["insulation_level"], INSULATION_LEVEL)
+    windows_codes = category_codes(properties["windows_quality"], WINDOWS_QUALITY)
+    
+    size_factor = properties["floor_area"].to_numpy(dtype=float) / 100
+    complexity_factor = 1.0 * tables["type_complexity"][type_codes] * tables["era_complexity"][era_codes]
+    radiator_upgrade_factor = np.where(
+        tables["poor_insulation"][insulation_codes] | tables["single_glazed"][windows_codes], 1.3, 1.0
+    )
+    return 3500 * size_factor * complexity_factor * radiator_upgrade_factor
+
+def _payback(total_cost, savings):
+    import numpy as np
+    
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(savings > 0, total_cost / savings, float('inf'))
+
+@timed("generate_quotation_batch")
+def generate_quotation_batch(heat_loss, product_packs, properties, pack_index=None, tariff=None,
+                             pack_positions=None):
+    """
+    Generate the headline quotation figures for many properties at once.
+    
+    Each row matches the corresponding values of generate_quotation exactly;
+    alternatives and written recommendations are left to the scalar function.
+    
+    Args:
+        heat_loss: DataFrame returned by calculate_heat_loss_batch
+        product_packs: List of available air source heat pump product packs
+        properties: DataFrame (or mapping of columns) of property information,
+            row-aligned with heat_loss
+        pack_index: Optional prebuilt PackIndex for product_packs
+        tariff: Energy tariff name for the running costs (default: running_costs.DEFAULT_TARIFF)
+        pack_positions: Optional catalogue position of the pack to quote for
+            each row (e.g. from pack_allocation.allocate_packs) instead of the
+            recommended one
+        
+    Returns:
+        A DataFrame indexed like heat_loss with the recommended pack id and
+        price, installation and total cost, annual gas and heat pump running
+        costs, heat pump electricity use, annual savings and payback period
+    """
+    import numpy as np
+    import pandas as pd
+    
+    if not isinstance(properties, pd.DataFrame):
+        properties = pd.DataFrame(properties)
+    if pack_index is None:
+        pack_index = get_pack_index(product_packs)
+    
+    # Recommended pack per row, unless the caller chose them
+    if pack_positions is None:
+        positions = pack_index.recommend_many(heat_loss["total_heat_loss"].to_numpy(dtype=float))
+    else:
+        positions = np.asarray(pack_positions, dtype=np.intp)
+    pack_ids = np.array([pack["id"] for pack in pack_index.packs], dtype=object)[positions]
+    pack_prices = np.array([pack["price"] for pack in pack_index.packs], dtype=float)[positions]
+    
+    installation_cost = _installation_cost_batch(properties)
+    total_cost = pack_prices + installation_cost
+    
+    # Running costs of each row's recommended pack, then payback
+    costs = running_costs_batch(heat_loss, properties, product_packs, positions, tariff)
+    estimated_annual_savings = costs["savings"]
+    
+    return pd.DataFrame(
+        {
+            "recommended_pack_id": pack_ids,
+            "pack_price": pack_prices,
+            "installation_cost": installation_cost,
+            "total_cost": total_cost,
+            "annual_gas_cost": costs["gas_cost"],
+            "annual_running_cost": costs["running_cost"],
+            "annual_electricity_kwh": costs["electricity_kwh"],
+            "estimated_annual_savings": estimated_annual_savings,
+            "payback_period": _payback(total_cost, estimated_annual_savings)
+        },
+        index=heat_loss.index
+    )
+
+@timed("compare_packs_batch")
+def compare_packs_batch(heat_loss, product_packs, properties, tariff=None):
+    """
+    Price every pack in the catalogue for every property at once.
+    
+    Args:
+        heat_loss: DataFrame returned by calculate_heat_loss_batch
+        product_packs: List of available air source heat pump product packs
+        properties: DataFrame (or mapping of columns) of property information,
+            row-aligned with heat_loss
+        tariff: Energy tariff name for the running costs (default: running_costs.DEFAULT_TARIFF)
+        
+    Returns:
+        A dictionary with the pack ids and NumPy arrays of shape
+        (properties, packs), packs in catalogue order: total_cost,
+        annual_running_cost, estimated_annual_savings and payback_period;
+        plus annual_gas_cost with one value per property
+    """
+    import numpy as np
+    import pandas as pd
+    
+    if not isinstance(properties, pd.DataFrame):
+        properties = pd.DataFrame(properties)
+    
+    prices = np.array([pack["price"] for pack in product_packs], dtype=float)
+    total_cost = prices[None, :] + _installation_cost_batch(properties)[:, None]
+    costs = running_costs_batch(heat_loss, properties, product_packs, tariff=tariff)
+    
+    return {
+        "pack_ids": [pack["id"] for pack in product_packs],
+        "total_cost": total_cost,
+        "annual_gas_cost": costs["gas_cost"],
+        "annual_running_cost": costs["running_cost"],
+        "estimated_annual_savings": costs["savings"],
+        "payback_period": _payback(total_cost, costs["savings"])
+    }
@@ -0,0 +1,415 @@
+"""
+Streaming, bounded-memory quotation pipeline.
+
+Properties are read in fixed-size chunks, quoted chunk by chunk and handed
+to a sink as soon as each chunk is done, so only a handful of chunks are
+ever held in memory whatever the size of the input:
+
+    with CsvSink("quotes.csv") as sink:
+        run_pipeline("leads.csv", sink, chunk_size=20_000)
+
+quote_chunks() exposes the same work as a plain generator for callers that
+want to drive it themselves.
+
+run_pipeline() validates each chunk first (see validation.py): rows that
+cannot be quoted are set aside with their reasons instead of failing the run.
+"""
+import csv
+import functools
+import itertools
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import metrics
+import profiling
+from climate import simulate_heat_demand_batch
+from heat_loss_calculator import PROPERTY_FIELDS, calculate_heat_loss_batch
+from pack_index import PackIndex, get_pack_index
+from product_packs import catalogue_version, get_product_packs
+from quotation_generator import generate_quotation_batch
+from quotation_store import QuotationStore, batch_rows
+from uncertainty import heat_loss_uncertainty_batch
+from validation import validate_properties
+
+DEFAULT_CHUNK_SIZE = 20_000
+
+def quote_frame(properties, product_packs, pack_index=None, simulate=False, uncertainty=False):
+    """
+    Run heat loss and quotation for a DataFrame of properties.
+
+    Args:
+        properties: DataFrame with the questionnaire fields
+        product_packs: List of available product packs
+        pack_index: Optional prebuilt PackIndex for product_packs
+        simulate: Also append the design-year simulation columns
+            (see climate.simulate_heat_demand_batch)
+        uncertainty: Also append the Monte Carlo percentile columns
+            (see uncertainty.heat_loss_uncertainty_batch)
+
+    Returns:
+        The properties with heat loss and quotation columns appended
+    """
+    heat_loss = calculate_heat_loss_batch(properties)
+    quotation = generate_quotation_batch(heat_loss, product_packs, properties, pack_index)
+    frames = [properties, heat_loss, quotation]
+    if simulate:
+        frames.append(simulate_heat_demand_batch(heat_loss, properties))
+    if uncertainty:
+        bands = heat_loss_uncertainty_batch(properties, product_packs, pack_index=pack_index)
+        frames.append(bands.drop(columns="recommended_pack_id"))
+    return pd.concat(frames, axis=1)
+
+def _is_parquet(path):
+    return str(path).endswith((".parquet", ".pq"))
+
+def read_chunks(source, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield a source of properties as DataFrames of at most chunk_size rows.
+
+    Args:
+        source: A CSV or Parquet path, a DataFrame, or an iterable of
+            property_data dictionaries
+        chunk_size: Maximum rows per chunk
+
+    Yields:
+        DataFrames of property rows
+    """
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunk_size):
+            yield source.iloc[start:start + chunk_size]
+    elif isinstance(source, str) and _is_parquet(source):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    elif isinstance(source, str):
+        with pd.read_csv(source, chunksize=chunk_size) as reader:
+            yield from reader
+    else:
+        records = iter(source)
+        while True:
+            batch = list(itertools.islice(records, chunk_size))
+            if not batch:
+                return
+            yield pd.DataFrame(batch)
+
+def quote_chunks(chunks, product_packs=None, simulate=False, uncertainty=False):
+    """
+    Quote chunks of properties lazily, one chunk per iteration.
+
+    Args:
+        chunks: Iterable of property DataFrames (see read_chunks)
+        product_packs: Catalogue to quote against (defaults to the current one)
+        simulate: Also append the design-year simulation columns
+        uncertainty: Also append the Monte Carlo percentile columns
+
+    Yields:
+        Each chunk with heat loss and quotation columns appended
+    """
+    product_packs = product_packs if product_packs is not None else get_product_packs()
+    pack_index = get_pack_index(product_packs)
+    for chunk in chunks:
+        yield quote_frame(chunk, product_packs, pack_index, simulate, uncertainty)
+
+def _check_columns(chunk):
+    missing = [field for field in PROPERTY_FIELDS if field not in chunk.columns]
+    if missing:
+        raise ValueError(f"Input is missing column(s): {', '.join(missing)}")
+
+# Catalogue, index and options held by each worker process, sent once at start-up
+_worker_packs = None
+_worker_index = None
+_worker_simulate = False
+_worker_uncertainty = False
+
+def _init_worker(product_packs, simulate=False, uncertainty=False):
+    global _worker_packs, _worker_index, _worker_simulate, _worker_uncertainty
+    metrics.start_exporters()
+    _worker_packs = product_packs
+    _worker_index = PackIndex(product_packs)
+    _worker_simulate = simulate
+    _worker_uncertainty = uncertainty
+
+def _quote_for_sink(chunk, prepare):
+    """Validate and quote a chunk and convert it to the sink's payload (runs in a worker)."""
+    # Sampled profiling capture of the chunk (SPIRE_PROFILE_RATE)
+    with profiling.capture("chunk"):
+        valid, invalid = validate_properties(chunk)
+        quotes = quote_frame(valid, _worker_packs, _worker_index, _worker_simulate, _worker_uncertainty)
+        payload = prepare(quotes)
+    return len(quotes), payload, invalid
+
+def _identity(frame):
+    return frame
+
+def run_pipeline(source, sink, chunk_size=DEFAULT_CHUNK_SIZE, product_packs=None,
+                 workers=1, max_pending=None, progress=None, simulate=False, rejects=None, uncertainty=False):
+    """
+    Stream properties from a source through the quotation into a sink.
+
+    At most max_pending chunks are being quoted or waiting to be written at
+    any time: reading blocks until the sink has taken the oldest chunk, so
+    memory stays flat however large the input is. Chunks reach the sink in
+    input order.
+
+    Args:
+        source: Anything read_chunks accepts
+        sink: An object with write(payload) and an optional prepare(frame)
+            used to build the payload (run in the worker process)
+        chunk_size: Rows per chunk
+        product_packs: Catalogue to quote against (defaults to the current one)
+        workers: Worker processes; 1 quotes in this process
+        max_pending: Chunks in flight (default: twice the worker count)
+        progress: Optional callback(rows_done, elapsed_seconds)
+        simulate: Also append the design-year simulation columns
+        rejects: Optional sink given the rows that failed validation, with
+            their reasons in an "errors" column (see validation.py); without
+            one they are only counted
+        uncertainty: Also append the Monte Carlo percentile columns
+
+    Returns:
+        A dictionary with the quoted row, rejected row and chunk counts,
+        elapsed seconds and rows per second
+    """
+    started = time.perf_counter()
+    product_packs = product_packs if product_packs is not None else get_product_packs()
+    prepare = getattr(sink, "prepare", _identity)
+    max_pending = max_pending or 2 * workers
+    reject_prepare = getattr(rejects, "prepare", _identity)
+    rows = rejected = chunks_done = 0
+
+    def deliver(result):
+        nonlocal rows, rejected, chunks_done
+        count, payload, invalid = result
+        sink.write(payload)
+        if len(invalid) and rejects is not None:
+            rejects.write(reject_prepare(invalid))
+        rows += count
+        rejected += len(invalid)
+        chunks_done += 1
+        if progress:
+            progress(rows, time.perf_counter() - started)
+
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(product_packs, simulate, uncertainty))
+    else:
+        _init_worker(product_packs, simulate, uncertainty)
+
+    try:
+        pending = deque()
+        for position, chunk in enumerate(read_chunks(source, chunk_size)):
+            if position == 0:
+                _check_columns(chunk)
+
+            if executor is None:
+                deliver(_quote_for_sink(chunk, prepare))
+                continue
+
+            pending.append(executor.submit(_quote_for_sink, chunk, prepare))
+            # Backpressure: wait for the oldest chunk before reading more
+            while len(pending) >= max_pending:
+                deliver(pending.popleft().result())
+
+        while pending:
+            deliver(pending.popleft().result())
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": rows,
+        "rejected": rejected,
+        "chunks": chunks_done,
+        "seconds": elapsed,
+        "rows_per_second": rows / elapsed if elapsed > 0 else float('inf')
+    }
+
+def _csv_payload(frame):
+    """Format a quoted chunk as CSV text (no header) plus its column names."""
+    return list(frame.columns), frame.to_csv(index=False, header=False)
+
+class CsvSink:
+    """
+    Appends quoted chunks to a CSV file, writing the header once.
+
+    Rows are formatted by prepare() in the worker processes, which keeps the
+    costly float formatting off the writer.
+
+    Args:
+        path: CSV file to create
+    """
+
+    prepare = staticmethod(_csv_payload)
+
+    def __init__(self, path):
+        self._file = open(path, "w", newline="")
+        self._header_written = False
+
+    def write(self, payload):
+        columns, text = payload
+        if not self._header_written:
+            csv.writer(self._file, lineterminator="\n").writerow(columns)
+            self._header_written = True
+        self._file.write(text)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class ParquetSink:
+    """
+    Appends quoted chunks to a Parquet file as row groups (requires pyarrow).
+
+    Args:
+        path: Parquet file to create
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._writer = None
+
+    def write(self, frame):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self._path, table.schema)
+        self._writer.write_table(table.cast(self._writer.schema))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class SqliteSink:
+    """
+    Appends quoted chunks to a SQLite table, one transaction per chunk.
+
+    Args:
+        path: SQLite database file
+        table: Table to create or append to
+    """
+
+    def __init__(self, path, table="quotes"):
+        self._connection = sqlite3.connect(path)
+        self._table = table
+
+    def write(self, frame):
+        frame = frame.assign(efficiency_rating=frame["efficiency_rating"].astype(str))
+        with self._connection:
+            frame.to_sql(self._table, self._connection, if_exists="append", index=False)
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class StoreSink:
+    """
+    Saves quoted chunks to a QuotationStore, one transaction per chunk.
+
+    The rows are hashed and encoded by prepare() in the worker processes;
+    repeats of stored quotations only update their hit counts.
+
+    Args:
+        path: Store database file (default: quotation_store.DEFAULT_STORE_PATH)
+        product_packs: The catalogue the chunks are quoted against (defaults to the current one)
+        tariff: Tariff name the chunks are quoted with
+        source: Recorded source of the rows
+    """
+
+    def __init__(self, path=None, product_packs=None, tariff=None, source="batch"):
+        product_packs = product_packs if product_packs is not None else get_product_packs()
+        self.prepare = functools.partial(_store_payload, catalogue_version(product_packs), tariff, source)
+        self._store = QuotationStore(path)
+
+    def write(self, rows):
+        self._store.write_rows(rows)
+
+    def close(self):
+        self._store.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _store_payload(version, tariff, source, frame):
+    return batch_rows(frame, version, tariff, source)
+
+class TeeSink:
+    """
+    Hands each quoted chunk to several sinks, each prepared in the worker.
+
+    Args:
+        sinks: The sinks to write to, in order
+    """
+
+    def __init__(self, *sinks):
+        self._sinks = sinks
+        self.prepare = functools.partial(
+            _tee_payload, tuple(getattr(sink, "prepare", _identity) for sink in sinks)
+        )
+
+    def write(self, payloads):
+        for sink, payload in zip(self._sinks, payloads):
+            sink.write(payload)
+
+    def close(self):
+        for sink in self._sinks:
+            sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _tee_payload(prepares, frame):
+    return tuple(prepare(frame) for prepare in prepares)
+
+class CallbackSink:
+    """
+    Passes each quoted chunk to a callback.
+
+    Args:
+        callback: Function called with each quoted DataFrame
+    """
+
+    def __init__(self, callback):
+        self._callback = callback
+
+    def write(self, frame):
+        self._callback(frame)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
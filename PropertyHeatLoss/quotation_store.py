@@ -0,0 +1,522 @@
+"""
+Persistent quotation store in SQLite.
+
+Every quotation the app, the service or a batch job produces can be saved
+with its property data, heat loss and quotation, so sales can find it again
+after the session has ended:
+
+    store = QuotationStore()
+    store.save(property_data, heat_loss, quotation, catalogue_version(product_packs))
+    rows, cursor = store.history(location="North", limit=50)
+
+Quotations are deduplicated by content_hash(): the questionnaire fields plus
+the catalogue version and tariff they were quoted against. Saving the same
+inputs again only increments the stored quotation's hits and last-quoted
+time. The database runs in WAL mode, so the app's readers never wait for a
+batch job writing to it. Region, property type, recommended pack and date
+are indexed for the paginated history queries.
+
+Portfolio rollups (quotation counts and sums of heat loss, floor area, cost
+and savings) are kept in quotation_rollups, one row per region, property
+type, construction year, rating and recommended pack. Each write adds the
+quotations it inserted to them in the same transaction, grouped in one
+statement, so single saves and bulk inserts maintain them alike and repeats
+of stored quotations are not counted twice. rollup() aggregates that table,
+whose size is bounded by the option lists and not by the number of
+quotations.
+
+The file is SPIRE_STORE_PATH, or quotations.db next to this module.
+"""
+import hashlib
+import itertools
+import json
+import math
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from heat_loss_calculator import PROPERTY_FIELDS
+from property_categories import CATEGORIES
+from running_costs import get_tariff
+
+DEFAULT_STORE_PATH = os.environ.get(
+    "SPIRE_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "quotations.db")
+)
+DEFAULT_PAGE_SIZE = 50
+# Most connections a store keeps open; further threads wait for a free one
+POOL_SIZE = 4
+# Separator between the fields hashed by content_hash
+_HASH_SEPARATOR = "\x1f"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quotations (
+    id INTEGER PRIMARY KEY,
+    content_hash TEXT NOT NULL UNIQUE,
+    created_at TEXT NOT NULL,
+    last_quoted_at TEXT NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 1,
+    source TEXT NOT NULL,
+    catalogue_version TEXT NOT NULL,
+    tariff TEXT NOT NULL,
+    location TEXT NOT NULL,
+    property_type TEXT NOT NULL,
+    construction_year TEXT NOT NULL,
+    floor_area REAL NOT NULL,
+    total_heat_loss REAL NOT NULL,
+    efficiency_rating TEXT NOT NULL,
+    recommended_pack_id TEXT NOT NULL,
+    total_cost REAL NOT NULL,
+    estimated_annual_savings REAL NOT NULL,
+    payback_period REAL,
+    property_data TEXT NOT NULL,
+    heat_loss TEXT NOT NULL,
+    quotation TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS quotations_created ON quotations (created_at, id);
+CREATE INDEX IF NOT EXISTS quotations_location ON quotations (location, created_at, id);
+CREATE INDEX IF NOT EXISTS quotations_property_type ON quotations (property_type, created_at, id);
+CREATE INDEX IF NOT EXISTS quotations_pack ON quotations (recommended_pack_id, created_at, id);
+
+CREATE TABLE IF NOT EXISTS quotation_rollups (
+    location TEXT NOT NULL,
+    property_type TEXT NOT NULL,
+    construction_year TEXT NOT NULL,
+    efficiency_rating TEXT NOT NULL,
+    recommended_pack_id TEXT NOT NULL,
+    quotations INTEGER NOT NULL,
+    total_heat_loss REAL NOT NULL,
+    floor_area REAL NOT NULL,
+    total_cost REAL NOT NULL,
+    estimated_annual_savings REAL NOT NULL,
+    PRIMARY KEY (location, property_type, construction_year, efficiency_rating, recommended_pack_id)
+) WITHOUT ROWID;
+"""
+
+# Dimensions of the rollup table, and the sums kept for each combination
+ROLLUP_DIMENSIONS = ("location", "property_type", "construction_year", "efficiency_rating", "recommended_pack_id")
+ROLLUP_MEASURES = ("quotations", "total_heat_loss", "floor_area", "total_cost", "estimated_annual_savings")
+
+# Columns written for each quotation, in insert order
+_COLUMNS = (
+    "content_hash", "created_at", "last_quoted_at", "source", "catalogue_version", "tariff",
+    "location", "property_type", "construction_year", "floor_area", "total_heat_loss",
+    "efficiency_rating", "recommended_pack_id", "total_cost", "estimated_annual_savings",
+    "payback_period", "property_data", "heat_loss", "quotation"
+)
+_INSERT = (
+    f"INSERT INTO quotations ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))}) "
+    "ON CONFLICT (content_hash) DO UPDATE SET hits = hits + 1, last_quoted_at = excluded.last_quoted_at"
+)
+# Adds the quotations inserted after a given id to the rollups
+_ROLLUP_DIMENSION_LIST = ", ".join(ROLLUP_DIMENSIONS)
+_ADD_TO_ROLLUPS = (
+    f"INSERT INTO quotation_rollups SELECT {_ROLLUP_DIMENSION_LIST}, COUNT(*), SUM(total_heat_loss), "
+    f"SUM(floor_area), SUM(total_cost), SUM(estimated_annual_savings) FROM quotations WHERE id > ? "
+    f"GROUP BY {_ROLLUP_DIMENSION_LIST} "
+    "ON CONFLICT DO UPDATE SET quotations = quotations + excluded.quotations, "
+    "total_heat_loss = total_heat_loss + excluded.total_heat_loss, "
+    "floor_area = floor_area + excluded.floor_area, total_cost = total_cost + excluded.total_cost, "
+    "estimated_annual_savings = estimated_annual_savings + excluded.estimated_annual_savings"
+)
+# Columns returned by history(), without the stored documents
+_SUMMARY_COLUMNS = (
+    "id", "created_at", "last_quoted_at", "hits", "source", "location", "property_type",
+    "construction_year", "floor_area", "total_heat_loss", "efficiency_rating",
+    "recommended_pack_id", "total_cost", "estimated_annual_savings", "payback_period"
+)
+# Columns of a quoted chunk stored as the heat loss and quotation documents
+_HEAT_LOSS_COLUMNS = (
+    "total_heat_loss", "heat_loss_per_sqm", "wall_loss", "roof_loss", "window_loss",
+    "floor_loss", "ventilation_loss", "efficiency_rating"
+)
+_BATCH_QUOTATION_COLUMNS = frozenset((
+    "recommended_pack_id", "pack_price", "installation_cost", "total_cost", "annual_gas_cost",
+    "annual_running_cost", "annual_electricity_kwh", "estimated_annual_savings", "payback_period",
+    "heat_transfer_coefficient", "design_temperature", "peak_design_load", "annual_heating_kwh"
+))
+# Indexed columns history() can filter on
+_FILTERS = ("location", "property_type", "recommended_pack_id")
+
+def _now():
+    # Fixed-width UTC timestamps sort in time order as text
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+def _hash_text(values, version, tariff):
+    return hashlib.sha256(_HASH_SEPARATOR.join(values + [version, tariff]).encode()).hexdigest()
+
+def content_hash(property_data, catalogue_version, tariff=None):
+    """
+    Return the deduplication key of a quotation's inputs.
+
+    Measurements are hashed as floats, so 100 and 100.0 give the same key.
+
+    Args:
+        property_data: A dictionary containing property information
+        catalogue_version: Version of the catalogue it was quoted against
+        tariff: Tariff name or Tariff (default: running_costs.DEFAULT_TARIFF)
+
+    Returns:
+        A hexadecimal SHA-256 digest
+    """
+    values = [
+        str(property_data[field]) if field in CATEGORIES else repr(float(property_data[field]))
+        for field in PROPERTY_FIELDS
+    ]
+    return _hash_text(values, catalogue_version, get_tariff(tariff).name)
+
+def _finite(value):
+    # An infinite payback (never pays back) is stored as NULL
+    return value if math.isfinite(value) else None
+
+def _dumps(document):
+    return json.dumps(document, separators=(",", ":"), default=str)
+
+def _property_record(property_data):
+    return {field: property_data[field] for field in PROPERTY_FIELDS}
+
+def quotation_row(property_data, heat_loss, quotation, catalogue_version, tariff=None, source="app",
+                  quoted_at=None):
+    """Build the stored row of one quotation from generate_quotation's output."""
+    tariff_name = get_tariff(tariff).name
+    quoted_at = quoted_at or _now()
+    return (
+        content_hash(property_data, catalogue_version, tariff_name),
+        quoted_at,
+        quoted_at,
+        source,
+        catalogue_version,
+        tariff_name,
+        property_data["location"],
+        property_data["property_type"],
+        property_data["construction_year"],
+        float(property_data["floor_area"]),
+        heat_loss["total_heat_loss"],
+        heat_loss["efficiency_rating"],
+        quotation["recommended_pack"]["id"],
+        quotation["total_cost"],
+        quotation["estimated_annual_savings"],
+        _finite(quotation["payback_period"]),
+        _dumps(_property_record(property_data)),
+        _dumps(heat_loss),
+        _dumps(quotation)
+    )
+
+def _json_column(values):
+    """
+    JSON-encode every value of a column exactly as json.dumps would.
+
+    Floats are written with float.__repr__ (what json.dumps uses for finite
+    floats); other values are encoded once per distinct value.
+    """
+    import numpy as np
+    import pandas as pd
+
+    values = np.asarray(values)
+    if values.dtype.kind == "f":
+        encoded = list(map(float.__repr__, values.tolist()))
+        for position in np.flatnonzero(~np.isfinite(values)).tolist():
+            encoded[position] = _dumps(float(values[position]))
+        return encoded
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    table = np.array([_dumps(value.item() if hasattr(value, "item") else value) for value in uniques], dtype=object)
+    return table[codes].tolist()
+
+def _json_documents(columns):
+    """Encode a mapping of column name -> values as one compact JSON object per row."""
+    template = "{" + ",".join(f"{_dumps(name)}:%s" for name in columns) + "}"
+    return [template % values for values in zip(*(_json_column(values) for values in columns.values()))]
+
+def batch_rows(quotes, catalogue_version, tariff=None, source="batch"):
+    """
+    Build the stored rows of a quoted chunk.
+
+    Safe to run in a pipeline worker (see StoreSink in quotation_pipeline),
+    so the hashing and JSON encoding happen off the writer. The documents are
+    encoded column by column, giving the same text as quotation_row.
+
+    Args:
+        quotes: DataFrame from quotation_pipeline.quote_frame; category
+            columns may hold labels or registry codes
+        catalogue_version: Version of the catalogue it was quoted against
+        tariff: Tariff name or Tariff it was quoted with
+        source: Recorded source of the rows
+
+    Returns:
+        A list of row tuples for QuotationStore.write_rows
+    """
+    import numpy as np
+    import pandas as pd
+
+    tariff_name = get_tariff(tariff).name
+    quoted_at = _now()
+
+    properties = {}
+    for field in PROPERTY_FIELDS:
+        column = quotes[field].to_numpy()
+        if field in CATEGORIES and pd.api.types.is_integer_dtype(column.dtype):
+            column = np.array(CATEGORIES[field].options, dtype=object)[column]
+        properties[field] = column
+    heat_loss = {field: quotes[field].to_numpy() for field in _HEAT_LOSS_COLUMNS}
+    heat_loss["efficiency_rating"] = quotes["efficiency_rating"].astype(str).to_numpy()
+    # The quotation figures, plus the design-year simulation when it was run
+    quotation = {field: quotes[field].to_numpy() for field in quotes.columns if field in _BATCH_QUOTATION_COLUMNS}
+
+    # Hash the same text as content_hash: labels as-is, measurements as float reprs
+    hashed = zip(*(
+        properties[field].tolist() if field in CATEGORIES else list(map(repr, properties[field].astype(float).tolist()))
+        for field in PROPERTY_FIELDS
+    ))
+    hashes = [_hash_text(list(values), catalogue_version, tariff_name) for values in hashed]
+    payback = quotation["payback_period"].astype(float)
+
+    return list(zip(
+        hashes,
+        itertools.repeat(quoted_at),
+        itertools.repeat(quoted_at),
+        itertools.repeat(source),
+        itertools.repeat(catalogue_version),
+        itertools.repeat(tariff_name),
+        properties["location"].tolist(),
+        properties["property_type"].tolist(),
+        properties["construction_year"].tolist(),
+        properties["floor_area"].astype(float).tolist(),
+        heat_loss["total_heat_loss"].tolist(),
+        heat_loss["efficiency_rating"].tolist(),
+        quotation["recommended_pack_id"].tolist(),
+        quotation["total_cost"].tolist(),
+        quotation["estimated_annual_savings"].tolist(),
+        np.where(np.isfinite(payback), payback, None).tolist(),
+        _json_documents(properties),
+        _json_documents(heat_loss),
+        _json_documents(quotation)
+    ))
+
+def _decode(row):
+    record = dict(row)
+    for field in ("property_data", "heat_loss", "quotation"):
+        if field in record:
+            record[field] = json.loads(record[field])
+    if "payback_period" in record and record["payback_period"] is None:
+        record["payback_period"] = float('inf')
+    return record
+
+class QuotationStore:
+    """
+    SQLite-backed quotation store, safe to share between threads.
+
+    Threads borrow connections from a pool of at most POOL_SIZE, so a
+    store shared by short-lived threads (Streamlit runs each rerun in a new
+    one) keeps a fixed number open. In WAL mode readers run alongside the
+    single writer.
+
+    Args:
+        path: Database file (default: DEFAULT_STORE_PATH), created if missing
+    """
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_STORE_PATH
+        self._idle = []
+        self._opened = 0
+        self._available = threading.Condition()
+        with self._connection() as connection:
+            had_rollups = connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'quotation_rollups'"
+            ).fetchone()
+            connection.executescript(_SCHEMA)
+        if not had_rollups:
+            # A store created before the rollups existed is summarised once
+            self.rebuild_rollups()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        # Durable at checkpoints; a crash can only lose the latest commits
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    @contextmanager
+    def _connection(self):
+        """Borrow a pooled connection, opening one while the pool is below POOL_SIZE."""
+        with self._available:
+            while not self._idle and self._opened >= POOL_SIZE:
+                self._available.wait()
+            connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                self._opened += 1
+        if connection is None:
+            try:
+                connection = self._connect()
+            except BaseException:
+                with self._available:
+                    self._opened -= 1
+                    self._available.notify()
+                raise
+        try:
+            yield connection
+        finally:
+            with self._available:
+                self._idle.append(connection)
+                self._available.notify()
+
+    def save(self, property_data, heat_loss, quotation, catalogue_version, tariff=None, source="app"):
+        """
+        Save one quotation, or count a repeat of one already stored.
+
+        Args:
+            property_data: A dictionary containing property information
+            heat_loss: The dictionary returned by calculate_heat_loss
+            quotation: The dictionary returned by generate_quotation
+            catalogue_version: Version of the catalogue it was quoted against
+            tariff: Tariff name or Tariff it was quoted with
+            source: Where the quotation came from, e.g. "app" or "service"
+
+        Returns:
+            The content hash of the stored quotation
+        """
+        row = quotation_row(property_data, heat_loss, quotation, catalogue_version, tariff, source)
+        self.write_rows([row])
+        return row[0]
+
+    def write_rows(self, rows):
+        """
+        Insert rows from quotation_row or batch_rows in one transaction,
+        and add the new quotations to the rollups.
+
+        Returns:
+            The number of rows written (repeats included)
+        """
+        with self._connection() as connection, connection:
+            # Take the write lock first, so the ids above the current maximum
+            # are exactly the rows inserted here; repeats keep their old ids
+            connection.execute("BEGIN IMMEDIATE")
+            last_id = connection.execute("SELECT COALESCE(MAX(id), 0) FROM quotations").fetchone()[0]
+            connection.executemany(_INSERT, rows)
+            connection.execute(_ADD_TO_ROLLUPS, (last_id,))
+        return len(rows)
+
+    def save_batch(self, quotes, catalogue_version, tariff=None, source="batch"):
+        """Save a quoted chunk (see batch_rows) in one transaction."""
+        return self.write_rows(batch_rows(quotes, catalogue_version, tariff, source))
+
+    def get(self, quotation_id):
+        """
+        Return a stored quotation with its documents decoded.
+
+        Raises:
+            KeyError: If there is no quotation with that id
+        """
+        with self._connection() as connection:
+            row = connection.execute("SELECT * FROM quotations WHERE id = ?", (quotation_id,)).fetchone()
+        if row is None:
+            raise KeyError(quotation_id)
+        return _decode(row)
+
+    def find(self, content_hash):
+        """Return the stored quotation with a content hash, or None."""
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT * FROM quotations WHERE content_hash = ?", (content_hash,)
+            ).fetchone()
+        return None if row is None else _decode(row)
+
+    def history(self, limit=DEFAULT_PAGE_SIZE, before=None, since=None, until=None, **filters):
+        """
+        Return one page of quotations, newest first.
+
+        Pages are keyset-paginated: pass the returned cursor as before to get
+        the next page, which costs the same however deep the page is.
+
+        Args:
+            limit: Quotations per page
+            before: Cursor from the previous page
+            since: Earliest created_at (ISO timestamp or date) to include
+            until: created_at (ISO timestamp or date) to stop before
+            **filters: location, property_type and/or recommended_pack_id to match
+
+        Returns:
+            A (rows, cursor) tuple: the page as dictionaries of summary
+            columns, and the cursor of the next page or None on the last page
+        """
+        unknown = set(filters) - set(_FILTERS)
+        if unknown:
+            raise ValueError(f"Cannot filter on {', '.join(sorted(unknown))}")
+
+        conditions = []
+        parameters = []
+        for field in _FILTERS:
+            if filters.get(field) is not None:
+                conditions.append(f"{field} = ?")
+                parameters.append(filters[field])
+        if since is not None:
+            conditions.append("created_at >= ?")
+            parameters.append(str(since))
+        if until is not None:
+            conditions.append("created_at < ?")
+            parameters.append(str(until))
+        if before is not None:
+            conditions.append("(created_at, id) < (?, ?)")
+            parameters.extend(before)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._connection() as connection:
+            rows = connection.execute(
+                f"SELECT {', '.join(_SUMMARY_COLUMNS)} FROM quotations {where} "
+                "ORDER BY created_at DESC, id DESC LIMIT ?",
+                parameters + [limit + 1]
+            ).fetchall()
+
+        page = [_decode(row) for row in rows[:limit]]
+        cursor = (page[-1]["created_at"], page[-1]["id"]) if len(rows) > limit else None
+        return page, cursor
+
+    def rollup(self, by=(), **filters):
+        """
+        Return portfolio totals grouped by some of ROLLUP_DIMENSIONS.
+
+        Reads only the rollup table, so the cost does not grow with the
+        number of stored quotations.
+
+        Args:
+            by: Dimensions to group by, e.g. ("location", "efficiency_rating");
+                empty for the totals of the whole portfolio
+            **filters: Dimension values to restrict to, e.g. location="North"
+
+        Returns:
+            A list of dictionaries, one per group, with the group's
+            dimension values and the sums in ROLLUP_MEASURES, ordered by the
+            dimensions
+        """
+        unknown = (set(by) | set(filters)) - set(ROLLUP_DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Unknown rollup dimension(s): {', '.join(sorted(unknown))}")
+
+        columns = list(by) + [f"SUM({measure}) AS {measure}" for measure in ROLLUP_MEASURES]
+        where = " AND ".join(f"{field} = ?" for field in filters)
+        sql = f"SELECT {', '.join(columns)} FROM quotation_rollups"
+        if where:
+            sql += f" WHERE {where}"
+        if by:
+            sql += f" GROUP BY {', '.join(by)} ORDER BY {', '.join(by)}"
+        with self._connection() as connection:
+            rows = connection.execute(sql, list(filters.values())).fetchall()
+        # SUM over no rows gives NULLs; an empty portfolio has no groups
+        return [dict(row) for row in rows if row["quotations"] is not None]
+
+    def rebuild_rollups(self):
+        """Recompute the rollup table from every stored quotation."""
+        with self._connection() as connection, connection:
+            connection.execute("DELETE FROM quotation_rollups")
+            connection.execute(_ADD_TO_ROLLUPS, (0,))
+
+    def close(self):
+        """Close the pooled connections; the store reopens them if used again."""
+        with self._available:
+            for connection in self._idle:
+                connection.close()
+            self._opened -= len(self._idle)
+            self._idle.clear()
+            self._available.notify_all()
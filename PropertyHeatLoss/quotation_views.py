@@ -0,0 +1,174 @@
+import hashlib
+import json
+
+from metrics import timed
+
+# pandas is imported inside the builders so the app can start without it
+
+# Heat loss components shown in the breakdown chart, in display order
+HEAT_LOSS_COMPONENTS = (
+    ("Walls", "wall_loss"),
+    ("Roof", "roof_loss"),
+    ("Windows", "window_loss"),
+    ("Floor", "floor_loss"),
+    ("Ventilation", "ventilation_loss")
+)
+
+def quotation_fingerprint(heat_loss, quotation):
+    """
+    Return a short hash identifying a heat loss result and its quotation.
+
+    Two calculations with the same figures and the same packs (including any
+    catalogue change to price or features) share a fingerprint, so the
+    derived views only need building once per distinct quotation.
+
+    Args:
+        heat_loss: Dictionary containing heat loss calculations
+        quotation: Dictionary containing quotation details
+
+    Returns:
+        A hexadecimal fingerprint string
+    """
+    canonical = json.dumps([heat_loss, quotation], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+def format_payback(years):
+    """Format a payback period, which is infinite when a pack saves nothing."""
+    return f"{years:.1f} years" if years != float('inf') else "Not reached at these prices"
+
+def heat_loss_view(heat_loss):
+    """
+    Build the heat loss breakdown chart data.
+
+    Args:
+        heat_loss: Dictionary containing heat loss calculations
+
+    Returns:
+        DataFrame of heat loss (kW) indexed by category
+    """
+    import pandas as pd
+
+    return pd.DataFrame(
+        {'Heat Loss (kW)': [heat_loss[field] for _, field in HEAT_LOSS_COMPONENTS]},
+        index=pd.Index([label for label, _ in HEAT_LOSS_COMPONENTS], name='Category')
+    )
+
+def _compared_packs(quotation):
+    """Return the recommended pack followed by the alternatives."""
+    return [quotation['recommended_pack']] + list(quotation['alternative_packs'])
+
+def comparison_view(quotation, feature_index=None):
+    """
+    Build the feature comparison table for the recommended and alternative packs.
+
+    Rows are the pricing lines followed by each feature and ideal_for tag of
+    the recommended pack; every pack gets a column with its prices and a
+    tick or cross per row.
+
+    Args:
+        quotation: Dictionary containing quotation details
+        feature_index: Optional FeatureIndex of the catalogue the quotation
+            was built from; a quotation from another catalogue version gets
+            an index of its own packs
+
+    Returns:
+        DataFrame indexed by feature with one column per pack
+    """
+    import pandas as pd
+
+    # Imported here, like pandas, as it loads the catalogue module
+    from feature_index import FeatureIndex
+
+    packs = _compared_packs(quotation)
+    if feature_index is None or not feature_index.covers(packs):
+        feature_index = FeatureIndex(packs)
+    feature_rows, tag_rows = feature_index.comparison(packs, leading=1)
+
+    recommended = quotation['recommended_pack']
+    installation_cost = quotation['installation_cost']
+    comparison_data = {}
+    for column, pack in enumerate(packs):
+        total_cost = quotation['total_cost'] if pack is recommended else pack['price'] + installation_cost
+        comparison_data[pack['name']] = [
+            f"£{pack['price']:.2f}",
+            f"£{installation_cost:.2f}",
+            f"£{total_cost:.2f}"
+        ] + ["✅" if listed[column] else "❌" for _, listed in feature_rows + tag_rows]
+
+    index = pd.Index(
+        ["Price", "Installation Cost", "Total Cost"] +
+        ["Feature: " + feature for feature, _ in feature_rows] +
+        ["Ideal for: " + tag for tag, _ in tag_rows],
+        name="Feature"
+    )
+    return pd.DataFrame(comparison_data, index=index)
+
+def price_view(quotation):
+    """
+    Build the stacked price comparison chart data.
+
+    Args:
+        quotation: Dictionary containing quotation details
+
+    Returns:
+        DataFrame of product price and installation cost indexed by package
+    """
+    import pandas as pd
+
+    packs = _compared_packs(quotation)
+    return pd.DataFrame(
+        {
+            'Product Price (£)': [pack['price'] for pack in packs],
+            'Installation Cost (£)': [quotation['installation_cost']] * len(packs)
+        },
+        index=pd.Index([pack['name'] for pack in packs], name='Package')
+    )
+
+def payback_view(quotation):
+    """
+    Build the payback period table for each package.
+
+    Args:
+        quotation: Dictionary containing quotation details
+
+    Returns:
+        DataFrame of total cost, annual savings and payback indexed by package
+    """
+    import pandas as pd
+
+    alternatives = quotation['alternative_packs']
+    installation_cost = quotation['installation_cost']
+    # Each pack has its own running cost, so its own savings
+    savings = [quotation['pack_savings'][pack['id']] for pack in alternatives]
+    packs = _compared_packs(quotation)
+    return pd.DataFrame(
+        {
+            'Total Cost (£)': [quotation['total_cost']] +
+                              [pack['price'] + installation_cost for pack in alternatives],
+            'Estimated Annual Savings (£)': [quotation['estimated_annual_savings']] + savings,
+            'Payback Period (years)': [quotation['payback_period']] +
+                                      [(pack['price'] + installation_cost) / pack_savings if pack_savings > 0
+                                       else float('inf') for pack, pack_savings in zip(alternatives, savings)]
+        },
+        index=pd.Index([pack['name'] for pack in packs], name='Package')
+    )
+
+@timed("build_quotation_views")
+def build_quotation_views(heat_loss, quotation, feature_index=None):
+    """
+    Build every table and chart shown for a quotation.
+
+    Args:
+        heat_loss: Dictionary containing heat loss calculations
+        quotation: Dictionary containing quotation details
+        feature_index: Optional FeatureIndex of the catalogue (see comparison_view)
+
+    Returns:
+        A dictionary of DataFrames: heat_loss, comparison, price and payback
+    """
+    return {
+        "heat_loss": heat_loss_view(heat_loss),
+        "comparison": comparison_view(quotation, feature_index),
+        "price": price_view(quotation),
+        "payback": payback_view(quotation)
+    }
@@ -0,0 +1,525 @@
+"""
+HTTP quoting service for the CRM and the website.
+
+A small asyncio HTTP/1.1 server (standard library only) around the
+calculator, quotation and PDF export:
+
+    POST /calculate  property_data (or a list of them) -> heat loss
+    POST /quote      property_data (or a list of them) -> heat loss and quotation
+    POST /export     property_data -> quotation PDF
+    GET  /health     status and catalogue version
+    GET  /metrics    Prometheus text (see metrics.py)
+
+Requests for /calculate and /quote are not computed one by one: they are
+queued and coalesced into micro-batches (up to max_batch_size properties,
+waiting at most batch_wait seconds for a batch to fill) which go through
+calculate_heat_loss_batch and generate_quotation_batch in one call, on a
+single background thread so the event loop stays responsive. PDF rendering
+is CPU-bound and runs in a pool of worker processes.
+
+Concurrency is bounded: beyond max_in_flight requests the service answers
+503 at once instead of queueing, at most max_renders PDFs are rendered or
+waiting for a worker, and a request that takes longer than request_timeout
+seconds gets a 504. A worker cannot be interrupted, so the render of a
+timed-out export runs to the end (unless the pool had not dispatched it
+yet) and holds its max_renders slot until then.
+
+Usage:
+    python quote_service.py --port 8080 --max-batch-size 256 --batch-wait-ms 2
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import metrics
+from heat_loss_calculator import PROPERTY_FIELDS, calculate_heat_loss, calculate_heat_loss_batch
+from pack_index import get_pack_index
+from pdf_export import get_quotation_pdf
+from product_packs import catalogue_version, get_product_packs, load_catalogue
+from quotation_generator import generate_quotation, generate_quotation_batch
+from validation import property_errors
+
+logger = logging.getLogger("spire.service")
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+# Properties coalesced into one batch, and how long a batch may wait to fill
+DEFAULT_MAX_BATCH_SIZE = 256
+DEFAULT_BATCH_WAIT = 0.002
+# Requests being handled at once; more are refused with 503
+DEFAULT_MAX_IN_FLIGHT = 1024
+# PDFs being rendered or waiting for a worker
+DEFAULT_MAX_RENDERS = 64
+# Seconds allowed for a request, and for an idle keep-alive connection
+DEFAULT_REQUEST_TIMEOUT = 10.0
+DEFAULT_IDLE_TIMEOUT = 30.0
+# Largest request body accepted (bytes) and properties in one request
+MAX_BODY_SIZE = 1 << 20
+# Oversized bodies up to this size are read and discarded before the 413,
+# so the client sees the answer instead of a reset; larger ones are not read
+MAX_DRAIN_SIZE = 16 * MAX_BODY_SIZE
+MAX_PROPERTIES_PER_REQUEST = 1000
+
+_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable",
+    504: "Gateway Timeout"
+}
+
+class HttpError(Exception):
+    """An error answered with its status code and message."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def check_property(property_data):
+    """
+    Check one request's property data before it joins a batch.
+
+    A bad property would otherwise fail the whole batch it was coalesced
+    into, so it is rejected on its own, by the same rules as the batch
+    validation (see validation.py).
+
+    Args:
+        property_data: The decoded JSON object
+
+    Returns:
+        A property_data dictionary with only the questionnaire fields
+
+    Raises:
+        HttpError: 400 with every problem found
+    """
+    if not isinstance(property_data, dict):
+        raise HttpError(400, "Each property must be a JSON object")
+    errors = property_errors(property_data)
+    if errors:
+        raise HttpError(400, "; ".join(errors))
+    return {field: property_data[field] for field in PROPERTY_FIELDS}
+
+def _json_value(value):
+    # JSON has no infinity (an infinite payback means the pack never pays back)
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+def _records(frame):
+    return [{key: _json_value(value) for key, value in row.items()} for row in frame.to_dict("records")]
+
+class MicroBatcher:
+    """
+    Coalesces concurrent submissions into batches for a vectorized function.
+
+    The first submission starts a batch; it is then topped up with whatever
+    else is queued, for at most max_wait seconds or until max_batch_size
+    items. Batches run one at a time on a background thread, and the next
+    batch fills up while the current one is computed.
+
+    Args:
+        process: Function taking a list of items and returning one result per item
+        max_batch_size: Largest batch
+        max_wait: Seconds a batch waits for more items after the first
+    """
+
+    def __init__(self, process, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait=DEFAULT_BATCH_WAIT):
+        self._process = process
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="spire-batch")
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+
+    async def submit(self, item):
+        """Queue an item and wait for its result."""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, future))
+        return await future
+
+    def _drain(self, batch):
+        while len(batch) < self._max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            self._drain(batch)
+            if len(batch) < self._max_batch_size and self._max_wait > 0:
+                await asyncio.sleep(self._max_wait)
+                self._drain(batch)
+
+            # Requests that timed out while queued are dropped
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                continue
+            try:
+                results = await loop.run_in_executor(self._executor, self._process, [item for item, _ in batch])
+            except Exception as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+# Catalogue held by each render worker, sent once at start-up
+_worker_packs = None
+
+def _init_render_worker(product_packs):
+    global _worker_packs
+    metrics.start_exporters()
+    _worker_packs = product_packs
+
+def _render_export(property_data):
+    """Quote one property and render its PDF (runs in a worker process)."""
+    product_packs = _worker_packs if _worker_packs is not None else get_product_packs()
+    heat_loss = calculate_heat_loss(property_data)
+    quotation = generate_quotation(heat_loss, product_packs, property_data)
+    return get_quotation_pdf(heat_loss, quotation, property_data)
+
+class QuoteService:
+    """
+    The quoting service: HTTP handling, micro-batching and the render pool.
+
+    Args:
+        product_packs: Catalogue to quote against (default: the current
+            catalogue, reloaded when its files change)
+        max_batch_size: Properties coalesced into one batch
+        batch_wait: Seconds a batch waits to fill
+        max_in_flight: Requests handled at once before answering 503
+        max_renders: PDFs rendered or queued at once before answering 503
+        request_timeout: Seconds before a request is answered with 504
+        idle_timeout: Seconds an idle keep-alive connection is kept open
+        render_workers: Worker processes for PDF export (default: every CPU)
+    """
+
+    def __init__(self, product_packs=None, max_batch_size=DEFAULT_MAX_BATCH_SIZE, batch_wait=DEFAULT_BATCH_WAIT,
+                 max_in_flight=DEFAULT_MAX_IN_FLIGHT, max_renders=DEFAULT_MAX_RENDERS,
+                 request_timeout=DEFAULT_REQUEST_TIMEOUT, idle_timeout=DEFAULT_IDLE_TIMEOUT, render_workers=None):
+        self._fixed_packs = product_packs
+        self._max_batch_size = max_batch_size
+        self._batch_wait = batch_wait
+        self._max_in_flight = max_in_flight
+        self._max_renders = max_renders
+        self.request_timeout = request_timeout
+        self.idle_timeout = idle_timeout
+        self._render_workers = render_workers or os.cpu_count() or 1
+        self._in_flight = 0
+        self._renders = 0
+        self._batcher = None
+        self._pool = None
+        self._server = None
+        self._routes = {
+            "/calculate": ("POST", self._calculate),
+            "/quote": ("POST", self._quote),
+            "/export": ("POST", self._export),
+            "/health": ("GET", self._health),
+            "/metrics": ("GET", self._metrics)
+        }
+
+    def _product_packs(self):
+        return self._fixed_packs if self._fixed_packs is not None else get_product_packs()
+
+    # Batched calculation
+
+    def _process_batch(self, items):
+        """Calculate (and quote, where asked) a batch of (property_data, quote) items."""
+        import pandas as pd
+
+        with metrics.stage("service_batch"):
+            properties = pd.DataFrame([property_data for property_data, _ in items], columns=PROPERTY_FIELDS)
+            heat_loss = calculate_heat_loss_batch(properties)
+            results = [{"heat_loss": record} for record in _records(heat_loss)]
+
+            wanted = [position for position, (_, quote) in enumerate(items) if quote]
+            if wanted:
+                product_packs = self._product_packs()
+                pack_index = get_pack_index(product_packs)
+                packs = {pack["id"]: pack for pack in pack_index.packs}
+                quotation = generate_quotation_batch(heat_loss.iloc[wanted], product_packs,
+                                                     properties.iloc[wanted], pack_index)
+                for position, record in zip(wanted, _records(quotation)):
+                    record["recommended_pack"] = packs[record["recommended_pack_id"]]
+                    results[position]["quotation"] = record
+        return results
+
+    async def _batched(self, body, quote):
+        if isinstance(body, list):
+            if len(body) > MAX_PROPERTIES_PER_REQUEST:
+                raise HttpError(413, f"At most {MAX_PROPERTIES_PER_REQUEST} properties per request")
+            checked = [check_property(property_data) for property_data in body]
+            return list(await asyncio.gather(*(self._batcher.submit((item, quote)) for item in checked)))
+        return await self._batcher.submit((check_property(body), quote))
+
+    async def _calculate(self, body):
+        result = await self._batched(body, quote=False)
+        if isinstance(result, list):
+            return 200, [item["heat_loss"] for item in result]
+        return 200, result["heat_loss"]
+
+    async def _quote(self, body):
+        return 200, await self._batched(body, quote=True)
+
+    # PDF export
+
+    def _render_done(self, loop):
+        try:
+            loop.call_soon_threadsafe(self._release_render)
+        except RuntimeError:
+            # The loop has closed: the service is shutting down
+            pass
+
+    def _release_render(self):
+        self._renders -= 1
+
+    async def _export(self, body):
+        property_data = check_property(body)
+        if self._renders >= self._max_renders:
+            raise HttpError(503, "Too many exports in progress")
+        # The slot is released when the render itself ends, not when the
+        # request does: a render cannot be stopped once a worker has it, so
+        # a timed-out export still counts against max_renders until then
+        loop = asyncio.get_running_loop()
+        self._renders += 1
+        render = self._pool.submit(_render_export, property_data)
+        render.add_done_callback(lambda _: self._render_done(loop))
+        return 200, await asyncio.wrap_future(render)
+
+    # Status
+
+    async def _health(self, body):
+        return 200, {
+            "status": "ok",
+            "catalogue_version": catalogue_version(self._product_packs()),
+            "in_flight": self._in_flight,
+            "renders": self._renders
+        }
+
+    async def _metrics(self, body):
+        return 200, metrics.render_prometheus()
+
+    # HTTP
+
+    async def _dispatch(self, method, path, body):
+        route = self._routes.get(path)
+        if route is None:
+            raise HttpError(404, f"No such endpoint: {path}")
+        allowed, handler = route
+        if method != allowed:
+            raise HttpError(405, f"{path} only accepts {allowed}")
+        if allowed == "POST":
+            try:
+                body = json.loads(body)
+            except ValueError:
+                raise HttpError(400, "Request body is not valid JSON")
+        return await handler(body)
+
+    async def handle(self, method, path, body):
+        """
+        Answer one request.
+
+        Args:
+            method: HTTP method
+            path: Request path, without the query string
+            body: Request body bytes
+
+        Returns:
+            A (status, payload) tuple; the payload is bytes, text or a JSON-able object
+        """
+        started = time.perf_counter()
+        endpoint = path.strip("/") or "root"
+        if self._in_flight >= self._max_in_flight:
+            status, payload = 503, {"error": "Too many requests in progress"}
+        else:
+            self._in_flight += 1
+            try:
+                status, payload = await asyncio.wait_for(self._dispatch(method, path, body), self.request_timeout)
+            except HttpError as error:
+                status, payload = error.status, {"error": str(error)}
+            except (asyncio.TimeoutError, TimeoutError):
+                status, payload = 504, {"error": f"Request took longer than {self.request_timeout}s"}
+            except Exception:
+                logger.exception("Request to %s failed", path)
+                status, payload = 500, {"error": "Internal error"}
+            finally:
+                self._in_flight -= 1
+
+        if metrics.ENABLED and path in self._routes:
+            metrics.observe(f"http_{endpoint}", time.perf_counter() - started, error=status >= 500)
+        return status, payload
+
+    async def _read_request(self, reader):
+        """
+        Read one request; returns None when the client closed the connection.
+
+        The body is an HttpError when it could not be read (a bad or too large
+        Content-Length); the connection is then closed after the answer.
+        """
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.idle_timeout)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError,
+                asyncio.TimeoutError, TimeoutError):
+            return None
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            return None
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name:
+                headers[name.strip().lower()] = value.strip()
+
+        length = headers.get("content-length") or "0"
+        if not (length.isascii() and length.isdigit()):
+            return method, target, version, headers, HttpError(400, "Invalid Content-Length header")
+        length = int(length)
+        if length > MAX_BODY_SIZE:
+            if length <= MAX_DRAIN_SIZE:
+                await asyncio.wait_for(self._discard(reader, length), self.request_timeout)
+            return method, target, version, headers, \
+                HttpError(413, f"Request body is larger than {MAX_BODY_SIZE} bytes")
+        body = await asyncio.wait_for(reader.readexactly(length), self.request_timeout) if length else b""
+        return method, target, version, headers, body
+
+    @staticmethod
+    async def _discard(reader, length):
+        while length:
+            length -= len(await reader.readexactly(min(length, 1 << 16)))
+
+    @staticmethod
+    def _encode(status, payload, keep_alive):
+        if isinstance(payload, bytes):
+            content_type, body = "application/pdf", payload
+        elif isinstance(payload, str):
+            content_type, body = "text/plain; version=0.0.4; charset=utf-8", payload.encode()
+        else:
+            content_type, body = "application/json", json.dumps(payload, separators=(",", ":")).encode()
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            "\r\n"
+        )
+        return head.encode("latin-1") + body
+
+    async def _serve_connection(self, reader, writer):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                if isinstance(body, HttpError):
+                    status, payload = body.status, {"error": str(body)}
+                    keep_alive = False
+                else:
+                    status, payload = await self.handle(method, target.split("?")[0], body)
+                writer.write(self._encode(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError, TimeoutError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """Start listening; returns the asyncio server (port 0 picks a free port)."""
+        # Start the render workers before the batch thread exists, so they
+        # are not forked from a process with threads running
+        self._pool = ProcessPoolExecutor(max_workers=self._render_workers, initializer=_init_render_worker,
+                                         initargs=(self._fixed_packs,))
+        await asyncio.get_running_loop().run_in_executor(self._pool, int)
+        self._batcher = MicroBatcher(self._process_batch, self._max_batch_size, self._batch_wait)
+        self._batcher.start()
+        self._server = await asyncio.start_server(self._serve_connection, host, port)
+        return self._server
+
+    async def close(self):
+        """Stop listening and shut the batch thread and render pool down."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._batcher is not None:
+            await self._batcher.stop()
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+
+    async def serve_forever(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        server = await self.start(host, port)
+        logger.info("Quoting service listening on %s", ", ".join(
+            f"http://{address[0]}:{address[1]}" for address in (sock.getsockname() for sock in server.sockets)
+        ))
+        try:
+            await server.serve_forever()
+        finally:
+            await self.close()
+
+async def _serve_until_terminated(service, host, port):
+    # Stop on SIGTERM as on Ctrl-C, so the render workers are shut down
+    # rather than left running without a parent. Cancelling the serving task
+    # from the loop (rather than raising KeyboardInterrupt wherever the
+    # signal lands) lets open connections be cancelled cleanly.
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    await service.serve_forever(host, port)
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve calculations, quotes and PDF exports over HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--catalogue", default=None,
+                        help="product catalogue file or directory (default: the app catalogue, hot-reloaded)")
+    parser.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE,
+                        help=f"properties coalesced into one batch (default: {DEFAULT_MAX_BATCH_SIZE})")
+    parser.add_argument("--batch-wait-ms", type=float, default=DEFAULT_BATCH_WAIT * 1000,
+                        help="milliseconds a batch waits to fill (default: %(default)s)")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help="requests handled at once before answering 503 (default: %(default)s)")
+    parser.add_argument("--max-renders", type=int, default=DEFAULT_MAX_RENDERS,
+                        help="PDF exports in progress before answering 503 (default: %(default)s)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_REQUEST_TIMEOUT,
+                        help="seconds before a request is answered with 504 (default: %(default)s)")
+    parser.add_argument("--render-workers", type=int, default=None,
+                        help="worker processes for PDF export (default: all CPUs)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    metrics.start_exporters()
+    service = QuoteService(
+        product_packs=load_catalogue(args.catalogue) if args.catalogue else None,
+        max_batch_size=args.max_batch_size,
+        batch_wait=args.batch_wait_ms / 1000,
+        max_in_flight=args.max_in_flight,
+        max_renders=args.max_renders,
+        request_timeout=args.timeout,
+        render_workers=args.render_workers
+    )
+    try:
+        asyncio.run(_serve_until_terminated(service, args.host, args.port))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+if __name__ == "__main__":
+    main()
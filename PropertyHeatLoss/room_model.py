@@ -0,0 +1,471 @@
+"""
+Room-by-room heat loss model for surveyed designs.
+
+calculate_heat_loss estimates a whole house from the questionnaire. This
+model takes what a surveyor measures instead: rooms with their design
+temperatures and air change rates, and the walls, windows, doors, floors and
+roofs of each room with their areas, U-values and what is on the other side
+(outside, the ground, an unheated space or another room).
+
+Each element loses A × U × (room temperature - temperature on the other
+side) and each room loses 0.33 × air changes × volume × (room temperature -
+outdoor temperature) to ventilation. A window or door can name the wall it
+sits in as its parent, and is then taken out of that wall's area.
+
+The model keeps every room's result and tracks which rooms an edit affects:
+
+- an element edit only affects its own room
+- a room's design temperature also affects every room with an element
+  facing it (the dependents graph)
+- an outdoor, ground or unheated temperature change affects every room
+
+Dirty rooms are recalculated on the next heat_loss() call, and the totals
+are re-summed from the rooms' stored results, so editing one wall of a
+30-room house recalculates one room.
+"""
+import itertools
+import math
+
+from property_categories import efficiency_rating_for
+
+# Element kinds and the calculate_heat_loss breakdown field each one adds to
+ELEMENT_KINDS = {
+    "wall": "wall_loss",
+    "door": "wall_loss",
+    "window": "window_loss",
+    "floor": "floor_loss",
+    "roof": "roof_loss"
+}
+# Kinds that sit inside a wall and take their area out of it
+OPENING_KINDS = ("window", "door")
+
+# What may be on the other side of an element, besides another room's id
+OUTSIDE = "outside"
+GROUND = "ground"
+UNHEATED = "unheated"
+
+# Default design temperatures (°C) for common room types, as used for MCS designs
+DEFAULT_ROOM_TEMPERATURES = {
+    "Living room": 21.0,
+    "Dining room": 21.0,
+    "Bedroom": 18.0,
+    "Bathroom": 22.0,
+    "Kitchen": 18.0,
+    "Hall / landing": 18.0,
+    "Toilet": 18.0,
+    "Study": 21.0
+}
+# Typical U-values (W/m²K) offered for new elements of an existing house
+DEFAULT_U_VALUES = {
+    "wall": 1.5,
+    "door": 3.0,
+    "window": 2.8,
+    "floor": 0.7,
+    "roof": 0.4
+}
+# Default design temperature (°C) and air changes per hour for a new room
+DEFAULT_ROOM_TEMPERATURE = 21.0
+DEFAULT_AIR_CHANGES = 1.0
+# Temperatures on the other side of ground floors and of unheated spaces (°C)
+DEFAULT_GROUND_TEMPERATURE = 10.0
+DEFAULT_UNHEATED_TEMPERATURE = 10.0
+# Volumetric heat capacity of air (Wh/m³K), as in calculate_heat_loss
+AIR_HEAT_CAPACITY = 0.33
+
+class Element:
+    """
+    One wall, window, door, floor or roof of a room.
+
+    Args:
+        id: Element id, unique in the house
+        room_id: Id of the room the element belongs to
+        kind: One of ELEMENT_KINDS
+        area: Gross area (m²); a wall's openings are subtracted from it
+        u_value: U-value (W/m²K)
+        adjacent: OUTSIDE, GROUND, UNHEATED or the id of the room on the other side
+        parent: For a window or door, the id of the wall it sits in
+    """
+
+    __slots__ = ("id", "room_id", "kind", "area", "u_value", "adjacent", "parent", "heat_loss")
+
+    def __init__(self, id, room_id, kind, area, u_value, adjacent=OUTSIDE, parent=None):
+        self.id = id
+        self.room_id = room_id
+        self.kind = kind
+        self.area = area
+        self.u_value = u_value
+        self.adjacent = adjacent
+        self.parent = parent
+        # Heat loss (W) from the last calculation of the room
+        self.heat_loss = None
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in Element.__slots__[:-1]}
+
+class Room:
+    """
+    One heated room.
+
+    Args:
+        id: Room id, unique in the house
+        name: Display name
+        floor_area: Floor area (m²)
+        height: Ceiling height (m)
+        design_temperature: Temperature the room is heated to (°C)
+        air_changes: Air changes per hour
+    """
+
+    __slots__ = ("id", "name", "floor_area", "height", "design_temperature", "air_changes", "elements", "heat_loss")
+
+    def __init__(self, id, name, floor_area, height, design_temperature=DEFAULT_ROOM_TEMPERATURE,
+                 air_changes=DEFAULT_AIR_CHANGES):
+        self.id = id
+        self.name = name
+        self.floor_area = floor_area
+        self.height = height
+        self.design_temperature = design_temperature
+        self.air_changes = air_changes
+        # Ids of the room's elements, in the order they were added
+        self.elements = []
+        # Breakdown (W) from the last calculation, or None when never calculated
+        self.heat_loss = None
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in Room.__slots__[:-2]}
+
+# Fields each record's update accepts
+_ROOM_FIELDS = frozenset(Room.__slots__[1:-2])
+_ELEMENT_FIELDS = frozenset(Element.__slots__[2:-1])
+# Room fields whose change alters the heat flow into neighbouring rooms
+_SHARED_ROOM_FIELDS = frozenset(("design_temperature",))
+
+class HouseModel:
+    """
+    A house as rooms and elements, with incremental recalculation.
+
+    Args:
+        outdoor_temperature: External design temperature (°C), e.g. from
+            climate.design_temperature() for the property's region
+        ground_temperature: Temperature below ground floors (°C)
+        unheated_temperature: Temperature of unheated spaces such as lofts
+            and garages (°C)
+    """
+
+    def __init__(self, outdoor_temperature, ground_temperature=DEFAULT_GROUND_TEMPERATURE,
+                 unheated_temperature=DEFAULT_UNHEATED_TEMPERATURE):
+        self.outdoor_temperature = outdoor_temperature
+        self.ground_temperature = ground_temperature
+        self.unheated_temperature = unheated_temperature
+        self.rooms = {}
+        self.elements = {}
+        # Room id -> ids of the rooms with an element facing it
+        self._dependents = {}
+        self._dirty = set()
+        self._ids = itertools.count(1)
+        # Rooms recalculated by the last heat_loss() call
+        self.last_recalculated = ()
+
+    # Building the model
+
+    def _new_id(self, prefix):
+        while True:
+            candidate = f"{prefix}{next(self._ids)}"
+            if candidate not in self.rooms and candidate not in self.elements:
+                return candidate
+
+    def add_room(self, name, floor_area, height, design_temperature=DEFAULT_ROOM_TEMPERATURE,
+                 air_changes=DEFAULT_AIR_CHANGES, id=None):
+        """
+        Add a room and return its id.
+
+        Raises:
+            ValueError: If the id is already used or a dimension is not positive
+        """
+        id = id or self._new_id("room")
+        if id in self.rooms or id in (OUTSIDE, GROUND, UNHEATED):
+            raise ValueError(f"Room id {id!r} is already used")
+        room = Room(id, name, floor_area, height, design_temperature, air_changes)
+        _check_room(room)
+        self.rooms[id] = room
+        self._dependents.setdefault(id, set())
+        self._dirty.add(id)
+        return id
+
+    def add_element(self, room_id, kind, area, u_value, adjacent=OUTSIDE, parent=None, id=None):
+        """
+        Add an element to a room and return its id.
+
+        Raises:
+            KeyError: If the room, adjacent room or parent wall does not exist
+            ValueError: If the id is already used or the element is invalid
+        """
+        id = id or self._new_id("element")
+        if id in self.elements:
+            raise ValueError(f"Element id {id!r} is already used")
+        element = Element(id, room_id, kind, area, u_value, adjacent, parent)
+        self._check_element(element)
+        self.elements[id] = element
+        self.rooms[room_id].elements.append(id)
+        self._link(element)
+        self._dirty.add(room_id)
+        return id
+
+    def update_room(self, room_id, **changes):
+        """
+        Change fields of a room (name, floor_area, height, design_temperature, air_changes).
+
+        Only the room is marked for recalculation, plus the rooms facing it
+        when its design temperature changes.
+        """
+        room = self.rooms[room_id]
+        unknown = set(changes) - _ROOM_FIELDS
+        if unknown:
+            raise ValueError(f"Unknown room field(s): {', '.join(sorted(unknown))}")
+
+        previous = {field: getattr(room, field) for field in changes}
+        for field, value in changes.items():
+            setattr(room, field, value)
+        try:
+            _check_room(room)
+        except ValueError:
+            for field, value in previous.items():
+                setattr(room, field, value)
+            raise
+
+        changed = {field for field, value in changes.items() if previous[field] != value}
+        if changed - {"name"}:
+            self._dirty.add(room_id)
+        if changed & _SHARED_ROOM_FIELDS:
+            self._dirty.update(self._dependents[room_id])
+
+    def update_element(self, element_id, **changes):
+        """
+        Change fields of an element (kind, area, u_value, adjacent, parent).
+
+        Only the element's room is marked for recalculation.
+        """
+        element = self.elements[element_id]
+        unknown = set(changes) - _ELEMENT_FIELDS
+        if unknown:
+            raise ValueError(f"Unknown element field(s): {', '.join(sorted(unknown))}")
+
+        previous = {field: getattr(element, field) for field in changes}
+        if all(previous[field] == value for field, value in changes.items()):
+            return
+
+        self._unlink(element)
+        for field, value in changes.items():
+            setattr(element, field, value)
+        try:
+            self._check_element(element)
+        except (KeyError, ValueError):
+            for field, value in previous.items():
+                setattr(element, field, value)
+            raise
+        finally:
+            self._link(element)
+        self._dirty.add(element.room_id)
+
+    def remove_element(self, element_id):
+        """Remove an element; openings that sat in it become free-standing."""
+        element = self.elements.pop(element_id)
+        room = self.rooms[element.room_id]
+        room.elements.remove(element_id)
+        self._unlink(element)
+        for other_id in room.elements:
+            if self.elements[other_id].parent == element_id:
+                self.elements[other_id].parent = None
+        self._dirty.add(element.room_id)
+
+    def remove_room(self, room_id):
+        """
+        Remove a room and its elements.
+
+        Raises:
+            ValueError: If an element of another room still faces it
+        """
+        facing = self._dependents[room_id] - {room_id}
+        if facing:
+            raise ValueError(f"Room {room_id!r} is faced by element(s) in {', '.join(sorted(facing))}")
+
+        for element_id in list(self.rooms[room_id].elements):
+            self.remove_element(element_id)
+        del self.rooms[room_id]
+        del self._dependents[room_id]
+        self._dirty.discard(room_id)
+
+    def set_temperatures(self, outdoor_temperature=None, ground_temperature=None, unheated_temperature=None):
+        """Change the house-wide design temperatures (°C); every room is recalculated."""
+        if outdoor_temperature is not None:
+            self.outdoor_temperature = outdoor_temperature
+        if ground_temperature is not None:
+            self.ground_temperature = ground_temperature
+        if unheated_temperature is not None:
+            self.unheated_temperature = unheated_temperature
+        self._dirty.update(self.rooms)
+
+    # Dependency graph
+
+    def _link(self, element):
+        if element.adjacent in self.rooms:
+            self._dependents[element.adjacent].add(element.room_id)
+
+    def _unlink(self, element):
+        adjacent = element.adjacent
+        if adjacent not in self.rooms:
+            return
+        # Keep the link while another element of the same room still faces it
+        still_facing = any(
+            other.adjacent == adjacent
+            for other in (self.elements[other_id] for other_id in self.rooms[element.room_id].elements)
+            if other is not element
+        )
+        if not still_facing:
+            self._dependents[adjacent].discard(element.room_id)
+
+    def _check_element(self, element):
+        if element.room_id not in self.rooms:
+            raise KeyError(f"Unknown room {element.room_id!r}")
+        if element.kind not in ELEMENT_KINDS:
+            raise ValueError(f"Unknown element kind {element.kind!r} (expected one of {', '.join(ELEMENT_KINDS)})")
+        if not element.area > 0 or not element.u_value >= 0:
+            raise ValueError(f"Element {element.id!r} needs a positive area and a non-negative U-value")
+        if element.adjacent not in (OUTSIDE, GROUND, UNHEATED) and element.adjacent not in self.rooms:
+            raise KeyError(f"Unknown adjacent room {element.adjacent!r}")
+        if element.adjacent == element.room_id:
+            raise ValueError(f"Element {element.id!r} cannot face its own room")
+        if element.parent is not None:
+            wall = self.elements.get(element.parent)
+            if element.kind not in OPENING_KINDS:
+                raise ValueError(f"Only windows and doors can sit in a wall, not a {element.kind}")
+            if wall is None or wall.kind != "wall" or wall.room_id != element.room_id:
+                raise KeyError(f"Unknown wall {element.parent!r} in room {element.room_id!r}")
+        # Openings name their wall as parent, so a wall that still has some must stay a wall
+        if element.kind != "wall" and any(
+            self.elements[other_id].parent == element.id
+            for other_id in self.rooms[element.room_id].elements
+        ):
+            raise ValueError(f"Element {element.id!r} still has windows or doors in it; "
+                             f"remove or move them before changing its kind")
+
+    def dependents(self, room_id):
+        """Return the ids of the rooms with an element facing a room."""
+        return frozenset(self._dependents[room_id])
+
+    @property
+    def dirty(self):
+        """Ids of the rooms waiting to be recalculated."""
+        return frozenset(self._dirty)
+
+    # Calculation
+
+    def _other_side_temperature(self, adjacent):
+        if adjacent == OUTSIDE:
+            return self.outdoor_temperature
+        if adjacent == GROUND:
+            return self.ground_temperature
+        if adjacent == UNHEATED:
+            return self.unheated_temperature
+        return self.rooms[adjacent].design_temperature
+
+    def _calculate_room(self, room):
+        """Recalculate one room's elements and breakdown (in W)."""
+        elements = [self.elements[element_id] for element_id in room.elements]
+        openings = {}
+        for element in elements:
+            if element.parent is not None:
+                openings[element.parent] = openings.get(element.parent, 0.0) + element.area
+
+        breakdown = dict.fromkeys(ELEMENT_KINDS.values(), 0.0)
+        for element in elements:
+            # A wall loses heat through what is left once its openings are taken out
+            area = max(element.area - openings.get(element.id, 0.0), 0.0)
+            difference = room.design_temperature - self._other_side_temperature(element.adjacent)
+            element.heat_loss = area * element.u_value * difference
+            breakdown[ELEMENT_KINDS[element.kind]] += element.heat_loss
+
+        volume = room.floor_area * room.height
+        breakdown["ventilation_loss"] = AIR_HEAT_CAPACITY * room.air_changes * volume * \
+            (room.design_temperature - self.outdoor_temperature)
+        breakdown["total_loss"] = math.fsum(breakdown.values())
+        room.heat_loss = breakdown
+
+    def recalculate(self):
+        """
+        Recalculate the rooms affected by edits since the last call.
+
+        Returns:
+            The ids of the rooms recalculated
+        """
+        recalculated = tuple(room_id for room_id in self.rooms if room_id in self._dirty)
+        for room_id in recalculated:
+            self._calculate_room(self.rooms[room_id])
+        self._dirty.clear()
+        self.last_recalculated = recalculated
+        return recalculated
+
+    def room_heat_loss(self, room_id):
+        """Return a room's breakdown in W (wall, window, floor, roof, ventilation and total loss)."""
+        self.recalculate()
+        return dict(self.rooms[room_id].heat_loss)
+
+    def heat_loss(self):
+        """
+        Return the house's heat loss in the same form as calculate_heat_loss.
+
+        Only rooms affected by edits since the last call are recalculated;
+        the totals are summed from every room's stored result.
+
+        Returns:
+            A dictionary with the total heat loss, per-m² loss and component
+            losses (kW) and the efficiency rating
+        """
+        self.recalculate()
+        rooms = self.rooms.values()
+        fields = dict.fromkeys(list(ELEMENT_KINDS.values()) + ["ventilation_loss"])
+        result = {field: math.fsum(room.heat_loss[field] for room in rooms) / 1000 for field in fields}
+        total = math.fsum(room.heat_loss["total_loss"] for room in rooms)
+        floor_area = math.fsum(room.floor_area for room in rooms)
+
+        result["total_heat_loss"] = total / 1000
+        result["heat_loss_per_sqm"] = total / floor_area if floor_area else 0.0
+        result["efficiency_rating"] = efficiency_rating_for(result["heat_loss_per_sqm"])
+        return result
+
+    # Serialization
+
+    def to_dict(self):
+        """Return the model as plain data (for JSON export or the session state)."""
+        return {
+            "outdoor_temperature": self.outdoor_temperature,
+            "ground_temperature": self.ground_temperature,
+            "unheated_temperature": self.unheated_temperature,
+            "rooms": [room.to_dict() for room in self.rooms.values()],
+            "elements": [element.to_dict() for element in self.elements.values()]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a model from the output of to_dict()."""
+        model = cls(
+            data["outdoor_temperature"],
+            data.get("ground_temperature", DEFAULT_GROUND_TEMPERATURE),
+            data.get("unheated_temperature", DEFAULT_UNHEATED_TEMPERATURE)
+        )
+        for room in data["rooms"]:
+            model.add_room(room["name"], room["floor_area"], room["height"], room["design_temperature"],
+                           room["air_changes"], id=room["id"])
+        # Walls first, so openings can name them as parents
+        for element in sorted(data["elements"], key=lambda element: element.get("parent") is not None):
+            model.add_element(element["room_id"], element["kind"], element["area"], element["u_value"],
+                              element.get("adjacent", OUTSIDE), element.get("parent"), id=element["id"])
+        # Put the elements back in the saved order
+        position = {element["id"]: index for index, element in enumerate(data["elements"])}
+        model.elements = dict(sorted(model.elements.items(), key=lambda item: position[item[0]]))
+        for room in model.rooms.values():
+            room.elements.sort(key=position.__getitem__)
+        return model
+
+def _check_room(room):
+    if not room.floor_area > 0 or not room.height > 0 or not room.air_changes >= 0:
+        raise ValueError(f"Room {room.id!r} needs a positive floor area and height")
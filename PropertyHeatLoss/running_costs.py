@@ -0,0 +1,357 @@
+"""
+Annual running costs of each heat pump pack against a gas boiler.
+
+A property's hourly heat demand over its region's design year (see
+climate.py) is met either by a gas boiler at BOILER_EFFICIENCY or by a heat
+pump whose COP follows the outdoor temperature and the flow temperature the
+property needs. Each hour is priced with a tariff's hourly electricity and
+gas prices, giving the annual heat pump and gas costs and the savings.
+
+Hourly demand is the property's UA value times its region's heating
+deficit, so every annual figure is UA times a weight that depends only on
+the region, the flow temperature and the pack's COP curve. The weights are
+summed over the 8760 hours once per catalogue version and tariff
+(RunningCostTable); pricing a property against one pack, or against every
+pack in the catalogue, is then a gather and a multiplication.
+
+COP curve: a fixed fraction of the Carnot COP between the flow and outdoor
+temperatures, clipped to MIN_COP..MAX_COP. The flow temperature is weather
+compensated (flow_temperature): it reaches the property's design flow
+temperature at the region's design temperature and falls as it gets milder.
+
+The fraction is calibrated per pack against its rated SCOP, the optional
+"scop" catalogue field (DEFAULT_SCOP when absent): the seasonal COP that
+EN 14825 rates a heat pump at, for the "average" reference heating season
+at 55 °C design flow. calibrated_carnot_efficiency finds the fraction for
+which the same curve, run over the EN 14825 bins, gives back that SCOP.
+"""
+import os
+from collections import namedtuple
+
+from functools import lru_cache
+
+from climate import (
+    HOURS_PER_YEAR,
+    INDOOR_TEMP,
+    batch_coefficients,
+    design_years,
+    heat_transfer_coefficient,
+    heating_deficit,
+    region_tables
+)
+from heat_loss_calculator import category_codes
+from product_packs import CatalogueCache
+from property_categories import INSULATION_LEVEL, LOCATION
+
+# Seasonal efficiency of the gas boiler the heat pump replaces
+BOILER_EFFICIENCY = 0.85
+# Rated SCOP (EN 14825, average climate, 55 °C) of a pack without a scop field
+DEFAULT_SCOP = 3.5
+MIN_COP = 1.0
+MAX_COP = 6.0
+# Smallest temperature lift (K) used in the Carnot COP, to keep it finite
+MIN_LIFT = 5.0
+
+# Flow temperature (°C) the emitters need at the region's design temperature;
+# poorly insulated homes need hotter radiators
+FLOW_TEMPERATURES = INSULATION_LEVEL.table({"Poor": 55.0, "Below Average": 50.0}, 45.0)
+
+# The EN 14825 "average" reference heating season that SCOPs are rated
+# over: hours spent at each outdoor temperature from -10 to 15 °C, with the
+# heat demand falling linearly from the design temperature to zero at the
+# balance temperature, and the design flow temperature of the rating
+RATING_BIN_HOURS = (
+    1, 25, 23, 24, 27, 68, 91, 89, 165, 173, 240, 280, 320,
+    357, 356, 303, 330, 326, 348, 335, 315, 215, 169, 151, 105, 74
+)
+RATING_BIN_TEMPERATURES = tuple(range(-10, 16))
+RATING_DESIGN_TEMPERATURE = -10.0
+RATING_BALANCE_TEMPERATURE = 16.0
+RATING_FLOW_TEMPERATURE = 55.0
+
+class Tariff(namedtuple("Tariff", ["name", "electricity", "gas"])):
+    """
+    Energy prices in £/kWh, as 24 hourly prices repeated every day or
+    HOURS_PER_YEAR prices for the whole design year.
+    """
+
+    __slots__ = ()
+
+    def hourly(self):
+        """Return the electricity and gas prices as HOURS_PER_YEAR-long arrays."""
+        import numpy as np
+
+        prices = []
+        for values in (self.electricity, self.gas):
+            values = np.asarray(values, dtype=float)
+            if len(values) not in (24, HOURS_PER_YEAR):
+                raise ValueError(f"Tariff {self.name!r} needs 24 or {HOURS_PER_YEAR} hourly prices")
+            prices.append(np.resize(values, HOURS_PER_YEAR))
+        return prices
+
+# Illustrative unit rates (no standing charges): a flat tariff and a
+# time-of-use one with cheap nights and a 16:00-19:00 peak
+TARIFFS = {
+    "standard": Tariff("standard", (0.245,) * 24, (0.063,) * 24),
+    "time_of_use": Tariff(
+        "time_of_use",
+        (0.085,) * 7 + (0.27,) * 9 + (0.36,) * 3 + (0.27,) * 5,
+        (0.063,) * 24
+    )
+}
+
+# Tariff used when none is given (SPIRE_TARIFF, read once at import)
+DEFAULT_TARIFF = os.environ.get("SPIRE_TARIFF", "standard")
+
+# Catalogue versions and tariffs whose tables are kept in memory
+_MAX_TABLES = 8
+# Distinct COP curves evaluated together when building a table
+_CURVES_PER_STEP = 16
+
+def get_tariff(tariff=None):
+    """
+    Resolve a tariff name (or None for DEFAULT_TARIFF) to a Tariff.
+
+    Raises:
+        KeyError: If the name is not one of TARIFFS
+    """
+    if isinstance(tariff, Tariff):
+        return tariff
+    name = tariff or DEFAULT_TARIFF
+    if name not in TARIFFS:
+        raise KeyError(f"Unknown tariff {name!r} (expected one of {', '.join(TARIFFS)})")
+    return TARIFFS[name]
+
+def pack_scop(pack):
+    """Return a pack's rated SCOP."""
+    return float(pack.get("scop") or DEFAULT_SCOP)
+
+def pack_carnot_efficiency(pack):
+    """Return a pack's share of the Carnot COP, calibrated against its rated SCOP."""
+    return calibrated_carnot_efficiency(pack_scop(pack))
+
+def _carnot_cop(outdoor_temperature, flow_temperature):
+    """Ideal (Carnot) heating COP between outdoor and flow temperatures (°C)."""
+    import numpy as np
+
+    lift = np.maximum(np.subtract(flow_temperature, outdoor_temperature), MIN_LIFT)
+    return np.add(flow_temperature, 273.15) / lift
+
+def coefficient_of_performance(outdoor_temperature, flow_temperature, carnot_efficiency=None):
+    """
+    Return the heat pump COP for outdoor and flow temperatures (°C).
+
+    Accepts scalars or broadcastable NumPy arrays. carnot_efficiency
+    defaults to that of a pack rated at DEFAULT_SCOP.
+    """
+    import numpy as np
+
+    if carnot_efficiency is None:
+        carnot_efficiency = calibrated_carnot_efficiency(DEFAULT_SCOP)
+    return np.clip(carnot_efficiency * _carnot_cop(outdoor_temperature, flow_temperature), MIN_COP, MAX_COP)
+
+def flow_temperature(outdoor_temperature, design_flow_temperature, design_temperature):
+    """
+    Return the weather-compensated flow temperature (°C).
+
+    The heating curve is the straight line from INDOOR_TEMP, at an outdoor
+    temperature of INDOOR_TEMP, to the design flow temperature at the
+    design outdoor temperature; it is not raised further in colder hours.
+    This is also the curve behind the EN 14825 rating temperatures.
+
+    Accepts scalars or broadcastable NumPy arrays.
+    """
+    import numpy as np
+
+    load = np.clip(np.divide(np.subtract(INDOOR_TEMP, outdoor_temperature), np.subtract(INDOOR_TEMP, design_temperature)),
+                   0.0, 1.0)
+    return INDOOR_TEMP + np.subtract(design_flow_temperature, INDOOR_TEMP) * load
+
+def rated_scop(carnot_efficiency):
+    """Return the SCOP the EN 14825 rating gives a COP curve with this share of the Carnot COP."""
+    import numpy as np
+
+    outdoor = np.asarray(RATING_BIN_TEMPERATURES, dtype=float)
+    heat = np.asarray(RATING_BIN_HOURS) * (RATING_BALANCE_TEMPERATURE - outdoor)
+    flow = flow_temperature(outdoor, RATING_FLOW_TEMPERATURE, RATING_DESIGN_TEMPERATURE)
+    cop = coefficient_of_performance(outdoor, flow, carnot_efficiency)
+    return float(heat.sum() / (heat / cop).sum())
+
+@lru_cache(maxsize=None)
+def calibrated_carnot_efficiency(scop):
+    """
+    Return the share of the Carnot COP whose curve is rated at a SCOP.
+
+    rated_scop rises with the share, so it is found by bisection. A SCOP
+    the clipped curve cannot reach gets the nearest share in 0.05..1.
+
+    Args:
+        scop: Rated SCOP (EN 14825, average climate, 55 °C design flow)
+
+    Returns:
+        The share of the Carnot COP
+    """
+    low, high = 0.05, 1.0
+    for _ in range(50):
+        middle = (low + high) / 2
+        if rated_scop(middle) < scop:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+class RunningCostTable:
+    """
+    Annual running cost weights for every pack in a catalogue under one tariff.
+
+    Multiplying a property's UA value (kW/K) by a weight gives its annual
+    figure: gas[region] is the gas bill, electricity[region, flow, curve] the
+    heat pump bill and electricity_kwh[region, flow, curve] the heat pump's
+    electricity use, where flow is the property's insulation code and curve
+    the pack's COP curve (pack_curves, in catalogue order).
+
+    Args:
+        product_packs: List of product pack dictionaries
+        tariff: A Tariff
+    """
+
+    def __init__(self, product_packs, tariff):
+        import numpy as np
+
+        self.packs = list(product_packs)
+        self.tariff = tariff
+        self.positions = {}
+        for position, pack in enumerate(self.packs):
+            self.positions.setdefault(pack["id"], position)
+
+        efficiencies = [pack_carnot_efficiency(pack) for pack in self.packs]
+        self.curves = sorted(set(efficiencies))
+        curve_codes = {efficiency: code for code, efficiency in enumerate(self.curves)}
+        self.pack_curves = np.array([curve_codes[efficiency] for efficiency in efficiencies], dtype=np.intp)
+
+        electricity_prices, gas_prices = tariff.hourly()
+        # Built once per catalogue version, so the float64 copies are transient
+        temperatures = np.asarray(design_years(), dtype=float)
+        deficit = heating_deficit(temperatures)
+        design_temperatures = region_tables()["design_temperature"]
+        flows = np.asarray(FLOW_TEMPERATURES, dtype=float)
+
+        self.gas = deficit @ gas_prices / BOILER_EFFICIENCY
+        self.electricity = np.empty((len(deficit), len(flows), len(self.curves)))
+        self.electricity_kwh = np.empty_like(self.electricity)
+        # (regions, flows, hours) Carnot COP at the compensated flow
+        # temperature; each curve's COP is a share of it
+        hourly_flows = flow_temperature(temperatures[:, None, :], flows[None, :, None],
+                                        design_temperatures[:, None, None])
+        carnot = _carnot_cop(temperatures[:, None, :], hourly_flows)
+        for start in range(0, len(self.curves), _CURVES_PER_STEP):
+            step = np.asarray(self.curves[start:start + _CURVES_PER_STEP])
+            # (curves, regions, flows, hours) electricity per kWh of heat
+            per_kwh = 1 / np.clip(step[:, None, None, None] * carnot[None], MIN_COP, MAX_COP)
+            per_kwh *= deficit[None, :, None, :]
+            self.electricity_kwh[..., start:start + len(step)] = np.moveaxis(per_kwh.sum(axis=-1), 0, -1)
+            self.electricity[..., start:start + len(step)] = np.moveaxis(per_kwh @ electricity_prices, 0, -1)
+
+    def weights(self, region_codes, flow_codes, pack_positions):
+        """
+        Return the heat pump cost and electricity weights for rows or cells.
+
+        The codes and positions are broadcast against each other, so one
+        position per row prices each row's pack, and a row of positions
+        against a column of codes prices every pack for every row.
+        """
+        curves = self.pack_curves[pack_positions]
+        return (
+            self.electricity[region_codes, flow_codes, curves],
+            self.electricity_kwh[region_codes, flow_codes, curves]
+        )
+
+_tables = CatalogueCache(RunningCostTable, maxsize=_MAX_TABLES)
+
+def get_running_cost_table(product_packs, tariff=None):
+    """
+    Return the RunningCostTable for a catalogue and tariff, built once per catalogue version.
+
+    Args:
+        product_packs: List of product pack dictionaries
+        tariff: Tariff name or Tariff (default: DEFAULT_TARIFF)
+
+    Returns:
+        A RunningCostTable
+    """
+    return _tables.get(product_packs, get_tariff(tariff))
+
+def running_costs(heat_loss, property_data, product_packs, packs=None, tariff=None):
+    """
+    Price one property's annual heating with gas and with heat pump packs.
+
+    Args:
+        heat_loss: The dictionary returned by calculate_heat_loss
+        property_data: A dictionary containing property information
+        product_packs: The catalogue the packs come from
+        packs: Packs to price (default: every pack in the catalogue)
+        tariff: Tariff name or Tariff (default: DEFAULT_TARIFF)
+
+    Returns:
+        A dictionary with the annual gas cost and, keyed by pack id, a
+        dictionary of each pack's annual running cost, electricity use (kWh)
+        and savings against gas
+    """
+    table = get_running_cost_table(product_packs, tariff)
+    region = LOCATION.code(property_data["location"])
+    flow = INSULATION_LEVEL.code(property_data["insulation_level"])
+    ua = heat_transfer_coefficient(heat_loss["total_heat_loss"], LOCATION.factors[region])
+
+    gas_cost = ua * float(table.gas[region])
+    costs = {}
+    for pack in (table.packs if packs is None else packs):
+        electricity, electricity_kwh = table.weights(region, flow, table.positions[pack["id"]])
+        running_cost = ua * float(electricity)
+        costs[pack["id"]] = {
+            "running_cost": running_cost,
+            "electricity_kwh": ua * float(electricity_kwh),
+            "savings": gas_cost - running_cost
+        }
+
+    return {"gas_cost": gas_cost, "packs": costs}
+
+def running_costs_batch(heat_loss, properties, product_packs, pack_positions=None, tariff=None):
+    """
+    Price many properties' annual heating with gas and with heat pump packs.
+
+    Args:
+        heat_loss: DataFrame returned by calculate_heat_loss_batch
+        properties: The properties the heat loss was calculated from
+        product_packs: The catalogue to price
+        pack_positions: One catalogue position per row to price only that
+            pack (e.g. PackIndex.recommend_many), or None for every pack
+        tariff: Tariff name or Tariff (default: DEFAULT_TARIFF)
+
+    Returns:
+        A dictionary of NumPy arrays: gas_cost (one per row) and
+        running_cost, electricity_kwh and savings, each one per row or, for
+        every pack, of shape (rows, packs) in catalogue order
+    """
+    import numpy as np
+
+    table = get_running_cost_table(product_packs, tariff)
+    regions, ua = batch_coefficients(heat_loss, properties)
+    flows = category_codes(properties["insulation_level"], INSULATION_LEVEL)
+    gas_cost = ua * table.gas[regions]
+
+    if pack_positions is None:
+        # Every pack for every row: rows as a column against packs as a row
+        electricity, electricity_kwh = table.weights(regions[:, None], flows[:, None],
+                                                     np.arange(len(table.packs))[None, :])
+        ua, gas = ua[:, None], gas_cost[:, None]
+    else:
+        electricity, electricity_kwh = table.weights(regions, flows, pack_positions)
+        gas = gas_cost
+
+    running_cost = ua * electricity
+    return {
+        "gas_cost": gas_cost,
+        "running_cost": running_cost,
+        "electricity_kwh": ua * electricity_kwh,
+        "savings": gas - running_cost
+    }
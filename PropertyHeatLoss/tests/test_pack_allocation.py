@@ -0,0 +1,95 @@
+"""
+Stock-limited pack allocation: optimality against brute force on small
+batches, and the stock and heat loss ranges on large random catalogues.
+"""
+import itertools
+
+import numpy as np
+import pytest
+
+from pack_allocation import UNALLOCATED, allocate_packs
+from product_packs import get_product_packs
+
+def random_catalogue(rng, size):
+    packs = []
+    for position in range(size):
+        low = round(rng.uniform(0, 25), 2)
+        packs.append({
+            "id": f"pack_{position}",
+            "name": f"Pack {position}",
+            "min_heat_loss": low,
+            "max_heat_loss": round(low + rng.uniform(2, 12), 2),
+            "price": round(rng.uniform(4000, 15000), 2)
+        })
+    return packs
+
+def ranges(packs):
+    low = np.array([pack["min_heat_loss"] for pack in packs])
+    high = np.array([pack["max_heat_loss"] for pack in packs])
+    return low, high
+
+def scores(assignments, totals, packs, objective):
+    """
+    (units allocated, objective, tie-break) of each row of assignments, best
+    lowest, with prices in pence and mismatches in watts as the solver counts them.
+    """
+    low, high = ranges(packs)
+    prices = np.append([pack["price"] for pack in packs], 0.0)
+    mismatch = np.abs(totals[:, None] - (low + high) / 2)
+    mismatch = np.column_stack([mismatch, np.zeros(len(totals))])
+    allocated = (assignments >= 0).sum(axis=1)
+    price = np.round(prices[assignments].sum(axis=1), 2)
+    distance = np.round(mismatch[np.arange(len(totals)), assignments].sum(axis=1), 3)
+    if objective == "cost":
+        return -allocated, price, distance
+    return -allocated, distance, price
+
+@pytest.mark.parametrize("objective", ["cost", "mismatch"])
+def test_allocation_is_optimal(objective):
+    rng = np.random.default_rng(22)
+    for trial in range(100):
+        packs = list(get_product_packs()) if trial % 2 else random_catalogue(rng, int(rng.integers(2, 6)))
+        low, high = ranges(packs)
+        # Range edges as well as values inside the ranges
+        totals = rng.choice(np.concatenate([rng.uniform(0, 30, 4), low, high]), size=int(rng.integers(1, 6)))
+        stock = {pack["id"]: int(rng.integers(0, 4)) for pack in packs if rng.random() < 0.7}
+        limits = np.array([stock.get(pack["id"], len(totals)) for pack in packs])
+
+        positions = allocate_packs(totals, packs, stock, objective, class_width=1e-6)
+
+        # Every assignment of packs (or none) that respects the ranges and stock
+        assignments = np.array(list(itertools.product(range(-1, len(packs)), repeat=len(totals))))
+        suits = np.column_stack([(low <= totals[:, None]) & (totals[:, None] <= high), np.ones(len(totals), bool)])
+        feasible = suits[np.arange(len(totals)), assignments].all(axis=1)
+        for position, limit in enumerate(limits):
+            feasible &= (assignments == position).sum(axis=1) <= limit
+        assert feasible[np.flatnonzero((assignments == positions).all(axis=1))].all()
+
+        allocated, primary, secondary = scores(assignments[feasible], totals, packs, objective)
+        best = np.lexsort((secondary, primary, allocated))[0]
+        got = scores(positions[None, :], totals, packs, objective)
+        assert got[0][0] == allocated[best]
+        assert got[1][0] == pytest.approx(primary[best], abs=1e-3 * len(totals))
+        assert got[2][0] == pytest.approx(secondary[best], abs=1e-3 * len(totals))
+
+@pytest.mark.parametrize("objective", ["cost", "mismatch"])
+def test_large_catalogue_respects_stock_and_ranges(objective):
+    rng = np.random.default_rng(7)
+    packs = random_catalogue(rng, 60)
+    low, high = ranges(packs)
+    totals = rng.gamma(4.0, 3.0, 20_000)
+    totals[rng.random(len(totals)) < 0.01] = np.nan
+    stock = {pack["id"]: int(rng.integers(0, 400)) for pack in packs if rng.random() < 0.8}
+    limits = np.array([stock.get(pack["id"], len(totals)) for pack in packs])
+
+    positions = allocate_packs(totals, packs, stock, objective)
+
+    allocated = positions != UNALLOCATED
+    assert not allocated[np.isnan(totals)].any()
+    assert ((low[positions[allocated]] <= totals[allocated]) & (totals[allocated] <= high[positions[allocated]])).all()
+    used = np.bincount(positions[allocated], minlength=len(packs))
+    assert (used <= limits).all()
+    # A property left without a pack has no suitable pack with stock left
+    spare = used < limits
+    left = totals[~allocated & ~np.isnan(totals)]
+    assert not ((low <= left[:, None]) & (left[:, None] <= high) & spare).any()
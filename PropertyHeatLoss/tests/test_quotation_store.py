@@ -0,0 +1,29 @@
+"""
+Connection handling of the quotation store shared between threads.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from quotation_store import POOL_SIZE, QuotationStore
+
+def test_short_lived_threads_share_the_pool(tmp_path):
+    store = QuotationStore(str(tmp_path / "quotations.db"))
+
+    def browse():
+        store.history(limit=5)
+        store.rollup(by=("location",))
+
+    # Streamlit runs each rerun of the script in a new thread
+    for _ in range(50):
+        thread = threading.Thread(target=browse)
+        thread.start()
+        thread.join()
+    assert store._opened == 1
+
+    with ThreadPoolExecutor(4 * POOL_SIZE) as executor:
+        list(executor.map(lambda _: browse(), range(200)))
+    assert store._opened <= POOL_SIZE
+
+    store.close()
+    assert store._opened == 0
+    assert store.history() == ([], None)
@@ -0,0 +1,102 @@
+"""
+The incremental room-by-room model: which rooms an edit marks dirty, the
+dependents graph, and the to_dict/from_dict round trip.
+"""
+import pytest
+
+from room_model import GROUND, OUTSIDE, HouseModel
+
+@pytest.fixture
+def house():
+    """A lounge and a bedroom sharing a partition, with a window in the lounge wall."""
+    model = HouseModel(-3.0)
+    model.add_room("Living room", 20.0, 2.4, 21.0, id="lounge")
+    model.add_room("Bedroom", 12.0, 2.4, 18.0, id="bedroom")
+    model.add_element("lounge", "wall", 12.0, 1.5, id="lounge_wall")
+    model.add_element("lounge", "window", 2.0, 2.8, parent="lounge_wall", id="lounge_window")
+    model.add_element("lounge", "floor", 20.0, 0.7, GROUND, id="lounge_floor")
+    model.add_element("bedroom", "wall", 9.0, 1.5, id="bedroom_wall")
+    model.add_element("bedroom", "wall", 7.0, 1.8, "lounge", id="partition")
+    model.heat_loss()
+    return model
+
+def fresh_heat_loss(model):
+    """The heat loss of the same house built from scratch."""
+    return HouseModel.from_dict(model.to_dict()).heat_loss()
+
+def test_element_edit_recalculates_only_its_room(house):
+    house.update_element("bedroom_wall", u_value=0.3)
+    assert house.dirty == {"bedroom"}
+    result = house.heat_loss()
+    assert house.last_recalculated == ("bedroom",)
+    assert result == fresh_heat_loss(house)
+
+def test_unchanged_edits_do_not_mark_rooms(house):
+    house.update_element("lounge_wall", area=12.0)
+    house.update_room("lounge", name="Front room")
+    assert house.dirty == frozenset()
+
+def test_design_temperature_reaches_facing_rooms(house):
+    assert house.dependents("lounge") == {"bedroom"}
+    house.update_room("lounge", design_temperature=23.0)
+    assert house.dirty == {"lounge", "bedroom"}
+    assert house.heat_loss() == fresh_heat_loss(house)
+
+def test_house_temperatures_recalculate_every_room(house):
+    house.set_temperatures(outdoor_temperature=-5.0)
+    assert house.dirty == {"lounge", "bedroom"}
+    assert house.heat_loss() == fresh_heat_loss(house)
+
+def test_retargeting_an_element_moves_its_link(house):
+    house.add_element("bedroom", "door", 1.9, 3.0, "lounge", parent="partition", id="bedroom_door")
+    house.update_element("partition", adjacent=OUTSIDE)
+    # The door still faces the lounge, so the bedroom stays a dependent
+    assert house.dependents("lounge") == {"bedroom"}
+    house.update_element("bedroom_door", adjacent=OUTSIDE)
+    assert house.dependents("lounge") == frozenset()
+
+    house.heat_loss()
+    house.update_room("lounge", design_temperature=23.0)
+    assert house.dirty == {"lounge"}
+    house.update_element("partition", adjacent="lounge")
+    assert house.dependents("lounge") == {"bedroom"}
+    assert house.heat_loss() == fresh_heat_loss(house)
+
+def test_rejected_edit_keeps_the_link(house):
+    with pytest.raises(KeyError):
+        house.update_element("partition", adjacent="loft")
+    assert house.elements["partition"].adjacent == "lounge"
+    assert house.dependents("lounge") == {"bedroom"}
+
+def test_room_faced_by_another_cannot_be_removed(house):
+    with pytest.raises(ValueError):
+        house.remove_room("lounge")
+    house.remove_element("partition")
+    house.remove_room("lounge")
+    assert set(house.rooms) == {"bedroom"}
+    assert house.heat_loss() == fresh_heat_loss(house)
+
+def test_wall_with_openings_keeps_its_kind(house):
+    with pytest.raises(ValueError):
+        house.update_element("lounge_wall", kind="window")
+    assert house.elements["lounge_wall"].kind == "wall"
+    assert house.dirty == frozenset()
+    HouseModel.from_dict(house.to_dict())
+
+    house.remove_element("lounge_window")
+    house.update_element("lounge_wall", kind="window")
+    assert house.heat_loss() == fresh_heat_loss(house)
+
+def test_removing_a_wall_frees_its_openings(house):
+    house.remove_element("lounge_wall")
+    assert house.elements["lounge_window"].parent is None
+    assert house.heat_loss() == fresh_heat_loss(house)
+
+def test_round_trip(house):
+    data = house.to_dict()
+    rebuilt = HouseModel.from_dict(data)
+    assert rebuilt.to_dict() == data
+    assert rebuilt.heat_loss() == house.heat_loss()
+    for room_id in house.rooms:
+        assert rebuilt.room_heat_loss(room_id) == house.room_heat_loss(room_id)
+        assert rebuilt.dependents(room_id) == house.dependents(room_id)
@@ -0,0 +1,87 @@
+"""
+Calibration of the heat pump running cost model and the spread of the
+savings and payback figures it puts on quotations.
+"""
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from heat_loss_calculator import calculate_heat_loss, calculate_heat_loss_batch
+from product_packs import get_product_packs
+from property_categories import (
+    BEDROOM_OPTIONS,
+    CONSTRUCTION_YEAR,
+    INSULATION_LEVEL,
+    LOCATION,
+    PROPERTY_TYPE,
+    WINDOWS_QUALITY
+)
+from quotation_generator import generate_quotation_batch
+from running_costs import (
+    RATING_DESIGN_TEMPERATURE,
+    RATING_FLOW_TEMPERATURE,
+    flow_temperature,
+    pack_carnot_efficiency,
+    pack_scop,
+    rated_scop,
+    running_costs,
+    running_costs_batch
+)
+
+@pytest.fixture(scope="module")
+def every_option():
+    """Every combination of the questionnaire options, at 100 m²."""
+    categories = (PROPERTY_TYPE, CONSTRUCTION_YEAR, INSULATION_LEVEL, WINDOWS_QUALITY, LOCATION)
+    rows = [dict(zip((category.field for category in categories), options), num_bedrooms=bedrooms)
+            for options in itertools.product(*(category.options for category in categories))
+            for bedrooms in BEDROOM_OPTIONS[:3]]
+    properties = pd.DataFrame(rows)
+    properties["floor_area"] = 100.0
+    properties["ceiling_height"] = 2.4
+    return properties
+
+@pytest.fixture(scope="module")
+def quotations(every_option):
+    heat_loss = calculate_heat_loss_batch(every_option)
+    return generate_quotation_batch(heat_loss, get_product_packs(), every_option)
+
+def test_pack_curves_reproduce_their_rated_scop():
+    for pack in get_product_packs():
+        assert rated_scop(pack_carnot_efficiency(pack)) == pytest.approx(pack_scop(pack), abs=1e-6)
+
+def test_heating_curve_matches_en14825_rating_temperatures():
+    # Outlet temperatures EN 14825 tests a 55 °C heat pump at
+    outdoor = np.array([-7.0, 2.0, 7.0, 12.0])
+    flow = flow_temperature(outdoor, RATING_FLOW_TEMPERATURE, RATING_DESIGN_TEMPERATURE)
+    np.testing.assert_allclose(flow, [52.0, 42.0, 36.0, 30.0], atol=1.0)
+    assert flow_temperature(-20.0, 45.0, -3.0) == 45.0
+
+def test_every_option_saves_against_gas(quotations, every_option):
+    savings = quotations["estimated_annual_savings"]
+    assert (savings > 0).all()
+    for level in INSULATION_LEVEL.options:
+        assert savings[every_option["insulation_level"] == level].mean() > 100
+
+def test_savings_and_payback_spread(quotations):
+    savings = quotations["estimated_annual_savings"].to_numpy()
+    payback = quotations["payback_period"].to_numpy()
+    assert np.isfinite(payback).all()
+
+    low, median, high = np.percentile(savings, [10, 50, 90])
+    assert 100 < low and 200 < median < 350 and high < 600
+
+    low, median, high = np.percentile(payback, [10, 50, 90])
+    assert 20 < low and 35 < median < 65 and high < 100
+
+def test_scalar_and_batch_prices_agree(every_option):
+    packs = get_product_packs()
+    rows = every_option.iloc[::997]
+    heat_loss = calculate_heat_loss_batch(rows)
+    batch = running_costs_batch(heat_loss, rows, packs)
+    for row, (_, property_data) in enumerate(rows.iterrows()):
+        scalar = running_costs(calculate_heat_loss(property_data.to_dict()), property_data.to_dict(), packs)
+        assert scalar["gas_cost"] == batch["gas_cost"][row]
+        for position, pack in enumerate(packs):
+            assert scalar["packs"][pack["id"]]["savings"] == batch["savings"][row, position]
@@ -0,0 +1,28 @@
+"""
+validate_properties against property_errors, the scalar rules it applies
+to whole frames.
+"""
+import numpy as np
+import pandas as pd
+
+from property_categories import CATEGORIES
+from validation import ERRORS_COLUMN, property_errors, validate_properties
+
+PROPERTY = dict({field: category.options[0] for field, category in CATEGORIES.items()},
+                floor_area=120.0, ceiling_height=2.4, num_bedrooms=3)
+
+def test_object_columns_match_the_scalar_rules():
+    floor_areas = [120.0, True, np.True_, False, "85", "large", None, 0, 2.5e4]
+    properties = pd.DataFrame([dict(PROPERTY, floor_area=value) for value in floor_areas])
+    properties["floor_area"] = properties["floor_area"].astype(object)
+
+    valid, invalid = validate_properties(properties)
+
+    for row, value in enumerate(floor_areas):
+        # Text that reads as a number is accepted, as the batch files are text
+        expected = property_errors(dict(PROPERTY, floor_area=float(value) if value == "85" else value))
+        if expected:
+            assert invalid.loc[row, ERRORS_COLUMN] == "; ".join(expected)
+        else:
+            assert row in valid.index
+    assert invalid.loc[1, ERRORS_COLUMN] == "floor_area must be a number"
@@ -0,0 +1,230 @@
+"""
+Monte Carlo uncertainty bands on heat loss, rating and payback.
+
+The questionnaire answers are estimates: "Average" insulation covers a
+range of U-values and a floor area typed from memory can easily be 10% out,
+yet calculate_heat_loss gives one figure. This module samples the uncertain
+inputs many times per property and reports percentiles instead:
+
+- floor area and ceiling height are multiplied by log-normal factors whose
+  median is 1 (AREA_TOLERANCE and HEIGHT_TOLERANCE are their log standard
+  deviations, roughly relative standard deviations)
+- the insulation, window and construction year factors are drawn uniformly
+  from each option's range, which runs halfway to the neighbouring options'
+  factors (factor_ranges)
+- property type and region are taken as known
+
+Every property is evaluated against the same set of standardised draws
+(common random numbers), so the random numbers are generated once and a
+batch is pure array arithmetic through heat_loss_calculator.component_losses,
+in blocks of about BLOCK_SIZE values. The payback uses the pack recommended
+for the point estimate, with the installation cost scaling with the sampled
+floor area and the savings with the sampled heat loss, as they do in
+generate_quotation. The pack is undersized in a sample when the heat loss
+is above its max_heat_loss.
+"""
+from functools import lru_cache
+
+from heat_loss_calculator import calculate_heat_loss_batch, category_codes, component_losses, lookup_factors
+from pack_index import get_pack_index
+from property_categories import (
+    CATEGORIES,
+    CONSTRUCTION_YEAR,
+    EFFICIENCY_RATINGS,
+    EFFICIENCY_THRESHOLDS,
+    INSULATION_LEVEL,
+    LOCATION,
+    PROPERTY_TYPE,
+    WINDOWS_QUALITY
+)
+from quotation_generator import generate_quotation_batch
+
+DEFAULT_SAMPLES = 2000
+# Log standard deviations of the floor area and ceiling height
+AREA_TOLERANCE = 0.10
+HEIGHT_TOLERANCE = 0.05
+PERCENTILES = (10, 50, 90)
+# Samples evaluated at once (rows × samples); small enough to stay in cache
+BLOCK_SIZE = 1 << 16
+# Seed of the standardised draws, so repeated runs give the same bands
+DEFAULT_SEED = 0
+
+@lru_cache(maxsize=None)
+def factor_ranges(field):
+    """
+    Return the range of factors each option of a category field stands for.
+
+    An option's range runs halfway to the factors of the options either
+    side of it (in factor order); the lowest and highest options extend as
+    far beyond their factor as they do inside it.
+
+    Args:
+        field: A property_categories.CATEGORIES field name
+
+    Returns:
+        A tuple of (low, high) NumPy arrays, one value per option code
+    """
+    import numpy as np
+
+    factors = np.asarray(CATEGORIES[field].factors, dtype=float)
+    distinct = np.unique(factors)
+    if len(distinct) == 1:
+        return factors.copy(), factors.copy()
+    middles = (distinct[1:] + distinct[:-1]) / 2
+    lows = np.concatenate([[2 * distinct[0] - middles[0]], middles])
+    highs = np.concatenate([middles, [2 * distinct[-1] - middles[-1]]])
+    position = np.searchsorted(distinct, factors)
+    return lows[position], highs[position]
+
+def _draws(samples, seed):
+    """The standardised draws shared by every property: two normals and three uniforms per sample."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((2, samples)), rng.random((3, samples))
+
+def _uniform_factors(codes, category, uniforms):
+    """Sampled factors (rows × samples) for an array of option codes."""
+    low, high = factor_ranges(category.field)
+    return low[codes][:, None] + (high - low)[codes][:, None] * uniforms
+
+def _percentiles(values):
+    """
+    PERCENTILES of each row of a (rows × samples) array, as np.percentile.
+
+    Sorts the rows in place: NumPy's SIMD sort is many times faster than the
+    multi-pivot partition np.percentile uses, so the array is consumed.
+    """
+    import numpy as np
+
+    values.sort(axis=1)
+    position = np.asarray(PERCENTILES, dtype=float) / 100 * (values.shape[1] - 1)
+    below = np.floor(position).astype(np.intp)
+    above = np.minimum(below + 1, values.shape[1] - 1)
+    fraction = position - below
+    return (values[:, below] + (values[:, above] - values[:, below]) * fraction).T
+
+def heat_loss_uncertainty_batch(properties, product_packs, samples=DEFAULT_SAMPLES, area_tolerance=AREA_TOLERANCE,
+                                height_tolerance=HEIGHT_TOLERANCE, tariff=None, seed=DEFAULT_SEED, pack_index=None):
+    """
+    Sample the uncertain inputs of many properties and summarise the spread.
+
+    Args:
+        properties: DataFrame of valid properties (see validation.py)
+        product_packs: List of available product packs
+        samples: Samples per property
+        area_tolerance: Log standard deviation of the floor area
+        height_tolerance: Log standard deviation of the ceiling height
+        tariff: Energy tariff name for the running costs
+        seed: Seed of the random draws
+        pack_index: Optional prebuilt PackIndex for product_packs
+
+    Returns:
+        A DataFrame indexed like properties with, for each of PERCENTILES,
+        total_heat_loss_p<n> (kW), efficiency_rating_p<n> (the rating at
+        that percentile of the heat loss per m², so p10 is the best) and
+        payback_period_p<n> (years, inf when the pack never pays back),
+        plus the recommended_pack_id of the point estimate and the
+        undersized_probability of that pack
+    """
+    import numpy as np
+    import pandas as pd
+
+    if pack_index is None:
+        pack_index = get_pack_index(product_packs)
+    heat_loss = calculate_heat_loss_batch(properties)
+    quotation = generate_quotation_batch(heat_loss, product_packs, properties, pack_index, tariff)
+    point_total = heat_loss["total_heat_loss"].to_numpy(dtype=float)
+
+    # Per-property constants: the payback's cost and savings scale with the
+    # sampled floor area and heat loss
+    pack_price = quotation["pack_price"].to_numpy(dtype=float)
+    installation_cost = quotation["installation_cost"].to_numpy(dtype=float)
+    savings_per_kw = quotation["estimated_annual_savings"].to_numpy(dtype=float) / point_total
+    positions = pack_index.recommend_many(point_total)
+    max_heat_loss = np.array([pack["max_heat_loss"] for pack in pack_index.packs], dtype=float)[positions]
+    scale = lookup_factors(properties["property_type"], PROPERTY_TYPE) * lookup_factors(properties["location"], LOCATION)
+    floor_area = properties["floor_area"].to_numpy(dtype=float)
+    ceiling_height = properties["ceiling_height"].to_numpy(dtype=float)
+    sampled = [(category, category_codes(properties[category.field], category))
+               for category in (INSULATION_LEVEL, WINDOWS_QUALITY, CONSTRUCTION_YEAR)]
+
+    normals, uniforms = _draws(samples, seed)
+    area_factor = np.exp(area_tolerance * normals[0])
+    root_factor = np.exp(area_tolerance * normals[0] / 2)
+    height_factor = np.exp(height_tolerance * normals[1])
+
+    count = len(properties)
+    totals = np.empty((len(PERCENTILES), count))
+    per_sqm = np.empty((len(PERCENTILES), count))
+    payback = np.full((len(PERCENTILES), count), float('inf'))
+    undersized = np.empty(count)
+    step = max(1, BLOCK_SIZE // samples)
+    for start in range(0, count, step):
+        rows = slice(start, start + step)
+        area = floor_area[rows][:, None] * area_factor
+        losses = component_losses(
+            area,
+            np.sqrt(floor_area[rows])[:, None] * root_factor,
+            ceiling_height[rows][:, None] * height_factor,
+            *(_uniform_factors(codes[rows], category, draws) for (category, codes), draws in zip(sampled, uniforms))
+        )
+        total = sum(losses) * scale[rows][:, None]
+
+        undersized[rows] = (total > max_heat_loss[rows][:, None]).mean(axis=1)
+
+        # Savings keep their sign in every sample; without savings there is no payback
+        paying = np.flatnonzero(savings_per_kw[rows] > 0)
+        if len(paying):
+            cost = pack_price[rows][paying, None] + installation_cost[rows][paying, None] * area_factor
+            payback[:, start + paying] = _percentiles(cost / (savings_per_kw[rows][paying, None] * total[paying]))
+
+        per_sqm[:, rows] = _percentiles(total * 1000 / area)
+        totals[:, rows] = _percentiles(total)
+
+    columns = {}
+    for position, percentile in enumerate(PERCENTILES):
+        columns[f"total_heat_loss_p{percentile}"] = totals[position]
+    for position, percentile in enumerate(PERCENTILES):
+        columns[f"efficiency_rating_p{percentile}"] = pd.Categorical.from_codes(
+            np.searchsorted(EFFICIENCY_THRESHOLDS, per_sqm[position], side="right"),
+            categories=list(EFFICIENCY_RATINGS)
+        )
+    for position, percentile in enumerate(PERCENTILES):
+        columns[f"payback_period_p{percentile}"] = payback[position]
+    columns["recommended_pack_id"] = quotation["recommended_pack_id"].to_numpy()
+    columns["undersized_probability"] = undersized
+    return pd.DataFrame(columns, index=properties.index)
+
+def heat_loss_uncertainty(property_data, product_packs, samples=DEFAULT_SAMPLES, area_tolerance=AREA_TOLERANCE,
+                          height_tolerance=HEIGHT_TOLERANCE, tariff=None, seed=DEFAULT_SEED):
+    """
+    Sample the uncertain inputs of one property (see heat_loss_uncertainty_batch).
+
+    Args:
+        property_data: A dictionary containing property information
+        product_packs: List of available product packs
+        samples: Samples drawn
+        area_tolerance: Log standard deviation of the floor area
+        height_tolerance: Log standard deviation of the ceiling height
+        tariff: Energy tariff name for the running costs
+        seed: Seed of the random draws
+
+    Returns:
+        A dictionary with total_heat_loss, efficiency_rating and
+        payback_period, each a dictionary of percentile -> value, plus the
+        recommended_pack_id, undersized_probability and samples
+    """
+    import pandas as pd
+
+    row = heat_loss_uncertainty_batch(pd.DataFrame([property_data]), product_packs, samples, area_tolerance,
+                                      height_tolerance, tariff, seed).iloc[0]
+    result = {
+        "total_heat_loss": {percentile: float(row[f"total_heat_loss_p{percentile}"]) for percentile in PERCENTILES},
+        "efficiency_rating": {percentile: row[f"efficiency_rating_p{percentile}"] for percentile in PERCENTILES},
+        "payback_period": {percentile: float(row[f"payback_period_p{percentile}"]) for percentile in PERCENTILES}
+    }
+    result["recommended_pack_id"] = row["recommended_pack_id"]
+    result["undersized_probability"] = float(row["undersized_probability"])
+    result["samples"] = samples
+    return result
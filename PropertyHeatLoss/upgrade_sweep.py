@@ -0,0 +1,123 @@
+import itertools
+
+from heat_loss_calculator import PROPERTY_FIELDS, calculate_heat_loss_batch
+from pack_index import get_pack_index
+from product_packs import get_product_packs
+from property_categories import CATEGORIES, INSULATION_LEVEL, WINDOWS_QUALITY
+from quotation_generator import generate_quotation_batch
+
+def upgrade_scenarios(property_data, ceiling_heights=None, floor_areas=None):
+    """
+    Build the grid of what-if scenarios for a property.
+
+    Every insulation level is combined with every windows quality and, when
+    given, every ceiling height and floor area; the other fields keep the
+    property's own values. Category columns hold registry codes, which the
+    batch calculator accepts directly.
+
+    Args:
+        property_data: A dictionary containing property information
+        ceiling_heights: Optional ceiling heights (m) to sweep
+        floor_areas: Optional floor areas (m²) to sweep
+
+    Returns:
+        A DataFrame with one scenario per row and the property_data fields
+    """
+    import numpy as np
+    import pandas as pd
+
+    ceiling_heights = list(ceiling_heights) if ceiling_heights is not None else [property_data["ceiling_height"]]
+    floor_areas = list(floor_areas) if floor_areas is not None else [property_data["floor_area"]]
+    grid = np.array(list(itertools.product(
+        range(len(INSULATION_LEVEL.options)),
+        range(len(WINDOWS_QUALITY.options)),
+        range(len(ceiling_heights)),
+        range(len(floor_areas))
+    ))).T
+
+    # One array per field, built in one go (column-by-column DataFrame
+    # assignment costs more than the whole calculation for a small grid)
+    swept = {
+        "insulation_level": grid[0],
+        "windows_quality": grid[1],
+        "ceiling_height": np.asarray(ceiling_heights)[grid[2]],
+        "floor_area": np.asarray(floor_areas)[grid[3]]
+    }
+    columns = {}
+    for field in PROPERTY_FIELDS:
+        if field in swept:
+            columns[field] = swept[field]
+            continue
+        category = CATEGORIES.get(field)
+        value = category.codes[property_data[field]] if category is not None else property_data[field]
+        columns[field] = np.full(grid.shape[1], value)
+
+    return pd.DataFrame(columns)
+
+def upgrade_sweep(property_data, product_packs=None, ceiling_heights=None, floor_areas=None, pack_index=None):
+    """
+    Evaluate every insulation × glazing upgrade for a property in one batch.
+
+    The scenarios go through calculate_heat_loss_batch and
+    generate_quotation_batch together, so each row matches what
+    calculate_heat_loss and generate_quotation would give for that
+    combination.
+
+    Args:
+        property_data: A dictionary containing property information
+        product_packs: Catalogue to quote against (defaults to the current one)
+        ceiling_heights: Optional ceiling heights (m) to sweep as well
+        floor_areas: Optional floor areas (m²) to sweep as well
+        pack_index: Optional prebuilt PackIndex for product_packs
+
+    Returns:
+        A DataFrame with one row per scenario: the insulation level and
+        windows quality labels, ceiling height, floor area, total heat loss,
+        heat loss per m², efficiency rating, recommended pack id and name,
+        total cost, estimated annual savings, payback period, the change in
+        heat loss against the property as it is and an is_current flag
+    """
+    product_packs = product_packs if product_packs is not None else get_product_packs()
+    if pack_index is None:
+        pack_index = get_pack_index(product_packs)
+
+    scenarios = upgrade_scenarios(property_data, ceiling_heights, floor_areas)
+    heat_loss = calculate_heat_loss_batch(scenarios)
+    quotation = generate_quotation_batch(heat_loss, product_packs, scenarios, pack_index)
+
+    import numpy as np
+    import pandas as pd
+
+    pack_names = {pack["id"]: pack["name"] for pack in pack_index.packs}
+    insulation_labels = np.array(INSULATION_LEVEL.options, dtype=object)[scenarios["insulation_level"].to_numpy()]
+    windows_labels = np.array(WINDOWS_QUALITY.options, dtype=object)[scenarios["windows_quality"].to_numpy()]
+    ceiling_height = scenarios["ceiling_height"].to_numpy()
+    floor_area = scenarios["floor_area"].to_numpy()
+    total_heat_loss = heat_loss["total_heat_loss"].to_numpy()
+
+    is_current = (
+        (insulation_labels == property_data["insulation_level"]) &
+        (windows_labels == property_data["windows_quality"]) &
+        (ceiling_height == property_data["ceiling_height"]) &
+        (floor_area == property_data["floor_area"])
+    )
+    # Change against the property as it is (NaN when it is not on the grid)
+    current = total_heat_loss[is_current]
+    heat_loss_change = total_heat_loss - current[0] if len(current) else np.full(len(total_heat_loss), np.nan)
+
+    return pd.DataFrame({
+        "insulation_level": insulation_labels,
+        "windows_quality": windows_labels,
+        "ceiling_height": ceiling_height,
+        "floor_area": floor_area,
+        "total_heat_loss": total_heat_loss,
+        "heat_loss_per_sqm": heat_loss["heat_loss_per_sqm"].to_numpy(),
+        "efficiency_rating": heat_loss["efficiency_rating"].to_numpy(),
+        "recommended_pack_id": quotation["recommended_pack_id"].to_numpy(),
+        "recommended_pack": [pack_names[pack_id] for pack_id in quotation["recommended_pack_id"]],
+        "total_cost": quotation["total_cost"].to_numpy(),
+        "estimated_annual_savings": quotation["estimated_annual_savings"].to_numpy(),
+        "payback_period": quotation["payback_period"].to_numpy(),
+        "heat_loss_change": heat_loss_change,
+        "is_current": is_current
+    })
@@ -0,0 +1,175 @@
+"""
+Validate property inputs, a whole DataFrame at a time.
+
+calculate_heat_loss trusts its input: an unknown category or a missing
+field raises KeyError and a zero floor area divides by zero, so one bad row
+would stop a whole batch. validate_properties() checks every row against
+the questionnaire schema and splits the frame into the rows that can be
+quoted and the rows that cannot, each with the reasons:
+
+    valid, invalid = validate_properties(frame)
+    quotes = quote_frame(valid, product_packs)
+    invalid.to_csv("rejected.csv")    # the input columns plus "errors"
+
+The rules are the app's: every field in PROPERTY_FIELDS is required,
+categories must be options of the property_categories registry and numbers
+must lie within NUMERIC_RANGES (the widget limits). Each check is one
+vectorized pass per column; messages are only built for the rejected rows.
+property_errors() applies the same rules to one property_data dictionary.
+"""
+import math
+
+from heat_loss_calculator import PROPERTY_FIELDS
+from property_categories import CATEGORIES, NUMERIC_RANGES
+
+# Column of the rejected rows holding their reasons, separated by "; "
+ERRORS_COLUMN = "errors"
+
+def _range_message(numeric):
+    return f"{numeric.field} must be between {numeric.minimum:g} and {numeric.maximum:g}"
+
+def property_errors(property_data):
+    """
+    Check one property against the questionnaire schema.
+
+    Args:
+        property_data: A dictionary containing property information
+
+    Returns:
+        A list of the problems found, empty when the property is valid
+    """
+    errors = []
+    for field in PROPERTY_FIELDS:
+        value = property_data.get(field)
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            errors.append(f"{field} is missing")
+        elif field in CATEGORIES:
+            if not isinstance(value, str) or value not in CATEGORIES[field].codes:
+                errors.append(f"Unknown {field} value: {value!r}")
+        elif isinstance(value, bool) or not isinstance(value, (int, float)):
+            errors.append(f"{field} must be a number")
+        else:
+            numeric = NUMERIC_RANGES[field]
+            if not numeric.minimum <= value <= numeric.maximum:
+                errors.append(_range_message(numeric))
+            elif numeric.whole and value != int(value):
+                errors.append(f"{field} must be a whole number")
+    return errors
+
+def _category_checks(values, category):
+    """
+    Check a column of category labels or codes.
+
+    Returns:
+        Masks of the missing and the unknown values, and the column with
+        its labels as a Categorical in registry order (None for code columns)
+    """
+    import numpy as np
+    import pandas as pd
+
+    missing = values.isna().to_numpy()
+    if pd.api.types.is_integer_dtype(values.dtype):
+        codes = values.to_numpy()
+        return missing, (codes < 0) | (codes >= len(category.options)), None
+
+    # Look each distinct label up once; the registry codes then make the
+    # column a Categorical, which the calculator reads without hashing again
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    registry = np.array([category.codes.get(label, -1) if isinstance(label, str) else -1 for label in uniques],
+                        dtype=np.intp)
+    codes = registry[codes] if len(uniques) else codes
+    unknown = (codes < 0) & ~missing
+    labels = pd.Categorical.from_codes(codes, categories=category.options)
+    return missing, unknown, pd.Series(labels, index=values.index)
+
+def validate_properties(properties):
+    """
+    Split a DataFrame of properties into valid and invalid rows.
+
+    Args:
+        properties: DataFrame with the questionnaire fields; other columns
+            are kept as they are
+
+    Returns:
+        A tuple (valid, invalid) of DataFrames with the original index:
+        the rows that can be quoted, and the rejected rows with an extra
+        ERRORS_COLUMN giving every reason. In the valid rows, label columns
+        become Categoricals in registry order (so the calculator does not
+        look the labels up again) and numeric columns read as text become
+        numbers.
+
+    Raises:
+        ValueError: If a questionnaire column is missing altogether
+    """
+    import numpy as np
+    import pandas as pd
+
+    missing_columns = [field for field in PROPERTY_FIELDS if field not in properties.columns]
+    if missing_columns:
+        raise ValueError(f"Input is missing column(s): {', '.join(missing_columns)}")
+
+    # (rows that fail, field, message or None for an unknown-value message)
+    checks = []
+    # Columns replaced in the valid rows
+    converted = {}
+    for field in PROPERTY_FIELDS:
+        values = properties[field]
+        if field in CATEGORIES:
+            missing, unknown, labels = _category_checks(values, CATEGORIES[field])
+            if labels is not None:
+                converted[field] = labels
+            checks.append((missing, field, f"{field} is missing"))
+            checks.append((unknown, field, None))
+            continue
+
+        numeric = NUMERIC_RANGES[field]
+        missing = values.isna().to_numpy()
+        if pd.api.types.is_bool_dtype(values.dtype):
+            numbers = pd.Series(np.nan, index=values.index)
+        elif pd.api.types.is_numeric_dtype(values.dtype):
+            numbers = values
+        else:
+            numbers = pd.to_numeric(values, errors="coerce")
+            # to_numeric reads True and False as 1 and 0, but booleans are not
+            # numbers (as in property_errors); only those values need a look
+            candidates = np.flatnonzero(numbers.isin((0, 1)).to_numpy())
+            if len(candidates):
+                booleans = np.zeros(len(values), dtype=bool)
+                booleans[candidates] = [isinstance(value, (bool, np.bool_))
+                                        for value in values.to_numpy()[candidates]]
+                numbers = numbers.mask(booleans)
+            converted[field] = numbers
+        numbers = numbers.to_numpy(dtype=float)
+        not_number = np.isnan(numbers) & ~missing
+        with np.errstate(invalid="ignore"):
+            out_of_range = ~((numbers >= numeric.minimum) & (numbers <= numeric.maximum)) & ~np.isnan(numbers)
+            not_whole = (numbers != np.floor(numbers)) & ~out_of_range & ~np.isnan(numbers) if numeric.whole \
+                else np.zeros(len(numbers), dtype=bool)
+        checks.append((missing, field, f"{field} is missing"))
+        checks.append((not_number, field, f"{field} must be a number"))
+        checks.append((out_of_range, field, _range_message(numeric)))
+        checks.append((not_whole, field, f"{field} must be a whole number"))
+
+    bad = np.zeros(len(properties), dtype=bool)
+    for mask, _, _ in checks:
+        bad |= mask
+
+    valid = properties[~bad]
+    if converted:
+        valid = valid.assign(**{field: numbers[~bad] for field, numbers in converted.items()})
+
+    # Reasons for the rejected rows only, in field order
+    rows = np.flatnonzero(bad)
+    reasons = np.full(len(rows), "", dtype=object)
+    for mask, field, message in checks:
+        hit = mask[rows]
+        if not hit.any():
+            continue
+        if message is None:
+            values = properties[field].to_numpy(dtype=object)[rows[hit]]
+            texts = np.array([f"Unknown {field} value: {value!r}" for value in values], dtype=object)
+        else:
+            texts = message
+        reasons[hit] = reasons[hit] + "; " + texts
+    invalid = properties.iloc[rows].assign(**{ERRORS_COLUMN: [reason[2:] for reason in reasons]})
+    return valid, invalid